@@ -1,6 +1,7 @@
 """
 Base settings to build other settings files upon.
 """
+import tempfile
 from pathlib import Path
 
 import environ
@@ -281,6 +282,13 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-schedule
+CELERY_BEAT_SCHEDULE = {
+    "prune-step-logs": {
+        "task": "etlman.projects.tasks.prune_logs",
+        "schedule": 60 * 60,
+    },
+}
 
 # django-allauth
 # ------------------------------------------------------------------------------
@@ -305,3 +313,102 @@ SOCIALACCOUNT_FORMS = {"signup": "etlman.users.forms.UserSocialSignupForm"}
 # ------------------------------------------------------------------------------
 
 ETLMAN_BACKEND = env("ETLMAND_BACKEND", default="subprocess")
+# Local directory for ETL Manager's working files (caches, environments, etc.).
+# The web process reads step logs from here, so it must be on storage shared
+# with the Celery workers (see production.yml).
+ETLMAN_DATA_DIR = env(
+    "ETLMAN_DATA_DIR", default=str(Path(tempfile.gettempdir()) / "etlman")
+)
+# Where each pipeline run gets a scratch directory for its steps to share files.
+# Distributed pipelines need this on storage shared by all Celery workers.
+ETLMAN_RUNS_DIR = env("ETLMAN_RUNS_DIR", default=str(Path(ETLMAN_DATA_DIR) / "runs"))
+# Where the output of each pipeline run's steps is logged as they run, to be
+# followed from the browser, which needs this on storage shared by the web
+# process and all Celery workers. Where it isn't, finished steps' pages fall
+# back to the output kept with the run.
+ETLMAN_LOGS_DIR = env("ETLMAN_LOGS_DIR", default=str(Path(ETLMAN_DATA_DIR) / "logs"))
+# Days a finished run's step logs are kept for.
+ETLMAN_LOG_RETENTION_DAYS = env.int("ETLMAN_LOG_RETENTION_DAYS", default=30)
+# Most bytes of a step's log sent to the browser at a time.
+ETLMAN_LOG_CHUNK_SIZE = env.int("ETLMAN_LOG_CHUNK_SIZE", default=64 * 1024)
+# Seconds between the browser's requests for more of a running step's log.
+ETLMAN_LOG_POLL_INTERVAL = env.int("ETLMAN_LOG_POLL_INTERVAL", default=2)
+# Rows fetched from a pipeline's input per batch when extracting it.
+ETLMAN_EXTRACT_BATCH_SIZE = env.int("ETLMAN_EXTRACT_BATCH_SIZE", default=10000)
+# Most seconds to wait between retries of a failed step's script. A pipeline
+# that isn't distributed waits in its task, so keep this well under
+# CELERY_TASK_SOFT_TIME_LIMIT.
+ETLMAN_MAX_RETRY_DELAY = env.float("ETLMAN_MAX_RETRY_DELAY", default=15)
+# Seconds between heartbeats recorded on a pipeline run while it's running.
+ETLMAN_HEARTBEAT_INTERVAL = env.int("ETLMAN_HEARTBEAT_INTERVAL", default=30)
+# Times a distributed pipeline's step task is retried after an error, e.g. a
+# lost database connection, as opposed to the script failing.
+ETLMAN_STEP_TASK_MAX_RETRIES = env.int("ETLMAN_STEP_TASK_MAX_RETRIES", default=3)
+# Rows per COPY or executemany batch when loading a pipeline's output.
+ETLMAN_LOAD_BATCH_SIZE = env.int("ETLMAN_LOAD_BATCH_SIZE", default=10000)
+# SQLAlchemy engines kept for data interfaces' connection strings, the
+# connections each pools, and seconds after which unused ones are closed.
+ETLMAN_MAX_ENGINES = env.int("ETLMAN_MAX_ENGINES", default=32)
+ETLMAN_ENGINE_POOL_SIZE = env.int("ETLMAN_ENGINE_POOL_SIZE", default=5)
+ETLMAN_ENGINE_MAX_OVERFLOW = env.int("ETLMAN_ENGINE_MAX_OVERFLOW", default=5)
+ETLMAN_ENGINE_IDLE_TIMEOUT = env.int("ETLMAN_ENGINE_IDLE_TIMEOUT", default=300)
+# Rows shown when testing a data interface's query, and seconds the query
+# may run for, where the database supports a statement timeout.
+ETLMAN_PREVIEW_ROWS = env.int("ETLMAN_PREVIEW_ROWS", default=20)
+ETLMAN_PREVIEW_TIMEOUT = env.float("ETLMAN_PREVIEW_TIMEOUT", default=10)
+# Rows sampled to infer a data interface's column types, and seconds the
+# inferred schema is cached for.
+ETLMAN_SCHEMA_SAMPLE_ROWS = env.int("ETLMAN_SCHEMA_SAMPLE_ROWS", default=100)
+ETLMAN_SCHEMA_CACHE_TTL = env.int("ETLMAN_SCHEMA_CACHE_TTL", default=60 * 60)
+# Bytes of each step's stdout/stderr held in memory before spilling to disk.
+ETLMAN_OUTPUT_MEMORY_LIMIT = env.int("ETLMAN_OUTPUT_MEMORY_LIMIT", default=1024 * 1024)
+# Bytes of the end of each step's stdout/stderr kept in its run's output; the
+# rest is only in the step's log.
+ETLMAN_OUTPUT_TAIL_SIZE = env.int("ETLMAN_OUTPUT_TAIL_SIZE", default=64 * 1024)
+# Modules imported once by the "forkserver" backend's server process, e.g.
+# "pandas,numpy,sqlalchemy". Modules that fail to import are skipped.
+ETLMAN_FORKSERVER_PRELOAD = env.list("ETLMAN_FORKSERVER_PRELOAD", default=[])
+# Maximum number of steps run_pipelines executes at once within one worker.
+ETLMAN_MAX_CONCURRENT_STEPS = env.int("ETLMAN_MAX_CONCURRENT_STEPS", default=10)
+# Maximum number of independent steps of one pipeline run at once.
+ETLMAN_MAX_PARALLEL_STEPS = env.int("ETLMAN_MAX_PARALLEL_STEPS", default=4)
+# Seconds a step may run when its own timeout is blank (None for no limit).
+ETLMAN_DEFAULT_STEP_TIMEOUT = env.int("ETLMAN_DEFAULT_STEP_TIMEOUT", default=None)
+# Seconds between sending a timed out step SIGTERM and SIGKILL.
+ETLMAN_TIMEOUT_GRACE_PERIOD = env.int("ETLMAN_TIMEOUT_GRACE_PERIOD", default=10)
+# rlimits applied to each step's process (None for no limit).
+ETLMAN_STEP_RESOURCE_LIMITS = {
+    # Bytes of virtual memory.
+    "address_space": env.int("ETLMAN_STEP_MAX_ADDRESS_SPACE", default=None),
+    # Seconds of CPU time.
+    "cpu_time": env.int("ETLMAN_STEP_MAX_CPU_TIME", default=None),
+    "open_files": env.int("ETLMAN_STEP_MAX_OPEN_FILES", default=None),
+    # Bytes in any single file the step writes.
+    "file_size": env.int("ETLMAN_STEP_MAX_FILE_SIZE", default=None),
+}
+# On-disk store for the stdout/stderr of cached step results.
+ETLMAN_STEP_CACHE_DIR = env(
+    "ETLMAN_STEP_CACHE_DIR", default=str(Path(ETLMAN_DATA_DIR) / "step-cache")
+)
+# Bytes the step cache's on-disk store may use before evicting old results.
+ETLMAN_STEP_CACHE_MAX_SIZE = env.int(
+    "ETLMAN_STEP_CACHE_MAX_SIZE", default=1024 * 1024 * 1024
+)
+# Where Python environments for steps' requirements are built and cached.
+ETLMAN_ENVIRONMENTS_DIR = env(
+    "ETLMAN_ENVIRONMENTS_DIR", default=str(Path(ETLMAN_DATA_DIR) / "environments")
+)
+# How many of the most recently used environments to keep.
+ETLMAN_MAX_ENVIRONMENTS = env.int("ETLMAN_MAX_ENVIRONMENTS", default=10)
+# R packages loaded once by each of the "rsession" backend's R sessions, e.g.
+# "dplyr,tidyr".
+ETLMAN_R_PRELOAD = env.list("ETLMAN_R_PRELOAD", default=[])
+# Maximum number of R sessions the "rsession" backend keeps per worker.
+ETLMAN_R_WORKERS = env.int("ETLMAN_R_WORKERS", default=2)
+# Scripts an R session runs before it is replaced with a fresh one.
+ETLMAN_R_WORKER_MAX_SCRIPTS = env.int("ETLMAN_R_WORKER_MAX_SCRIPTS", default=100)
+# Bytes of resident memory beyond which an R session is replaced.
+ETLMAN_R_WORKER_MAX_RSS = env.int("ETLMAN_R_WORKER_MAX_RSS", default=1024 * 1024 * 1024)
+# Bytes buffered between the steps of a streaming pipeline before the upstream
+# step blocks (None for the OS default, 64 KiB on Linux).
+ETLMAN_STREAM_PIPE_SIZE = env.int("ETLMAN_STREAM_PIPE_SIZE", default=1024 * 1024)
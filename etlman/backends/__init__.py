@@ -1,9 +1,40 @@
 from django.conf import settings
 
+from .environments import EnvironmentManager
 
-def get_backend():
-    if settings.ETLMAN_BACKEND == "subprocess":
+# Values accepted for ETLMAN_BACKEND.
+BACKEND_NAMES = ("subprocess", "forkserver", "rsession")
+
+
+def get_backend(name=None):
+    """Return the backend called ``name``, ETLMAN_BACKEND by default."""
+    name = name or settings.ETLMAN_BACKEND
+    options = dict(
+        output_memory_limit=settings.ETLMAN_OUTPUT_MEMORY_LIMIT,
+        timeout_grace_period=settings.ETLMAN_TIMEOUT_GRACE_PERIOD,
+        resource_limits=settings.ETLMAN_STEP_RESOURCE_LIMITS,
+        environments=EnvironmentManager(
+            directory=settings.ETLMAN_ENVIRONMENTS_DIR,
+            max_environments=settings.ETLMAN_MAX_ENVIRONMENTS,
+        ),
+        stream_pipe_size=settings.ETLMAN_STREAM_PIPE_SIZE,
+    )
+    if name == "subprocess":
         from .subprocess_backend import SubprocessBackend
 
-        return SubprocessBackend()
-    raise ValueError(f"ETLMAN_BACKEND {settings.ETLMAN_BACKEND} is not supported.")
+        return SubprocessBackend(**options)
+    if name == "forkserver":
+        from .forkserver_backend import ForkServerBackend
+
+        return ForkServerBackend(preload=settings.ETLMAN_FORKSERVER_PRELOAD, **options)
+    if name == "rsession":
+        from .rsession_backend import RSessionBackend
+
+        return RSessionBackend(
+            preload=settings.ETLMAN_R_PRELOAD,
+            workers=settings.ETLMAN_R_WORKERS,
+            worker_max_scripts=settings.ETLMAN_R_WORKER_MAX_SCRIPTS,
+            worker_max_rss=settings.ETLMAN_R_WORKER_MAX_RSS,
+            **options,
+        )
+    raise ValueError(f"ETLMAN_BACKEND {name} is not supported.")
@@ -0,0 +1,172 @@
+import codecs
+import tempfile
+import threading
+
+# Amount of data read from a child's pipe at a time.
+CHUNK_SIZE = 64 * 1024
+# Captured output beyond this many bytes is spilled to a temporary file on disk.
+DEFAULT_MEMORY_LIMIT = 1024 * 1024
+
+
+class OutputCapture:
+    """
+    Incrementally captures a child process's output stream.
+
+    Bytes are decoded as they arrive (invalid UTF-8 is replaced rather than
+    raising) and buffered in memory up to ``memory_limit`` bytes, after which
+    the buffer is transparently spilled to a temporary file. Use ``read()`` or
+    ``iter_text()`` to retrieve the captured text, and ``close()`` (or a
+    ``with`` block) to release the buffer.
+
+    Output past ``max_size`` bytes, if given, is read but discarded, and a note
+    of how much was discarded is added at the end. (An rlimit on file size
+    doesn't apply to pipes.)
+
+    If a ``log`` (see LogWriter) is given, complete lines are also written to
+    it as they arrive, so the output can be followed while the child runs. A
+    line longer than the log's ``max_line_size`` is written in pieces.
+    """
+
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT, log=None, max_size=None):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=memory_limit)
+        self.memory_limit = memory_limit
+        self.size = 0
+        self.log = log
+        self._partial_line = bytearray()
+        self.max_size = max_size
+        self.received = 0
+        self.discarded = 0
+
+    def write(self, data: bytes):
+        if self.max_size is not None:
+            kept = data[: max(self.max_size - self.received, 0)]
+            self.discarded += len(data) - len(kept)
+            data = kept
+        if not data:
+            return
+        self.received += len(data)
+        self._write_text(self._decoder.decode(data))
+        if self.log is not None:
+            self._write_log(data)
+
+    def _write_log(self, data: bytes):
+        end = data.rfind(b"\n") + 1
+        if end:
+            self.log.write(bytes(self._partial_line) + data[:end])
+            self._partial_line = bytearray(data[end:])
+        else:
+            self._partial_line += data
+        if len(self._partial_line) >= self.log.max_line_size:
+            self.log.write(bytes(self._partial_line))
+            self._partial_line.clear()
+
+    def finish(self):
+        """
+        Flush any partial multi-byte sequence left in the decoder, and note
+        any output that was discarded.
+        """
+        self._write_text(self._decoder.decode(b"", final=True))
+        if self.log is not None and self._partial_line:
+            self.log.write(bytes(self._partial_line) + b"\n")
+            self._partial_line.clear()
+        if self.discarded:
+            note = f"[{self.discarded} more bytes of output were discarded]\n"
+            self._write_text(f"\n{note}")
+            if self.log is not None:
+                self.log.write(note.encode("utf-8"))
+            self.discarded = 0
+
+    def _write_text(self, text: str):
+        if text:
+            encoded = text.encode("utf-8")
+            self._buffer.write(encoded)
+            self.size += len(encoded)
+
+    def drain(self, stream, chunk_size=CHUNK_SIZE):
+        """Read ``stream`` until EOF, then close it."""
+        with stream:
+            for chunk in iter(lambda: stream.read1(chunk_size), b""):
+                self.write(chunk)
+        self.finish()
+
+    async def drain_async(self, stream, chunk_size=CHUNK_SIZE):
+        """Read the asyncio ``stream`` until EOF."""
+        while chunk := await stream.read(chunk_size):
+            self.write(chunk)
+        self.finish()
+
+    def iter_text(self, chunk_size=CHUNK_SIZE):
+        self._buffer.seek(0)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for chunk in iter(lambda: self._buffer.read(chunk_size), b""):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    def read(self) -> str:
+        return "".join(self.iter_text())
+
+    def read_tail(self, size) -> str:
+        """
+        The last ``size`` bytes of the captured text, less any part of a
+        character cut off at the start.
+        """
+        self._buffer.seek(max(self.size - size, 0))
+        data = self._buffer.read()
+        start = 0
+        # Skip UTF-8 continuation bytes.
+        while start < min(len(data), 3) and data[start] & 0xC0 == 0x80:
+            start += 1
+        return data[start:].decode("utf-8", errors="replace")
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the captured output has been moved to disk."""
+        return self.size > self.memory_limit
+
+    def close(self):
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __str__(self):
+        return self.read()
+
+
+class LogWriter:
+    """
+    Appends lines of output to a file as they arrive, from any number of
+    OutputCaptures (e.g. a script's stdout and stderr) in any threads, so it
+    can be read while it's being written.
+    """
+
+    def __init__(self, path, max_line_size=CHUNK_SIZE):
+        self.path = str(path)
+        # Longest part of a line held back until the rest of it arrives.
+        self.max_line_size = max_line_size
+        self._file = open(path, "ab", buffering=0)
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes):
+        with self._lock:
+            self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def start_drain(capture: OutputCapture, stream) -> threading.Thread:
+    """Drain ``stream`` into ``capture`` from a background thread."""
+    thread = threading.Thread(target=capture.drain, args=(stream,), daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,124 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+DEFAULT_DIRECTORY = Path(tempfile.gettempdir()) / "etlman" / "environments"
+DEFAULT_MAX_ENVIRONMENTS = 10
+# Created once an environment has been completely built.
+READY_MARKER = ".etlman-ready"
+
+
+class EnvironmentBuildError(Exception):
+    def __init__(self, output):
+        super().__init__("Failed to install requirements")
+        self.output = output
+
+
+def normalize_requirements(requirements: str) -> list[str]:
+    """The requirement lines that matter, ignoring order, blanks and comments."""
+    lines = (line.split("#", 1)[0].strip() for line in requirements.splitlines())
+    return sorted({line for line in lines if line})
+
+
+class EnvironmentManager:
+    """
+    Builds Python virtual environments for requirement sets and caches them
+    on disk, keyed by a hash of the requirements, so steps with the same
+    requirements share one environment across runs and pipelines. Only the
+    ``max_environments`` most recently used environments are kept.
+
+    Environments are used under a shared file lock, so one isn't evicted while
+    a script is running in it.
+    """
+
+    def __init__(self, directory=None, max_environments=DEFAULT_MAX_ENVIRONMENTS):
+        self.directory = Path(directory or DEFAULT_DIRECTORY)
+        self.max_environments = max_environments
+
+    def get_key(self, requirements: str) -> str:
+        payload = "\n".join(normalize_requirements(requirements))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @contextlib.contextmanager
+    def python(self, requirements: str):
+        """Yield the path to a Python interpreter with ``requirements`` installed."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        key = self.get_key(requirements)
+        path = self.directory / key
+        with open(self.directory / f"{key}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            if not self._is_ready(path):
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another worker may have built it while we waited for the lock.
+                if not self._is_ready(path):
+                    self._build(path, requirements)
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            # Record the use for least-recently-used eviction.
+            os.utime(path / READY_MARKER)
+            try:
+                yield str(path / "bin" / "python")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.evict()
+
+    def _is_ready(self, path: Path) -> bool:
+        return (path / READY_MARKER).exists()
+
+    def _build(self, path: Path, requirements: str):
+        # Environments see the worker's own packages, with requirements on top.
+        self._run(
+            [
+                sys.executable,
+                "-m",
+                "venv",
+                "--clear",
+                "--system-site-packages",
+                str(path),
+            ]
+        )
+        requirements_file = path / "requirements.txt"
+        requirements_file.write_text("\n".join(normalize_requirements(requirements)))
+        self._run(
+            [
+                str(path / "bin" / "python"),
+                "-m",
+                "pip",
+                "install",
+                "--no-input",
+                "--disable-pip-version-check",
+                "-r",
+                str(requirements_file),
+            ]
+        )
+        (path / READY_MARKER).touch()
+
+    def _run(self, args):
+        process = subprocess.run(
+            args, stdin=subprocess.DEVNULL, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            raise EnvironmentBuildError(process.stdout + process.stderr)
+
+    def evict(self):
+        """Delete the least recently used environments beyond max_environments."""
+        environments = []
+        for marker in self.directory.glob(f"*/{READY_MARKER}"):
+            try:
+                environments.append((marker.stat().st_mtime, marker.parent))
+            except FileNotFoundError:
+                continue
+        environments.sort(reverse=True)
+        for _, path in environments[self.max_environments :]:  # noqa: E203
+            with open(self.directory / f"{path.name}.lock", "w") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # In use; try again next time.
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+from .capture import DEFAULT_MEMORY_LIMIT
+from .resources import apply_resource_limits, get_usage
+from .result import ScriptResult
+from .subprocess_backend import SubprocessBackend, signal_process_group
+
+
+def _run_script(script: str, paths: dict, resource_limits: dict, env: dict):
+    """Entry point of each forked child: redirect output and run the script."""
+    # Lead a new process group, so a timeout can kill anything the script spawns.
+    os.setsid()
+    apply_resource_limits(resource_limits)
+    os.environ.update(env)
+    for fd, path in ((1, paths["stdout"]), (2, paths["stderr"])):
+        with open(path, "wb") as f:
+            os.dup2(f.fileno(), fd)
+    sys.argv = ["<step>"]
+    try:
+        exec(compile(script, "<step>", "exec"), {"__name__": "__main__"})
+    except SystemExit:
+        raise
+    except BaseException:
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        # The fork server reaps this process, so report our own usage.
+        with contextlib.suppress(OSError), open(paths["usage"], "w") as f:
+            json.dump(get_usage(resource.getrusage(resource.RUSAGE_SELF), 0), f)
+
+
+class ForkServerBackend(SubprocessBackend):
+    """
+    Runs Python scripts in children forked from a long-lived fork server.
+
+    The server imports ``preload`` once, so each step starts from a
+    copy-on-write snapshot with those modules already imported instead of
+    paying for a fresh interpreter. Languages other than Python, and scripts
+    with requirements of their own, fall back to SubprocessBackend.
+    """
+
+    def __init__(
+        self,
+        preload=(),
+        output_memory_limit=DEFAULT_MEMORY_LIMIT,
+        timeout_grace_period=SubprocessBackend.DEFAULT_TIMEOUT_GRACE_PERIOD,
+        resource_limits=None,
+        environments=None,
+        stream_pipe_size=None,
+    ):
+        super().__init__(
+            output_memory_limit=output_memory_limit,
+            timeout_grace_period=timeout_grace_period,
+            resource_limits=resource_limits,
+            environments=environments,
+            stream_pipe_size=stream_pipe_size,
+        )
+        self.context = multiprocessing.get_context("forkserver")
+        # Only takes effect when the (process-wide) fork server first starts.
+        self.context.set_forkserver_preload(list(preload))
+
+    def execute_script_streaming(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        if language != "python" or requirements:
+            return super().execute_script_streaming(
+                language,
+                script,
+                timeout=timeout,
+                requirements=requirements,
+                env=env,
+                log=log,
+            )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = {
+                name: os.path.join(tmpdir, name)
+                for name in ("stdout", "stderr", "usage")
+            }
+            start = time.monotonic()
+            process = self.context.Process(
+                target=_run_script,
+                args=(script, paths, self.resource_limits, env or {}),
+            )
+            process.start()
+            # Only None before the process starts.
+            assert process.pid is not None
+            try:
+                process.join(timeout)
+            except BaseException:
+                signal_process_group(process.pid, signal.SIGKILL)
+                raise
+            timed_out = process.exitcode is None
+            if timed_out:
+                self._terminate_forked(process, process.pid)
+            # Only None before the process is joined.
+            assert process.exitcode is not None
+            wall_time = time.monotonic() - start
+            stdout = self._get_capture(log)
+            stderr = self._get_capture(log)
+            stdout.drain(open(paths["stdout"], "rb"))
+            stderr.drain(open(paths["stderr"], "rb"))
+            usage = {}
+            if os.path.exists(paths["usage"]):
+                with open(paths["usage"]) as f:
+                    usage = json.load(f)
+        usage.update(
+            wall_time=round(wall_time, 6),
+            stdout_bytes=stdout.size,
+            stderr_bytes=stderr.size,
+        )
+        return ScriptResult(
+            process.exitcode, stdout, stderr, timed_out=timed_out, usage=usage
+        )
+
+    def _terminate_forked(self, process: multiprocessing.process.BaseProcess, pid: int):
+        # Not an override of _terminate(), which non-Python scripts still use.
+        signal_process_group(pid, signal.SIGTERM)
+        process.join(self.timeout_grace_period)
+        if process.exitcode is None:
+            signal_process_group(pid, signal.SIGKILL)
+            process.join()
+
+    async def execute_script_streaming_async(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        if language != "python" or requirements:
+            return await super().execute_script_streaming_async(
+                language,
+                script,
+                timeout=timeout,
+                requirements=requirements,
+                env=env,
+                log=log,
+            )
+        return await asyncio.to_thread(
+            self.execute_script_streaming,
+            language,
+            script,
+            timeout=timeout,
+            env=env,
+            log=log,
+        )
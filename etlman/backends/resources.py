@@ -0,0 +1,109 @@
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None  # type: ignore
+
+# Keys accepted in a backend's ``resource_limits`` and the rlimit each sets.
+RESOURCE_LIMITS = {
+    "address_space": "RLIMIT_AS",
+    "cpu_time": "RLIMIT_CPU",
+    "open_files": "RLIMIT_NOFILE",
+    "file_size": "RLIMIT_FSIZE",
+}
+# The prlimit (util-linux) option setting each of those rlimits.
+PRLIMIT_OPTIONS = {
+    "address_space": "--as",
+    "cpu_time": "--cpu",
+    "open_files": "--nofile",
+    "file_size": "--fsize",
+}
+
+
+def apply_resource_limits(limits: dict):
+    """
+    Apply ``limits`` to the current process; meant to run in a child before it
+    starts the script. Limits that are None are left alone.
+    """
+    for name, value in limits.items():
+        if value is not None:
+            rlimit = getattr(resource, RESOURCE_LIMITS[name])
+            value = _clamp(rlimit, value)
+            resource.setrlimit(rlimit, (value, value))
+
+
+def _clamp(rlimit, value):
+    """``value``, lowered to the hard limit, which we can't raise."""
+    _, hard = resource.getrlimit(rlimit)
+    return value if hard == resource.RLIM_INFINITY else min(value, hard)
+
+
+@functools.lru_cache(maxsize=None)
+def _find_prlimit():
+    return shutil.which("prlimit")
+
+
+def get_limit_args(limits: dict) -> list:
+    """
+    Args to put before a command to run it with ``limits`` applied, by a
+    program that sets them and then execs it: prlimit if it's installed, or
+    else this module. Unlike a ``preexec_fn``, this is safe in a process with
+    other threads running.
+    """
+    limits = {name: value for name, value in limits.items() if value is not None}
+    if not limits:
+        return []
+    prlimit = _find_prlimit()
+    if prlimit is None:
+        return [sys.executable, __file__, json.dumps(limits)]
+    args = [prlimit]
+    for name, value in limits.items():
+        value = _clamp(getattr(resource, RESOURCE_LIMITS[name]), value)
+        args.append(f"{PRLIMIT_OPTIONS[name]}={value}:{value}")
+    return [*args, "--"]
+
+
+def get_usage(rusage, wall_time: float) -> dict:
+    """Summarize a ``resource.struct_rusage`` as JSON-serializable accounting."""
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS.
+    rss_scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "wall_time": round(wall_time, 6),
+        "user_time": round(rusage.ru_utime, 6),
+        "system_time": round(rusage.ru_stime, 6),
+        "max_rss": rusage.ru_maxrss * rss_scale,
+    }
+
+
+def wait_with_rusage(process: subprocess.Popen, timeout=None):
+    """
+    Like ``process.wait(timeout)``, but reaps the child with ``os.wait4()`` and
+    returns its resource usage.
+    """
+    # Without a timeout, os.wait4() blocks until the child exits.
+    options = 0 if timeout is None else os.WNOHANG
+    deadline = time.monotonic() + (timeout or 0)
+    delay = 0.0005
+    while True:
+        pid, status, rusage = os.wait4(process.pid, options)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return rusage
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(process.args, timeout)
+        delay = min(delay * 2, remaining, 0.05)
+        time.sleep(delay)
+
+
+if __name__ == "__main__":
+    # Usage: python resources.py LIMITS_JSON COMMAND [ARG ...]
+    apply_resource_limits(json.loads(sys.argv[1]))
+    os.execvp(sys.argv[2], sys.argv[2:])
@@ -0,0 +1,53 @@
+import dataclasses
+from typing import Any
+
+
+@dataclasses.dataclass
+class ScriptResult:
+    """
+    The outcome of running a script. Unpacks as ``(returncode, stdout, stderr)``
+    so callers written against the original tuple contract keep working.
+    """
+
+    returncode: int
+    stdout: Any
+    stderr: Any
+    timed_out: bool = False
+    # Resource accounting, e.g. wall/user/system time and peak RSS.
+    usage: dict = dataclasses.field(default_factory=dict)
+    # Whether stdout or stderr were cut down to their tails (see tail()).
+    truncated: bool = False
+
+    def __iter__(self):
+        return iter((self.returncode, self.stdout, self.stderr))
+
+    def tail(self, size: int) -> "ScriptResult":
+        """
+        A copy with only the last ``size`` bytes of stdout and stderr, as
+        strings. Streamed output (OutputCaptures) is closed once read.
+        """
+        stdout, stdout_truncated = _tail(self.stdout, size)
+        stderr, stderr_truncated = _tail(self.stderr, size)
+        return dataclasses.replace(
+            self,
+            stdout=stdout,
+            stderr=stderr,
+            truncated=self.truncated or stdout_truncated or stderr_truncated,
+        )
+
+    @property
+    def status(self) -> str:
+        if self.timed_out:
+            return "timeout"
+        return "success" if self.returncode == 0 else "failure"
+
+
+def _tail(output, size):
+    if isinstance(output, str):
+        encoded = output.encode("utf-8")
+        if len(encoded) <= size:
+            return output, False
+        # Drops any part of a character cut off at the start.
+        return encoded[-size:].decode("utf-8", errors="ignore"), True
+    with output:
+        return output.read_tail(size), output.size > size
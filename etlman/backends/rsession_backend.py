@@ -0,0 +1,319 @@
+import asyncio
+import contextlib
+import os
+import queue
+import select
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .capture import DEFAULT_MEMORY_LIMIT
+from .resources import get_limit_args
+from .result import ScriptResult
+from .subprocess_backend import SubprocessBackend, signal_process_group
+
+WORKER_SCRIPT = Path(__file__).with_name("rsession_worker.R")
+# Environment variable telling the worker which file descriptor to reply on.
+REPLY_FD_VARIABLE = "ETLMAN_REPLY_FD"
+
+
+class RWorkerDied(Exception):
+    pass
+
+
+class RWorker:
+    """
+    A long-lived R process running ``rsession_worker.R``, which runs one
+    script per request and replies with its exit status on a pipe of its own,
+    so nothing a script writes to file descriptor 1 (e.g. a command run with
+    system()) can be taken for a reply.
+    """
+
+    def __init__(self, args):
+        reply_fd, worker_reply_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                # The worker's own output and errors, e.g. a preload that
+                # fails, go to our log.
+                stdout=None,
+                stderr=None,
+                pass_fds=(worker_reply_fd,),
+                env={**os.environ, REPLY_FD_VARIABLE: str(worker_reply_fd)},
+                start_new_session=True,
+            )
+        except BaseException:
+            os.close(reply_fd)
+            raise
+        finally:
+            os.close(worker_reply_fd)
+        # Only None without stdin=PIPE.
+        assert self.process.stdin is not None
+        self.requests = self.process.stdin
+        self.replies = os.fdopen(reply_fd, "rb")
+        self.scripts_run = 0
+
+    def run(self, script_path, stdout_path, stderr_path, timeout=None, env=None) -> int:
+        """
+        Run a script with the environment variables in ``env`` set and return
+        its exit status. Raises subprocess.TimeoutExpired if it doesn't finish
+        within ``timeout`` seconds, or RWorkerDied if the worker exits or its
+        reply can't be understood, in which case it's stopped.
+        """
+        fields = [str(script_path), str(stdout_path), str(stderr_path)]
+        fields += [f"{name}={value}" for name, value in (env or {}).items()]
+        if any("\t" in field or "\n" in field for field in fields):
+            raise ValueError("Paths and environment variables can't contain tabs.")
+        self.scripts_run += 1
+        request = "\t".join(fields)
+        try:
+            self.requests.write(f"{request}\n".encode("utf-8"))
+            self.requests.flush()
+        except BrokenPipeError:
+            raise RWorkerDied()
+        ready, _, _ = select.select([self.replies], [], [], timeout)
+        if not ready:
+            raise subprocess.TimeoutExpired(self.process.args, timeout)
+        try:
+            return int(self.replies.readline())
+        except ValueError:
+            # Either it exited, or we can no longer trust what it says.
+            self.stop(grace_period=0)
+            raise RWorkerDied()
+
+    def get_rss(self) -> int:
+        """The worker's resident set size in bytes, or 0 if it's unknown."""
+        with contextlib.suppress(OSError, ValueError):
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        return 0
+
+    def stop(self, grace_period=None):
+        """
+        Stop the worker and anything it started with SIGTERM, then SIGKILL
+        after ``grace_period`` seconds.
+        """
+        with contextlib.suppress(OSError):
+            self.requests.close()
+        if self.process.poll() is None:
+            signal_process_group(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=grace_period)
+            except subprocess.TimeoutExpired:
+                signal_process_group(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+        self.replies.close()
+
+
+class RWorkerPool:
+    """
+    Up to ``size`` RWorkers, started on demand and shared by threads. Workers
+    are replaced once they've run ``max_scripts`` scripts or their RSS has
+    grown past ``max_rss`` bytes, so leaks in R code or packages don't
+    accumulate.
+    """
+
+    def __init__(self, args, size, max_scripts, max_rss):
+        self.args = args
+        self.max_scripts = max_scripts
+        self.max_rss = max_rss
+        self._idle: queue.LifoQueue[RWorker] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextlib.contextmanager
+    def worker(self):
+        """Yield an idle worker, starting one if need be."""
+        with self._slots:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = RWorker(self.args)
+            try:
+                yield worker
+            except BaseException:
+                # The worker may be mid-script; don't hand it out again.
+                worker.stop(grace_period=0)
+                raise
+            if self._should_recycle(worker):
+                worker.stop(grace_period=0)
+            else:
+                self._idle.put(worker)
+
+    def _should_recycle(self, worker: RWorker) -> bool:
+        if worker.process.poll() is not None:
+            return True
+        if self.max_scripts and worker.scripts_run >= self.max_scripts:
+            return True
+        return bool(self.max_rss) and worker.get_rss() > self.max_rss
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.stop(grace_period=0)
+
+
+class RSessionBackend(SubprocessBackend):
+    """
+    Runs R scripts in a pool of long-lived R sessions, so each step doesn't
+    pay for starting R and loading ``preload`` packages (e.g. dplyr). The
+    global environment and working directory are reset between scripts.
+    Python scripts, and R scripts with requirements, fall back to
+    SubprocessBackend.
+
+    Pools are shared by all backends with the same configuration. Workers exit
+    when this process does, since their stdin is closed.
+    """
+
+    DEFAULT_WORKERS = 2
+    DEFAULT_WORKER_MAX_SCRIPTS = 100
+    DEFAULT_WORKER_MAX_RSS = 1024 * 1024 * 1024
+    # Limits on cumulative CPU time would eventually kill a long-lived worker;
+    # the step timeout covers runaway scripts instead.
+    WORKER_RESOURCE_LIMITS = {"address_space", "open_files", "file_size"}
+
+    _pools: dict = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(
+        self,
+        preload=(),
+        workers=DEFAULT_WORKERS,
+        worker_max_scripts=DEFAULT_WORKER_MAX_SCRIPTS,
+        worker_max_rss=DEFAULT_WORKER_MAX_RSS,
+        output_memory_limit=DEFAULT_MEMORY_LIMIT,
+        timeout_grace_period=SubprocessBackend.DEFAULT_TIMEOUT_GRACE_PERIOD,
+        resource_limits=None,
+        environments=None,
+        stream_pipe_size=None,
+    ):
+        super().__init__(
+            output_memory_limit=output_memory_limit,
+            timeout_grace_period=timeout_grace_period,
+            resource_limits=resource_limits,
+            environments=environments,
+            stream_pipe_size=stream_pipe_size,
+        )
+        self.preload = tuple(preload)
+        self.workers = workers
+        self.worker_max_scripts = worker_max_scripts
+        self.worker_max_rss = worker_max_rss
+
+    def _get_worker_args(self):
+        return (*self._get_run_args("r"), str(WORKER_SCRIPT), *self.preload)
+
+    def get_pool(self) -> RWorkerPool:
+        limits = {
+            name: value
+            for name, value in self.resource_limits.items()
+            if name in self.WORKER_RESOURCE_LIMITS and value is not None
+        }
+        args = (*get_limit_args(limits), *self._get_worker_args())
+        key = (args, self.workers, self.worker_max_scripts, self.worker_max_rss)
+        with self._pools_lock:
+            if key not in self._pools:
+                self._pools[key] = RWorkerPool(
+                    args,
+                    size=self.workers,
+                    max_scripts=self.worker_max_scripts,
+                    max_rss=self.worker_max_rss,
+                )
+            return self._pools[key]
+
+    def execute_script_streaming(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        if language != "r" or requirements:
+            return super().execute_script_streaming(
+                language,
+                script,
+                timeout=timeout,
+                requirements=requirements,
+                env=env,
+                log=log,
+            )
+        stdout = self._get_capture(log)
+        stderr = self._get_capture(log)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = {
+                name: os.path.join(tmpdir, name)
+                for name in ("script.R", "stdout", "stderr")
+            }
+            with open(paths["script.R"], "w", encoding="utf-8") as f:
+                f.write(script)
+            timed_out = died = False
+            start = time.monotonic()
+            with self.get_pool().worker() as worker:
+                try:
+                    returncode = worker.run(
+                        paths["script.R"],
+                        paths["stdout"],
+                        paths["stderr"],
+                        timeout=timeout,
+                        env=env,
+                    )
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+                    worker.stop(grace_period=self.timeout_grace_period)
+                    returncode = worker.process.returncode
+                except RWorkerDied:
+                    died = True
+                    returncode = worker.process.wait() or 1
+                wall_time = time.monotonic() - start
+                rss = worker.get_rss()
+            for name, capture in (("stdout", stdout), ("stderr", stderr)):
+                with contextlib.suppress(FileNotFoundError):
+                    capture.drain(open(paths[name], "rb"))
+        if died:
+            stderr.write(b"\nThe R session exited unexpectedly.\n")
+        stderr.finish()
+        usage = {
+            "wall_time": round(wall_time, 6),
+            "worker_rss": rss,
+            "stdout_bytes": stdout.size,
+            "stderr_bytes": stderr.size,
+        }
+        return ScriptResult(
+            returncode, stdout, stderr, timed_out=timed_out, usage=usage
+        )
+
+    async def execute_script_streaming_async(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        if language != "r" or requirements:
+            return await super().execute_script_streaming_async(
+                language,
+                script,
+                timeout=timeout,
+                requirements=requirements,
+                env=env,
+                log=log,
+            )
+        return await asyncio.to_thread(
+            self.execute_script_streaming,
+            language,
+            script,
+            timeout=timeout,
+            env=env,
+            log=log,
+        )
@@ -1,6 +1,32 @@
+import asyncio
+import contextlib
+import dataclasses
+import fcntl
 import os
+import signal
 import subprocess
 import tempfile
+import time
+from typing import IO, Optional
+
+from .capture import DEFAULT_MEMORY_LIMIT, OutputCapture, start_drain
+from .environments import EnvironmentBuildError, EnvironmentManager
+from .resources import get_limit_args, get_usage, wait_with_rusage
+from .result import ScriptResult
+
+
+def signal_process_group(pid: int, sig: int):
+    """
+    Send ``sig`` to the process group led by ``pid`` so that any grandchildren
+    are signalled too, falling back to ``pid`` alone if it doesn't lead a group.
+    """
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
 
 
 class SubprocessBackend:
@@ -10,6 +36,27 @@ class SubprocessBackend:
         ("posix", "python"): ["/usr/bin/env", "python"],
         ("posix", "r"): ["/usr/bin/env", "Rscript"],
     }
+    # Languages whose interpreter can read the script from an inherited
+    # in-memory file descriptor rather than a temporary file.
+    MEMFD_LANGUAGES = {"python"}
+    # Seconds between asking a timed out script to stop and killing it.
+    DEFAULT_TIMEOUT_GRACE_PERIOD = 10
+
+    def __init__(
+        self,
+        output_memory_limit=DEFAULT_MEMORY_LIMIT,
+        timeout_grace_period=DEFAULT_TIMEOUT_GRACE_PERIOD,
+        resource_limits=None,
+        environments=None,
+        stream_pipe_size=None,
+    ):
+        self.output_memory_limit = output_memory_limit
+        self.timeout_grace_period = timeout_grace_period
+        # See etlman.backends.resources.RESOURCE_LIMITS for the accepted keys.
+        self.resource_limits = resource_limits or {}
+        self.environments = environments or EnvironmentManager()
+        # Bytes buffered between streaming steps (None for the OS default).
+        self.stream_pipe_size = stream_pipe_size
 
     def _get_run_args(self, language: str):
         try:
@@ -17,14 +64,364 @@ class SubprocessBackend:
         except KeyError:
             raise ValueError(f"Language {language} on {os.name} OS is not supported.")
 
-    def execute_script(self, language: str, script: str) -> tuple[int, str, str]:
-        run_args = self._get_run_args(language)
-        with tempfile.NamedTemporaryFile() as f:
-            f.write(script.encode("utf-8"))
-            f.flush()
-            result = subprocess.run([*run_args, f.name], capture_output=True)
-        return (
-            result.returncode,
-            result.stdout.decode("utf-8"),
-            result.stderr.decode("utf-8"),
+    @contextlib.contextmanager
+    def _interpreter(self, language: str, requirements: str):
+        """
+        Yield the run args for ``language``, using a cached environment with
+        ``requirements`` installed if there are any.
+        """
+        if not requirements:
+            yield self._get_run_args(language)
+        elif language != "python":
+            raise ValueError("Requirements are only supported for Python scripts.")
+        else:
+            with self.environments.python(requirements) as python:
+                yield [python]
+
+    def _build_failed(self, error: EnvironmentBuildError, log=None) -> ScriptResult:
+        stderr = self._get_capture(log)
+        stderr.write(f"{error}:\n{error.output}".encode("utf-8"))
+        stderr.finish()
+        return ScriptResult(1, OutputCapture(), stderr)
+
+    @contextlib.contextmanager
+    def _script_file(self, language: str, script: str):
+        """
+        Yield ``(path, pass_fds)`` for the interpreter to read ``script`` from.
+        Where possible the script is kept in an anonymous in-memory file that
+        the child inherits, avoiding a round trip through the filesystem.
+        """
+        if language in self.MEMFD_LANGUAGES and hasattr(os, "memfd_create"):
+            fd = os.memfd_create("etlman-script")
+            try:
+                with open(fd, "wb", closefd=False) as f:
+                    f.write(script.encode("utf-8"))
+                yield f"/proc/self/fd/{fd}", (fd,)
+            finally:
+                os.close(fd)
+        else:
+            with tempfile.NamedTemporaryFile() as f:
+                f.write(script.encode("utf-8"))
+                f.flush()
+                yield f.name, ()
+
+    def _get_env(self, env):
+        """The child's environment: ours, plus ``env`` if given."""
+        return {**os.environ, **env} if env else None
+
+    def _get_capture(self, log=None) -> OutputCapture:
+        """
+        A capture of a script's stdout or stderr, limited to the ``file_size``
+        resource limit, since the rlimit doesn't apply to pipes.
+        """
+        return OutputCapture(
+            memory_limit=self.output_memory_limit,
+            log=log,
+            max_size=self.resource_limits.get("file_size"),
+        )
+
+    def execute_script(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        """
+        Run ``script`` and return its ScriptResult. If it runs for longer than
+        ``timeout`` seconds, its whole process group is sent SIGTERM, then
+        SIGKILL after ``timeout_grace_period`` seconds, and the result is marked
+        as timed out. The script runs with ``resource_limits`` applied, and its
+        resource usage is recorded in ``ScriptResult.usage``.
+
+        Python scripts with ``requirements`` (in pip's requirements file format)
+        run in a cached environment with those requirements installed. ``env``
+        adds environment variables for the script. Lines of stdout and stderr
+        are written to ``log``, a LogWriter, as the script prints them.
+        """
+        result = self.execute_script_streaming(
+            language,
+            script,
+            timeout=timeout,
+            requirements=requirements,
+            env=env,
+            log=log,
+        )
+        with result.stdout, result.stderr:
+            return dataclasses.replace(
+                result, stdout=result.stdout.read(), stderr=result.stderr.read()
+            )
+
+    def execute_script_streaming(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        """
+        Like execute_script(), but stdout and stderr are read incrementally and
+        returned as OutputCapture handles so memory use is bounded by
+        ``output_memory_limit`` regardless of how much the script prints. The
+        caller is responsible for closing the returned handles.
+        """
+        stdout = self._get_capture(log)
+        stderr = self._get_capture(log)
+        with contextlib.ExitStack() as stack:
+            try:
+                run_args = stack.enter_context(
+                    self._interpreter(language, requirements)
+                )
+            except EnvironmentBuildError as e:
+                return self._build_failed(e, log=log)
+            path, pass_fds = stack.enter_context(self._script_file(language, script))
+            start = time.monotonic()
+            process = subprocess.Popen(
+                [*get_limit_args(self.resource_limits), *run_args, path],
+                pass_fds=pass_fds,
+                env=self._get_env(env),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+            readers = [
+                start_drain(stdout, process.stdout),
+                start_drain(stderr, process.stderr),
+            ]
+            timed_out = False
+            try:
+                rusage = wait_with_rusage(process, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                rusage = self._terminate(process)
+            except BaseException:
+                # e.g. Celery's SoftTimeLimitExceeded; don't leave orphans behind.
+                signal_process_group(process.pid, signal.SIGKILL)
+                raise
+            wall_time = time.monotonic() - start
+            for reader in readers:
+                reader.join()
+        usage = get_usage(rusage, wall_time)
+        usage.update(stdout_bytes=stdout.size, stderr_bytes=stderr.size)
+        return ScriptResult(
+            process.returncode, stdout, stderr, timed_out=timed_out, usage=usage
         )
+
+    def execute_streaming_pipeline(self, scripts: list, env=None) -> list:
+        """
+        Run ``scripts`` all at once as a Unix pipeline: each script's stdout is
+        connected to the next one's stdin, e.g. to pass a stream of Arrow
+        record batches along. Each script is a dict of execute_script()
+        arguments (``language``, ``script``, ``timeout`` and
+        ``requirements``); timeouts count from when the pipeline starts.
+
+        Returns a ScriptResult per script. Only the last script's stdout is
+        captured; the others' is the stream itself.
+        """
+        with contextlib.ExitStack() as stack:
+            commands = []
+            for i, spec in enumerate(scripts):
+                try:
+                    run_args = stack.enter_context(
+                        self._interpreter(spec["language"], spec.get("requirements"))
+                    )
+                except EnvironmentBuildError as e:
+                    failed = self._build_failed(e)
+                    not_run = "Not run: another step's requirements failed to install."
+                    return [
+                        dataclasses.replace(
+                            failed, stdout="", stderr=failed.stderr.read()
+                        )
+                        if j == i
+                        else ScriptResult(1, "", not_run)
+                        for j in range(len(scripts))
+                    ]
+                path, pass_fds = stack.enter_context(
+                    self._script_file(spec["language"], spec["script"])
+                )
+                commands.append(([*run_args, path], pass_fds))
+            results = self._run_streaming_pipeline(scripts, commands, env)
+        return results
+
+    def _run_streaming_pipeline(self, scripts, commands, env):
+        processes = []
+        stderrs = []
+        readers = []
+        stdout = self._get_capture()
+        # The previous script's stdout.
+        pipe: Optional[IO[bytes]] = None
+        start = time.monotonic()
+        try:
+            for i, (args, pass_fds) in enumerate(commands):
+                process = subprocess.Popen(
+                    [*get_limit_args(self.resource_limits), *args],
+                    pass_fds=pass_fds,
+                    env=self._get_env(env),
+                    stdin=subprocess.DEVNULL if pipe is None else pipe,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    start_new_session=True,
+                )
+                if pipe is not None:
+                    # Only the two children should hold the pipe between them.
+                    pipe.close()
+                pipe = process.stdout
+                if i < len(commands) - 1:
+                    self._set_pipe_size(process.stdout)
+                processes.append(process)
+                stderrs.append(self._get_capture())
+                readers.append(start_drain(stderrs[-1], process.stderr))
+            readers.append(start_drain(stdout, processes[-1].stdout))
+            exits = []
+            for spec, process in zip(scripts, processes):
+                timeout = spec.get("timeout")
+                remaining = None
+                if timeout is not None:
+                    remaining = max(start + timeout - time.monotonic(), 0)
+                timed_out = False
+                try:
+                    rusage = wait_with_rusage(process, timeout=remaining)
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+                    rusage = self._terminate(process)
+                exits.append((process.returncode, timed_out, rusage, time.monotonic()))
+        except BaseException:
+            for process in processes:
+                signal_process_group(process.pid, signal.SIGKILL)
+            raise
+        for reader in readers:
+            reader.join()
+        results = []
+        for i, (returncode, timed_out, rusage, end) in enumerate(exits):
+            last = i == len(exits) - 1
+            usage = get_usage(rusage, end - start)
+            usage.update(
+                stdout_bytes=stdout.size if last else 0,
+                stderr_bytes=stderrs[i].size,
+            )
+            with stderrs[i]:
+                results.append(
+                    ScriptResult(
+                        returncode,
+                        stdout.read() if last else "",
+                        stderrs[i].read(),
+                        timed_out=timed_out,
+                        usage=usage,
+                    )
+                )
+        stdout.close()
+        return results
+
+    def _set_pipe_size(self, pipe):
+        if self.stream_pipe_size and hasattr(fcntl, "F_SETPIPE_SZ"):
+            with contextlib.suppress(OSError):
+                fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, self.stream_pipe_size)
+
+    def _terminate(self, process: subprocess.Popen):
+        signal_process_group(process.pid, signal.SIGTERM)
+        try:
+            return wait_with_rusage(process, timeout=self.timeout_grace_period)
+        except subprocess.TimeoutExpired:
+            signal_process_group(process.pid, signal.SIGKILL)
+            return wait_with_rusage(process)
+
+    async def execute_script_async(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        """
+        Coroutine version of execute_script() built on asyncio subprocesses,
+        so one event loop can supervise many running scripts at once. The event
+        loop reaps the child itself, so usage only includes wall time and
+        output sizes.
+        """
+        result = await self.execute_script_streaming_async(
+            language,
+            script,
+            timeout=timeout,
+            requirements=requirements,
+            env=env,
+            log=log,
+        )
+        with result.stdout, result.stderr:
+            return dataclasses.replace(
+                result, stdout=result.stdout.read(), stderr=result.stderr.read()
+            )
+
+    async def execute_script_streaming_async(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        """
+        Coroutine version of execute_script_streaming(). The caller is
+        responsible for closing the returned handles.
+        """
+        stdout = self._get_capture(log)
+        stderr = self._get_capture(log)
+        with contextlib.ExitStack() as stack:
+            try:
+                # Building an environment can take a while; don't block the loop.
+                interpreter = self._interpreter(language, requirements)
+                run_args = await asyncio.to_thread(interpreter.__enter__)
+            except EnvironmentBuildError as e:
+                return self._build_failed(e, log=log)
+            stack.push(interpreter)
+            path, pass_fds = stack.enter_context(self._script_file(language, script))
+            start = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *get_limit_args(self.resource_limits),
+                *run_args,
+                path,
+                pass_fds=pass_fds,
+                env=self._get_env(env),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+            readers = asyncio.gather(
+                stdout.drain_async(process.stdout),
+                stderr.drain_async(process.stderr),
+            )
+            timed_out = False
+            try:
+                returncode = await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                returncode = await self._terminate_async(process)
+            except BaseException:
+                signal_process_group(process.pid, signal.SIGKILL)
+                raise
+            wall_time = time.monotonic() - start
+            await readers
+        usage = {
+            "wall_time": round(wall_time, 6),
+            "stdout_bytes": stdout.size,
+            "stderr_bytes": stderr.size,
+        }
+        return ScriptResult(
+            returncode, stdout, stderr, timed_out=timed_out, usage=usage
+        )
+
+    async def _terminate_async(self, process: asyncio.subprocess.Process) -> int:
+        signal_process_group(process.pid, signal.SIGTERM)
+        try:
+            return await asyncio.wait_for(process.wait(), self.timeout_grace_period)
+        except asyncio.TimeoutError:
+            signal_process_group(process.pid, signal.SIGKILL)
+            return await process.wait()
@@ -2,18 +2,88 @@ import random
 
 from faker import Faker
 
+from .result import ScriptResult
+
 
 class TestBackend:
     STDOUT_MARKER = "(stdout)"
     STDERR_MARKER = "(stderr)"
 
-    def execute_script(self, language: str, script: str) -> tuple[int, str, str]:
+    def execute_script(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
         fake = Faker()
         Faker.seed(0)
         fake_stdout = fake.paragraph(nb_sentences=20)
         fake_stderr = fake.paragraph(nb_sentences=20)
-        return (
-            random.randint(0, 10),
-            " ".join([self.STDOUT_MARKER, fake_stdout]),
-            " ".join([self.STDERR_MARKER, fake_stderr]),
+        stdout = " ".join([self.STDOUT_MARKER, fake_stdout])
+        stderr = " ".join([self.STDERR_MARKER, fake_stderr])
+        if log is not None:
+            log.write(f"{stdout}\n{stderr}\n".encode("utf-8"))
+        return ScriptResult(
+            random.randint(0, 10), stdout, stderr, usage={"wall_time": 0.0}
+        )
+
+    def execute_script_streaming(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        # Strings stand in for OutputCaptures; see ScriptResult.tail().
+        return self.execute_script(
+            language,
+            script,
+            timeout=timeout,
+            requirements=requirements,
+            env=env,
+            log=log,
+        )
+
+    def execute_streaming_pipeline(self, scripts: list, env=None) -> list:
+        return [self.execute_script(**script, env=env) for script in scripts]
+
+    async def execute_script_async(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        return self.execute_script(
+            language,
+            script,
+            timeout=timeout,
+            requirements=requirements,
+            env=env,
+            log=log,
+        )
+
+    async def execute_script_streaming_async(
+        self,
+        language: str,
+        script: str,
+        timeout=None,
+        requirements="",
+        env=None,
+        log=None,
+    ) -> ScriptResult:
+        return await self.execute_script_async(
+            language,
+            script,
+            timeout=timeout,
+            requirements=requirements,
+            env=env,
+            log=log,
         )
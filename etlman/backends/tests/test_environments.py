@@ -0,0 +1,88 @@
+import os
+import subprocess
+
+import pytest
+
+from etlman.backends.environments import (
+    READY_MARKER,
+    EnvironmentBuildError,
+    EnvironmentManager,
+    normalize_requirements,
+)
+from etlman.backends.subprocess_backend import SubprocessBackend
+
+
+def test_normalize_requirements():
+    requirements = "pytz\n\n# A comment\nsix==1.16.0  # pinned\npytz\n"
+    assert normalize_requirements(requirements) == ["pytz", "six==1.16.0"]
+
+
+class TestEnvironmentManager:
+    def test_key_ignores_order_and_comments(self, tmp_path):
+        manager = EnvironmentManager(directory=tmp_path)
+        assert manager.get_key("six\npytz") == manager.get_key("# x\npytz\nsix\n")
+        assert manager.get_key("six") != manager.get_key("pytz")
+
+    def test_environment_is_built_once(self, tmp_path):
+        # six is already installed, so pip doesn't need the network.
+        manager = EnvironmentManager(directory=tmp_path)
+        with manager.python("six") as python:
+            assert subprocess.run([python, "-c", "import six"]).returncode == 0
+        marker = tmp_path / manager.get_key("six") / READY_MARKER
+        built = marker.stat().st_ino
+        with manager.python("six"):
+            pass
+        assert marker.stat().st_ino == built
+
+    def test_least_recently_used_environments_are_evicted(self, tmp_path, monkeypatch):
+        def build(self, path, requirements):
+            path.mkdir()
+            (path / READY_MARKER).touch()
+
+        monkeypatch.setattr(EnvironmentManager, "_build", build)
+        manager = EnvironmentManager(directory=tmp_path, max_environments=2)
+        for i, requirements in enumerate(["a", "b", "c"]):
+            with manager.python(requirements):
+                pass
+            os.utime(tmp_path / manager.get_key(requirements) / READY_MARKER, (i, i))
+        manager.evict()
+        remaining = {path.name for path in tmp_path.iterdir() if path.is_dir()}
+        assert remaining == {manager.get_key("b"), manager.get_key("c")}
+
+    def test_failed_build(self, tmp_path, monkeypatch):
+        def build(self, path, requirements):
+            raise EnvironmentBuildError("No matching distribution")
+
+        monkeypatch.setattr(EnvironmentManager, "_build", build)
+        manager = EnvironmentManager(directory=tmp_path)
+        with pytest.raises(EnvironmentBuildError):
+            with manager.python("not-a-package"):
+                pass
+
+
+class TestSubprocessBackendRequirements:
+    def test_script_runs_in_environment(self, tmp_path):
+        backend = SubprocessBackend(environments=EnvironmentManager(tmp_path))
+        script = "import sys\nprint(sys.prefix)"
+        exitcode, stdout, stderr = backend.execute_script(
+            "python", script, requirements="six"
+        )
+        assert exitcode == 0, stderr
+        assert stdout.strip() == str(tmp_path / EnvironmentManager().get_key("six"))
+
+    def test_failed_build_is_a_failed_result(self, tmp_path, monkeypatch):
+        def build(self, path, requirements):
+            raise EnvironmentBuildError("No matching distribution")
+
+        monkeypatch.setattr(EnvironmentManager, "_build", build)
+        backend = SubprocessBackend(environments=EnvironmentManager(tmp_path))
+        exitcode, stdout, stderr = backend.execute_script(
+            "python", "print(1)", requirements="not-a-package"
+        )
+        assert exitcode == 1
+        assert "No matching distribution" in stderr
+
+    def test_requirements_are_python_only(self, tmp_path):
+        backend = SubprocessBackend(environments=EnvironmentManager(tmp_path))
+        with pytest.raises(ValueError):
+            backend.execute_script("r", "print(1)", requirements="six")
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import signal
+import sys
+
+from etlman.backends.forkserver_backend import ForkServerBackend
+
+
+class TestForkServerBackend:
+    LANGUAGE = "python"
+    STDOUT_TEST = "out to stdout"
+    STDERR_TEST = "out to stderr"
+    TEST_SCRIPT = f"""
+import sys
+print("{STDERR_TEST}", file=sys.stderr)
+print("{STDOUT_TEST}", file=sys.stdout)
+sys.exit({{exitcode}})
+"""
+
+    def test_success(self):
+        backend = ForkServerBackend()
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, self.TEST_SCRIPT.format(exitcode=0)
+        )
+        assert stderr.strip() == self.STDERR_TEST
+        assert stdout.strip() == self.STDOUT_TEST
+        assert exitcode == 0
+
+    def test_failure(self):
+        backend = ForkServerBackend()
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, self.TEST_SCRIPT.format(exitcode=1)
+        )
+        assert stderr.strip() == self.STDERR_TEST
+        assert stdout.strip() == self.STDOUT_TEST
+        assert exitcode == 1
+
+    def test_uncaught_exception(self):
+        backend = ForkServerBackend()
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, "raise RuntimeError('boom')"
+        )
+        assert exitcode == 1
+        assert stdout == ""
+        assert "Traceback" in stderr
+        assert stderr.strip().endswith("RuntimeError: boom")
+
+    def test_scripts_do_not_share_state(self):
+        backend = ForkServerBackend()
+        backend.execute_script(self.LANGUAGE, "import json\njson.marker = 1")
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, "import json\nprint(hasattr(json, 'marker'))"
+        )
+        assert exitcode == 0
+        assert stdout.strip() == "False"
+
+    def test_async_success(self):
+        backend = ForkServerBackend()
+        exitcode, stdout, stderr = asyncio.run(
+            backend.execute_script_async(
+                self.LANGUAGE, self.TEST_SCRIPT.format(exitcode=0)
+            )
+        )
+        assert stderr.strip() == self.STDERR_TEST
+        assert stdout.strip() == self.STDOUT_TEST
+        assert exitcode == 0
+
+    def test_env(self):
+        backend = ForkServerBackend()
+        result = backend.execute_script(
+            self.LANGUAGE,
+            "import os\nprint(os.environ['ETLMAN_TEST'])",
+            env={"ETLMAN_TEST": "value"},
+        )
+        assert result.stdout == "value\n"
+        assert "ETLMAN_TEST" not in os.environ
+
+    def test_timeout(self):
+        backend = ForkServerBackend(timeout_grace_period=1)
+        result = backend.execute_script(
+            self.LANGUAGE,
+            "import time\nprint('started', flush=True)\ntime.sleep(30)",
+            timeout=0.5,
+        )
+        assert result.timed_out
+        assert result.returncode == -signal.SIGTERM
+        assert result.stdout == "started\n"
+
+    def test_timeout_outside_the_fork_server(self):
+        """Other languages' scripts time out as in SubprocessBackend."""
+
+        class OtherLanguageBackend(ForkServerBackend):
+            RUN_ARGS = {(os.name, "other"): [sys.executable]}
+
+        backend = OtherLanguageBackend(timeout_grace_period=1)
+        result = backend.execute_script(
+            "other", "import time\ntime.sleep(30)", timeout=0.5
+        )
+        assert result.timed_out
+        assert result.returncode == -signal.SIGTERM
+
+    def test_usage_and_limits(self):
+        backend = ForkServerBackend(resource_limits={"open_files": 64})
+        result = backend.execute_script(
+            self.LANGUAGE,
+            "import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE)[0])",
+        )
+        assert result.stdout.strip() == "64"
+        assert result.usage["max_rss"] > 0
+        assert result.usage["wall_time"] > 0
+        assert result.usage["stdout_bytes"] == 3
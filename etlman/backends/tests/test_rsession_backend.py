@@ -0,0 +1,189 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from etlman.backends.rsession_backend import RSessionBackend
+
+# Speaks the R worker's protocol, so the pool can be tested without R.
+FAKE_WORKER = """
+import contextlib
+import os
+import sys
+
+reply_fd = int(os.environ.pop("ETLMAN_REPLY_FD"))
+for line in sys.stdin:
+    script, stdout, stderr, *env = line.rstrip("\\n").split("\\t")
+    os.environ.update(variable.split("=", 1) for variable in env)
+    status = 0
+    with open(stdout, "w") as out, open(stderr, "w") as err:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                exec(open(script).read(), {"pid": os.getpid(), "reply_fd": reply_fd})
+            except SystemExit as e:
+                status = e.code or 0
+    os.write(reply_fd, f"{status}\\n".encode())
+"""
+
+
+@pytest.fixture
+def fake_backend(tmp_path, monkeypatch):
+    worker = tmp_path / "worker.py"
+    worker.write_text(FAKE_WORKER)
+    monkeypatch.setattr(
+        RSessionBackend, "_get_worker_args", lambda self: (sys.executable, worker)
+    )
+    backends = []
+
+    def make_backend(**kwargs):
+        backend = RSessionBackend(**kwargs)
+        backends.append(backend)
+        return backend
+
+    yield make_backend
+    for backend in backends:
+        backend.get_pool().close()
+
+
+class TestRSessionBackendPool:
+    LANGUAGE = "r"
+
+    def test_workers_are_reused(self, fake_backend):
+        backend = fake_backend(workers=1)
+        pids = {
+            backend.execute_script(self.LANGUAGE, "print(pid)").stdout for _ in "ab"
+        }
+        assert len(pids) == 1
+
+    def test_output_and_exit_status(self, fake_backend):
+        backend = fake_backend()
+        script = "import sys\nprint('out')\nprint('err', file=sys.stderr)\nexit(3)"
+        exitcode, stdout, stderr = backend.execute_script(self.LANGUAGE, script)
+        assert (exitcode, stdout, stderr) == (3, "out\n", "err\n")
+
+    def test_worker_recycled_after_max_scripts(self, fake_backend):
+        backend = fake_backend(workers=1, worker_max_scripts=2)
+        pids = [
+            backend.execute_script(self.LANGUAGE, "print(pid)").stdout for _ in "abc"
+        ]
+        assert pids[0] == pids[1] != pids[2]
+
+    def test_worker_recycled_after_memory_growth(self, fake_backend):
+        backend = fake_backend(workers=1, worker_max_rss=1)
+        pids = {
+            backend.execute_script(self.LANGUAGE, "print(pid)").stdout for _ in "ab"
+        }
+        assert len(pids) == 2
+
+    def test_timeout_replaces_worker(self, fake_backend):
+        backend = fake_backend(workers=1, timeout_grace_period=1)
+        result = backend.execute_script(
+            self.LANGUAGE, "import time\nprint(pid)\ntime.sleep(30)", timeout=0.5
+        )
+        assert result.status == "timeout"
+        exitcode, stdout, stderr = backend.execute_script(self.LANGUAGE, "print(pid)")
+        assert exitcode == 0
+        assert stdout != result.stdout
+
+    def test_worker_exiting_is_a_failure(self, fake_backend):
+        backend = fake_backend(workers=1)
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, "import os\nos._exit(5)"
+        )
+        assert exitcode == 5
+        assert "exited unexpectedly" in stderr
+        assert backend.execute_script(self.LANGUAGE, "print(1)").returncode == 0
+
+    def test_output_to_fd_1_is_not_a_reply(self, fake_backend):
+        backend = fake_backend(workers=1)
+        result = backend.execute_script(
+            self.LANGUAGE, "import os\nos.write(1, b'7\\n')"
+        )
+        assert result.returncode == 0
+
+    def test_bad_reply_replaces_worker(self, fake_backend):
+        backend = fake_backend(workers=1)
+        script = "import os\nprint(pid)\nos.write(reply_fd, b'?\\n')"
+        result = backend.execute_script(self.LANGUAGE, script)
+        assert result.returncode != 0
+        assert "exited unexpectedly" in result.stderr
+        exitcode, stdout, stderr = backend.execute_script(self.LANGUAGE, "print(pid)")
+        assert exitcode == 0
+        assert stdout != result.stdout
+
+    def test_env(self, fake_backend):
+        backend = fake_backend()
+        script = "import os\nprint(os.environ['ETLMAN_TEST'])"
+        result = backend.execute_script(
+            self.LANGUAGE, script, env={"ETLMAN_TEST": "a=b"}
+        )
+        assert result.stdout == "a=b\n"
+
+    def test_python_uses_subprocess(self, fake_backend):
+        backend = fake_backend()
+        exitcode, stdout, stderr = backend.execute_script(
+            "python", "import os\nprint(os.getpid())"
+        )
+        assert exitcode == 0
+        assert int(stdout) != os.getpid()
+
+
+@pytest.mark.skipif(
+    subprocess.run(["which", "Rscript"]).returncode != 0,
+    reason="requires Rscript to be installed",
+)
+class TestRSessionBackend:
+    LANGUAGE = "r"
+    STDOUT_TEST = "out to stdout"
+    STDERR_TEST = "out to stderr"
+    TEST_SCRIPT = f"""
+write("{STDERR_TEST}", stderr())
+write("{STDOUT_TEST}", stdout())
+quit(status={{exitcode}})
+"""
+
+    def test_success(self):
+        backend = RSessionBackend()
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, self.TEST_SCRIPT.format(exitcode=0)
+        )
+        assert stderr.strip() == self.STDERR_TEST
+        assert stdout.strip() == self.STDOUT_TEST
+        assert exitcode == 0
+
+    def test_failure(self):
+        backend = RSessionBackend()
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, self.TEST_SCRIPT.format(exitcode=1)
+        )
+        assert stderr.strip() == self.STDERR_TEST
+        assert stdout.strip() == self.STDOUT_TEST
+        assert exitcode == 1
+
+    def test_error(self):
+        backend = RSessionBackend()
+        exitcode, stdout, stderr = backend.execute_script(self.LANGUAGE, 'stop("no")')
+        assert exitcode == 1
+        assert "no" in stderr
+
+    def test_env_is_restored(self):
+        backend = RSessionBackend(workers=1)
+        script = 'cat(Sys.getenv("ETLMAN_TEST", "unset"))'
+        result = backend.execute_script(self.LANGUAGE, script, env={"ETLMAN_TEST": "1"})
+        assert result.stdout == "1"
+        assert backend.execute_script(self.LANGUAGE, script).stdout == "unset"
+
+    def test_global_environment_is_reset(self):
+        backend = RSessionBackend(workers=1)
+        backend.execute_script(self.LANGUAGE, "x <- 1")
+        exitcode, stdout, stderr = backend.execute_script(
+            self.LANGUAGE, 'cat(exists("x"))'
+        )
+        assert stdout == "FALSE"
+
+    def test_system_output_is_not_a_reply(self):
+        backend = RSessionBackend(workers=1)
+        result = backend.execute_script(self.LANGUAGE, 'system("echo 7")\ncat("ok")')
+        assert result.returncode == 0
+        assert result.stdout == "ok"
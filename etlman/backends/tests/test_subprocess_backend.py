@@ -1,7 +1,15 @@
+import asyncio
+import os
+import signal
 import subprocess
+import tempfile
+import time
 
 import pytest
 
+from etlman.backends import resources
+from etlman.backends.capture import LogWriter, OutputCapture
+from etlman.backends.result import ScriptResult
 from etlman.backends.subprocess_backend import SubprocessBackend
 
 
@@ -34,6 +42,162 @@ sys.exit({{exitcode}})
         assert stdout.strip() == self.STDOUT_TEST
         assert exitcode == 1
 
+    def test_async_success(self):
+        backend = SubprocessBackend()
+        exitcode, stdout, stderr = asyncio.run(
+            backend.execute_script_async(
+                self.LANGUAGE, self.TEST_SCRIPT.format(exitcode=0)
+            )
+        )
+        assert stderr.strip() == self.STDERR_TEST
+        assert stdout.strip() == self.STDOUT_TEST
+        assert exitcode == 0
+
+    def test_async_scripts_run_concurrently(self):
+        backend = SubprocessBackend()
+        script = "import time\ntime.sleep(0.5)\nprint('done')"
+
+        async def run_all():
+            return await asyncio.gather(
+                *(backend.execute_script_async(self.LANGUAGE, script) for _ in range(5))
+            )
+
+        start = time.monotonic()
+        results = asyncio.run(run_all())
+        assert time.monotonic() - start < 2.5
+        assert [tuple(result) for result in results] == [(0, "done\n", "")] * 5
+
+    def test_env(self):
+        backend = SubprocessBackend()
+        script = "import os\nprint(os.environ['ETLMAN_TEST'], os.environ['PATH'] != '')"
+        result = backend.execute_script(
+            self.LANGUAGE, script, env={"ETLMAN_TEST": "value"}
+        )
+        assert result.stdout == "value True\n"
+        result = asyncio.run(
+            backend.execute_script_async(
+                self.LANGUAGE, script, env={"ETLMAN_TEST": "async"}
+            )
+        )
+        assert result.stdout == "async True\n"
+
+    def test_timeout_kills_process_group(self, tmp_path):
+        """
+        A script that outlives its timeout is stopped along with any child it
+        spawned, and its output so far is kept.
+        """
+        marker = tmp_path / "grandchild-survived"
+        script = f"""
+import subprocess, sys, time
+subprocess.Popen([sys.executable, "-c", "import time; time.sleep(2); open({str(marker)!r}, 'w')"])
+print("started", flush=True)
+time.sleep(30)
+"""
+        backend = SubprocessBackend(timeout_grace_period=1)
+        start = time.monotonic()
+        result = backend.execute_script(self.LANGUAGE, script, timeout=0.5)
+        assert time.monotonic() - start < 5
+        assert result.timed_out
+        assert result.status == "timeout"
+        assert result.stdout == "started\n"
+        time.sleep(2.5)
+        assert not marker.exists()
+
+    def test_timeout_escalates_to_sigkill(self):
+        script = """
+import signal, time
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+print("ignoring SIGTERM", flush=True)
+time.sleep(30)
+"""
+        backend = SubprocessBackend(timeout_grace_period=0.5)
+        result = backend.execute_script(self.LANGUAGE, script, timeout=0.5)
+        assert result.timed_out
+        assert result.returncode == -signal.SIGKILL
+
+    def test_async_timeout(self):
+        backend = SubprocessBackend(timeout_grace_period=1)
+        result = asyncio.run(
+            backend.execute_script_async(
+                self.LANGUAGE, "import time\ntime.sleep(30)", timeout=0.5
+            )
+        )
+        assert result.timed_out
+        assert result.returncode == -signal.SIGTERM
+
+    def test_usage_is_recorded(self):
+        backend = SubprocessBackend()
+        script = "x = bytearray(50 * 1024 * 1024)\nprint('allocated')"
+        result = backend.execute_script(self.LANGUAGE, script)
+        assert result.returncode == 0
+        assert result.usage["max_rss"] > 50 * 1024 * 1024
+        assert result.usage["wall_time"] > 0
+        assert result.usage["user_time"] >= 0
+        assert result.usage["system_time"] >= 0
+        assert result.usage["stdout_bytes"] == len("allocated\n")
+        assert result.usage["stderr_bytes"] == 0
+
+    def test_address_space_limit(self):
+        backend = SubprocessBackend(
+            resource_limits={"address_space": 512 * 1024 * 1024}
+        )
+        result = backend.execute_script(
+            self.LANGUAGE, "x = bytearray(1024 * 1024 * 1024)"
+        )
+        assert result.returncode == 1
+        assert "MemoryError" in result.stderr
+
+    def test_cpu_time_limit(self):
+        backend = SubprocessBackend(resource_limits={"cpu_time": 1})
+        result = backend.execute_script(self.LANGUAGE, "while True: pass")
+        assert result.returncode < 0
+        assert result.usage["user_time"] + result.usage["system_time"] >= 0.9
+
+    def test_file_size_limit(self, tmp_path):
+        backend = SubprocessBackend(resource_limits={"file_size": 1024})
+        script = f"""
+import signal
+signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+with open({str(tmp_path / "out")!r}, "wb") as f:
+    f.write(b"x" * 4096)
+"""
+        result = backend.execute_script(self.LANGUAGE, script)
+        assert result.returncode == 1
+        assert "File too large" in result.stderr
+
+    def test_output_size_limit(self):
+        backend = SubprocessBackend(resource_limits={"file_size": 1024})
+        result = backend.execute_script(self.LANGUAGE, "print('x' * 4095)")
+        assert result.returncode == 0
+        assert result.stdout == "x" * 1024 + (
+            "\n[3072 more bytes of output were discarded]\n"
+        )
+
+    def test_limits_without_prlimit(self, monkeypatch):
+        monkeypatch.setattr(resources, "_find_prlimit", lambda: None)
+        backend = SubprocessBackend(resource_limits={"open_files": 64})
+        script = "import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE))"
+        result = backend.execute_script(self.LANGUAGE, script)
+        assert result.stdout == "(64, 64)\n", result.stderr
+
+    @pytest.mark.skipif(
+        not hasattr(os, "memfd_create"), reason="requires memfd_create()"
+    )
+    def test_script_delivered_without_temporary_file(self, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("temporary file created")
+
+        monkeypatch.setattr(tempfile, "NamedTemporaryFile", fail)
+        open_fds = len(os.listdir("/proc/self/fd"))
+        backend = SubprocessBackend()
+        result = backend.execute_script(
+            self.LANGUAGE, "import sys\nprint(sys.argv[0])\nprint('héllo')"
+        )
+        assert result.returncode == 0
+        assert result.stdout.splitlines()[0].startswith("/proc/self/fd/")
+        assert result.stdout.splitlines()[1] == "héllo"
+        assert len(os.listdir("/proc/self/fd")) == open_fds
+
 
 @pytest.mark.skipif(
     subprocess.run(["which", "Rscript"]).returncode != 0,
@@ -66,3 +230,137 @@ quit(status={{exitcode}})
         assert stderr.strip() == self.STDERR_TEST
         assert stdout.strip() == self.STDOUT_TEST
         assert exitcode == 1
+
+
+class TestStreamingSubprocessBackend:
+    LANGUAGE = "python"
+
+    def test_large_output_spills_to_disk(self):
+        backend = SubprocessBackend(output_memory_limit=1024)
+        script = "import sys\nsys.stdout.write('x' * 100000)\n"
+        exitcode, stdout, stderr = backend.execute_script_streaming(
+            self.LANGUAGE, script
+        )
+        with stdout, stderr:
+            assert exitcode == 0
+            assert stdout.spilled
+            assert not stderr.spilled
+            assert stdout.size == 100000
+            assert stdout.read() == "x" * 100000
+            assert stderr.read() == ""
+
+    def test_tail_of_spilled_output(self):
+        backend = SubprocessBackend(output_memory_limit=1024)
+        script = "import sys\nsys.stdout.write('x' * 100000 + '☃end')\n"
+        result = backend.execute_script_streaming(self.LANGUAGE, script)
+        tail = result.tail(5)
+        assert tail.stdout == "end"
+        assert tail.stderr == ""
+        assert tail.truncated
+        result = backend.execute_script_streaming(self.LANGUAGE, script)
+        assert result.tail(6).stdout == "☃end"
+
+    def test_tail_of_strings(self):
+        result = ScriptResult(0, "short", "snowman ☃")
+        tail = result.tail(5)
+        assert tail.stdout == "short"
+        assert tail.stderr == "n ☃"
+        assert result.tail(4).stderr == " ☃"
+        assert result.tail(3).stderr == "☃"
+        assert result.tail(2).stderr == ""
+        assert tail.truncated
+        assert not result.tail(100).truncated
+
+    def test_invalid_utf8_is_replaced(self):
+        backend = SubprocessBackend()
+        script = "import sys\nsys.stdout.buffer.write(b'ok \\xff\\xfe done')\n"
+        exitcode, stdout, stderr = backend.execute_script(self.LANGUAGE, script)
+        assert exitcode == 0
+        assert stdout == "ok �� done"
+
+    def test_multibyte_character_split_across_chunks(self):
+        capture = OutputCapture()
+        encoded = "café ☃".encode("utf-8")
+        for byte in encoded:
+            capture.write(bytes([byte]))
+        capture.finish()
+        with capture:
+            assert capture.read() == "café ☃"
+
+    def test_output_is_logged_as_lines(self, tmp_path):
+        """
+        Lines of stdout and stderr are logged while the script runs, and only
+        whole lines, so the two streams' lines aren't mixed up.
+        """
+        backend = SubprocessBackend()
+        path = tmp_path / "log"
+        script = (
+            "import sys, time\n"
+            "print('first', flush=True)\n"
+            f"while not open({str(path)!r}).read(): time.sleep(0.01)\n"
+            "sys.stderr.write('err'); sys.stderr.flush()\n"
+            "print('second', end='')\n"
+        )
+        with LogWriter(path) as log:
+            result = backend.execute_script(self.LANGUAGE, script, log=log)
+        assert result.returncode == 0, result.stderr
+        lines = path.read_text().splitlines()
+        assert lines[0] == "first"
+        assert sorted(lines[1:]) == ["err", "second"]
+
+    def test_long_lines_are_logged_in_pieces(self, tmp_path):
+        path = tmp_path / "log"
+        with LogWriter(path, max_line_size=4) as log:
+            capture = OutputCapture(log=log)
+            capture.write(b"ab")
+            assert path.read_bytes() == b""
+            capture.write(b"cdef")
+            assert path.read_bytes() == b"abcdef"
+            capture.write(b"g\nh")
+            assert path.read_bytes() == b"abcdefg\n"
+            capture.finish()
+        assert path.read_bytes() == b"abcdefg\nh\n"
+
+
+class TestStreamingPipelineSubprocessBackend:
+    LANGUAGE = "python"
+
+    def test_scripts_are_piped_together(self):
+        backend = SubprocessBackend()
+        scripts = [
+            "import sys\nfor i in range(3): print(i)\nprint('done', file=sys.stderr)",
+            "import sys\nfor line in sys.stdin: print(int(line) * 2)",
+            "import sys\nprint(sum(int(line) for line in sys.stdin))",
+        ]
+        results = backend.execute_streaming_pipeline(
+            [{"language": self.LANGUAGE, "script": script} for script in scripts]
+        )
+        assert [result.returncode for result in results] == [0, 0, 0]
+        assert [result.stdout for result in results] == ["", "", "6\n"]
+        assert results[0].stderr == "done\n"
+
+    def test_pipe_size(self):
+        backend = SubprocessBackend(stream_pipe_size=256 * 1024)
+        scripts = [
+            "print(1)",
+            "import fcntl\nprint(fcntl.fcntl(0, fcntl.F_GETPIPE_SZ))",
+        ]
+        results = backend.execute_streaming_pipeline(
+            [{"language": self.LANGUAGE, "script": script} for script in scripts]
+        )
+        assert results[1].stdout == f"{256 * 1024}\n"
+
+    def test_timeout(self):
+        backend = SubprocessBackend(timeout_grace_period=1)
+        scripts = [
+            {
+                "language": self.LANGUAGE,
+                "script": "import time\ntime.sleep(30)",
+                "timeout": 0.5,
+            },
+            {"language": self.LANGUAGE, "script": "import sys\nsys.stdin.read()"},
+        ]
+        start = time.monotonic()
+        results = backend.execute_streaming_pipeline(scripts)
+        assert time.monotonic() - start < 5
+        assert [result.status for result in results] == ["timeout", "success"]
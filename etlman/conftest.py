@@ -9,6 +9,17 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def runs_dir(settings, tmpdir):
+    # Failed runs keep their scratch directories to be resumed from.
+    settings.ETLMAN_RUNS_DIR = tmpdir.join("runs").strpath
+
+
+@pytest.fixture(autouse=True)
+def logs_dir(settings, tmpdir):
+    settings.ETLMAN_LOGS_DIR = tmpdir.join("logs").strpath
+
+
 @pytest.fixture
 def user() -> User:
     return UserFactory()
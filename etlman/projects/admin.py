@@ -1,6 +1,7 @@
 from django.contrib import admin
 from simple_history.admin import SimpleHistoryAdmin
 
+from . import tasks
 from .models import (
     Collaborator,
     DataInterface,
@@ -42,6 +43,14 @@ class PipelineAdmin(SimpleHistoryAdmin):
     inlines = [
         StepInline,
     ]
+    actions = ["run_pipelines"]
+
+    @admin.action(description="Run selected pipelines")
+    def run_pipelines(self, request, queryset):
+        # One worker runs them all, sharing ETLMAN_MAX_CONCURRENT_STEPS.
+        pipeline_ids = list(queryset.values_list("pk", flat=True))
+        tasks.run_pipelines.delay(pipeline_ids)
+        self.message_user(request, f"Running {len(pipeline_ids)} pipeline(s).")
 
 
 class StepAdmin(SimpleHistoryAdmin):
@@ -57,8 +66,8 @@ class PipelineScheduleAdmin(SimpleHistoryAdmin):
 
 
 class PipelineRunAdmin(admin.ModelAdmin):
-    list_display = ["pipeline", "started_at", "ended_at", "output"]
-    list_filter = ("started_at", "ended_at")
+    list_display = ["pipeline", "status", "started_at", "ended_at", "heartbeat_at"]
+    list_filter = ("status", "started_at", "ended_at")
 
 
 admin.site.register(Project, ProjectAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "etlman.projects"
+
+    def ready(self):
+        import etlman.projects.signals  # noqa F401
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class EngineRegistry:
+    """
+    SQLAlchemy engines shared by everything in this process that connects to
+    a data interface, one per connection string, so connections are pooled
+    instead of opened (and leaked) per query.
+
+    At most ``max_engines`` engines are kept; the least recently used is
+    disposed, closing its pooled connections, to make room for a new one, as
+    is any engine unused for ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, max_engines, pool_size, max_overflow, idle_timeout):
+        self.max_engines = max_engines
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        # Keyed by a hash so connection strings, and their passwords, aren't
+        # kept around as keys.
+        self._engines = OrderedDict()
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(connection_string: str) -> str:
+        return hashlib.sha256(connection_string.encode("utf-8")).hexdigest()
+
+    def create_engine(self, connection_string: str):
+        url = make_url(connection_string)
+        options = {"pool_pre_ping": True}
+        # SQLite uses pools without a size, which reject these options.
+        if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+            options.update(
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_recycle=self.idle_timeout,
+            )
+        return create_engine(url, **options)
+
+    def get(self, connection_string: str):
+        """The engine for ``connection_string``, created if need be."""
+        key = self.get_key(connection_string)
+        now = time.monotonic()
+        with self._lock:
+            self._dispose_idle(now)
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = self.create_engine(connection_string)
+                self._engines[key] = engine
+                while len(self._engines) > self.max_engines:
+                    self._dispose(next(iter(self._engines)))
+            self._engines.move_to_end(key)
+            self._last_used[key] = now
+            return engine
+
+    def get_capacity(self, engine):
+        """
+        The most connections ``engine`` can have open at once, or None if its
+        pool doesn't limit them (e.g. SQLite's).
+        """
+        if not isinstance(engine.pool, QueuePool) or self.max_overflow < 0:
+            return None
+        return self.pool_size + self.max_overflow
+
+    def _dispose_idle(self, now):
+        for key, last_used in list(self._last_used.items()):
+            if now - last_used > self.idle_timeout:
+                self._dispose(key)
+
+    def _dispose(self, key):
+        # Connections still checked out are closed as they're returned.
+        self._engines.pop(key).dispose()
+        del self._last_used[key]
+
+    def dispose(self):
+        with self._lock:
+            for key in list(self._engines):
+                self._dispose(key)
+
+    def forget(self):
+        """
+        Drop the engines without closing their connections, which belong to
+        the parent after a fork.
+        """
+        self._engines.clear()
+        self._last_used.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> EngineRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = EngineRegistry(
+                max_engines=settings.ETLMAN_MAX_ENGINES,
+                pool_size=settings.ETLMAN_ENGINE_POOL_SIZE,
+                max_overflow=settings.ETLMAN_ENGINE_MAX_OVERFLOW,
+                idle_timeout=settings.ETLMAN_ENGINE_IDLE_TIMEOUT,
+            )
+        return _registry
+
+
+def get_engine(connection_string: str):
+    """The shared engine for a data interface's connection string."""
+    return get_registry().get(connection_string)
+
+
+def get_capacity(engine):
+    """The most connections a shared engine can have open at once, or None."""
+    return get_registry().get_capacity(engine)
+
+
+def dispose_engines():
+    """Close every pooled connection, e.g. before dropping a database."""
+    if _registry is not None:
+        _registry.dispose()
+
+
+def _forget_engines():
+    if _registry is not None:
+        _registry.forget()
+
+
+# Celery's prefork workers mustn't share the parent's pooled connections.
+os.register_at_fork(after_in_child=_forget_engines)
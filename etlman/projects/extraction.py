@@ -0,0 +1,312 @@
+import datetime
+import decimal
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from sqlalchemy import and_, bindparam
+from sqlalchemy import column as sql_column
+from sqlalchemy import func, literal_column, or_, select, text
+
+from etlman.projects.engines import get_capacity, get_engine
+
+# Environment variable through which steps find the extracted input.
+INPUT_PATH_VARIABLE = "ETLMAN_INPUT_PATH"
+# Precision of extracted decimals, the most decimal128 allows, and their least
+# scale, leaving 20 digits before the decimal point (as Spark does).
+DECIMAL_PRECISION = 38
+DECIMAL_SCALE = 18
+
+
+class BatchConverter:
+    """
+    Converts batches of rows to Arrow record batches with one schema, inferred
+    from the first batch. Columns with no values to infer a type from take
+    their type from ``types``, if given, or become strings. Decimals are
+    widened to the greatest precision and a generous scale, so later batches'
+    larger values, or values with more decimal places, fit.
+    """
+
+    def __init__(self, column_names, types=None):
+        self.column_names = list(column_names)
+        self.types = types or {}
+        self.schema = None
+
+    def _infer_schema(self, columns):
+        fields = []
+        for name, values in zip(self.column_names, columns):
+            type_ = pa.array(values).type
+            if pa.types.is_null(type_):
+                type_ = self.types.get(name, pa.string())
+            elif pa.types.is_decimal(type_):
+                scale = max(type_.scale, DECIMAL_SCALE)
+                type_ = pa.decimal128(DECIMAL_PRECISION, scale)
+            fields.append(pa.field(name, type_))
+        return pa.schema(fields)
+
+    def convert(self, rows) -> pa.RecordBatch:
+        columns = list(zip(*rows)) or [[] for _ in self.column_names]
+        if self.schema is None:
+            self.schema = self._infer_schema(columns)
+        arrays = []
+        for field, values in zip(self.schema, columns):
+            if pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+def get_arrow_types(schema) -> dict:
+    """
+    Map column names in a data interface's schema to Arrow types, where they
+    can be parsed.
+    """
+    types = {}
+    for column in schema or []:
+        try:
+            types[column["name"]] = pa.type_for_alias(column["type"])
+        except ValueError:
+            pass
+    return types
+
+
+def dump_watermark(column: str, value):
+    """A JSON-serializable record of the highest ``value`` seen in ``column``."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return {
+            "column": column,
+            "type": type(value).__name__,
+            "value": value.isoformat(),
+        }
+    if isinstance(value, decimal.Decimal):
+        return {"column": column, "type": "decimal", "value": str(value)}
+    return {"column": column, "type": None, "value": value}
+
+
+def load_watermark(watermark: dict):
+    parsers: dict = {
+        "datetime": datetime.datetime.fromisoformat,
+        "date": datetime.date.fromisoformat,
+        "decimal": decimal.Decimal,
+    }
+    parse = parsers.get(watermark["type"])
+    return parse(watermark["value"]) if parse else watermark["value"]
+
+
+def get_source(sql_query: str, name="etlman_source"):
+    """Select everything from ``sql_query``, as a subquery."""
+    # Colons are escaped so text() doesn't take them for bind parameters, and
+    # the query ends in a newline so a trailing -- comment ends before the
+    # closing parenthesis.
+    query = sql_query.strip().rstrip(";").replace(":", "\\:")
+    source = text(f"{query}\n")
+    return select(literal_column("*")).select_from(source.columns().subquery(name))
+
+
+def get_query(data_interface, watermark=None):
+    """
+    The data interface's query as a SQLAlchemy select, restricted to rows past
+    ``watermark`` if it has a watermark column and a watermark for that column
+    is given.
+    """
+    query = get_source(data_interface.sql_query)
+    column = data_interface.watermark_column
+    if column and watermark and watermark.get("column") == column:
+        value = load_watermark(watermark)
+        query = query.where(sql_column(column) > bindparam("watermark", value))
+    return query
+
+
+def get_partitions(connection, data_interface, query) -> list:
+    """
+    Split ``query`` into up to ``partition_count`` queries over ranges of the
+    partition column, found from its minimum and maximum values. Rows where
+    it is NULL go in the first partition.
+    """
+    column = sql_column(data_interface.partition_column)
+    count = data_interface.partition_count
+    lowest, highest = connection.execute(
+        select(func.min(column), func.max(column)).select_from(
+            query.subquery("etlman_partitioned")
+        )
+    ).one()
+    if lowest is None:
+        return [query]
+    try:
+        if isinstance(lowest, int):
+            size = max(-(-(highest - lowest + 1) // count), 1)
+        else:
+            size = (highest - lowest) / count
+        bounds = [lowest + size * i for i in range(count)]
+    except TypeError:
+        raise ValueError(
+            f"Can't split {data_interface.partition_column} values like "
+            f"{lowest!r} into ranges."
+        )
+    bounds = sorted(set(bound for bound in bounds if bound <= highest))
+    partitions = []
+    for i, lower in enumerate(bounds):
+        condition = column >= lower
+        if i + 1 < len(bounds):
+            condition = and_(condition, column < bounds[i + 1])
+        if i == 0:
+            condition = or_(condition, column.is_(None))
+        partitions.append(query.where(condition))
+    return partitions
+
+
+def write_parquet(result, path, batch_size, watermark_column=None, types=None):
+    """
+    Write ``result`` to a Parquet file at ``path`` a batch at a time, returning
+    the number of rows and the highest value of ``watermark_column``.
+    """
+    converter = BatchConverter(result.keys(), types)
+    writer = None
+    rows = 0
+    highest = None
+    try:
+        for batch in result.partitions(batch_size):
+            record_batch = converter.convert(batch)
+            if writer is None:
+                writer = pq.ParquetWriter(path, converter.schema)
+            writer.write_batch(record_batch)
+            rows += record_batch.num_rows
+            if watermark_column:
+                value = pc.max(record_batch.column(watermark_column)).as_py()
+                if highest is None or (value is not None and value > highest):
+                    highest = value
+        if writer is None:
+            # No rows; still write the columns for steps to read.
+            writer = pq.ParquetWriter(path, converter.convert([]).schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, highest
+
+
+def get_empty_columns(path) -> set:
+    """
+    The names of the columns in a Parquet file that have no values, going by
+    its statistics.
+    """
+    metadata = pq.read_metadata(path)
+    empty = set()
+    for i in range(metadata.num_columns):
+        nulls = 0
+        for j in range(metadata.num_row_groups):
+            statistics = metadata.row_group(j).column(i).statistics
+            if statistics is None or not statistics.has_null_count:
+                break
+            nulls += statistics.null_count
+        else:
+            if nulls == metadata.num_rows:
+                empty.add(metadata.schema.column(i).name)
+    return empty
+
+
+def unify_schemas(paths, batch_size):
+    """
+    Rewrite files so columns have one type across all of them. A column with
+    no values in a file, which could only be given a type by default, takes
+    its type from the files that do have values for it. Columns otherwise
+    typed differently by different files become strings.
+    """
+    schemas = {path: pq.read_schema(path) for path in paths}
+    types: dict = {}
+    empty_types: dict = {}
+    for path, schema in schemas.items():
+        empty = get_empty_columns(path)
+        for field in schema:
+            found = empty_types if field.name in empty else types
+            found.setdefault(field.name, set()).add(field.type)
+    unified_types = {
+        name: found.pop() if len(found) == 1 else pa.string()
+        for name, found in {**empty_types, **types}.items()
+    }
+    for path, schema in schemas.items():
+        unified = pa.schema(
+            pa.field(name, unified_types[name]) for name in schema.names
+        )
+        if not schema.equals(unified):
+            rewrite_parquet(path, unified, batch_size)
+
+
+def rewrite_parquet(path, schema, batch_size):
+    """Cast a Parquet file to ``schema`` in place, a batch at a time."""
+    path = Path(path)
+    rewritten = path.with_name(f"{path.name}.tmp")
+    with pq.ParquetWriter(rewritten, schema) as writer:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            writer.write_batch(batch.cast(schema))
+    rewritten.replace(path)
+
+
+def extract(data_interface, directory, batch_size=None, watermark=None) -> dict:
+    """
+    Run the data interface's query and write the result to Parquet files in
+    ``directory``, one row group per batch of ``batch_size`` rows. Rows are
+    fetched through a server-side cursor where the database supports one, so
+    only one batch per connection is held in memory at a time.
+
+    If the data interface has a watermark column, only rows where it is
+    greater than ``watermark`` (from a previous extraction) are extracted, and
+    the new watermark is returned with the extraction.
+
+    If it has a partition column, the query is split into ranges of that
+    column which are extracted in parallel, over at most ``max_connections``
+    connections (and no more than the engine's pool holds), each to its own
+    file.
+    """
+    batch_size = batch_size or settings.ETLMAN_EXTRACT_BATCH_SIZE
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    column = data_interface.watermark_column
+    engine = get_engine(data_interface.connection_string)
+    # Types from the data interface's schema, for columns a batch doesn't
+    # have values to type by.
+    types = get_arrow_types(data_interface.schema)
+
+    def extract_partition(i, query):
+        path = directory / f"part-{i:04d}.parquet"
+        with engine.connect() as connection:
+            connection = connection.execution_options(
+                stream_results=True, max_row_buffer=batch_size
+            )
+            if query is None:
+                result = connection.exec_driver_sql(data_interface.sql_query)
+            else:
+                result = connection.execute(query)
+            return path, *write_parquet(result, path, batch_size, column, types)
+
+    query = get_query(data_interface, watermark)
+    if data_interface.partition_column and data_interface.partition_count > 1:
+        with engine.connect() as connection:
+            queries = get_partitions(connection, data_interface, query)
+    elif query.whereclause is not None:
+        queries = [query]
+    else:
+        # Run the query as written.
+        queries = [None]
+    # More workers than pooled connections would wait on the pool, and time out.
+    workers = min(len(queries), data_interface.max_connections)
+    capacity = get_capacity(engine)
+    if capacity is not None:
+        workers = min(workers, capacity)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(extract_partition, *zip(*enumerate(queries))))
+    if len(parts) > 1:
+        unify_schemas([path for path, _, _ in parts], batch_size)
+    extraction = {
+        "path": str(directory),
+        "rows": sum(rows for _, rows, _ in parts),
+        "partitions": [rows for _, rows, _ in parts],
+    }
+    if column:
+        values = [highest for _, _, highest in parts if highest is not None]
+        extraction["watermark"] = (
+            dump_watermark(column, max(values)) if values else watermark
+        )
+    return extraction
@@ -1,3 +1,5 @@
+from typing import cast
+
 from django import forms
 
 from .models import DataInterface, Pipeline, PipelineSchedule, Project, Step
@@ -18,7 +20,7 @@ class PipelineForm(forms.ModelForm):
 
     class Meta:
         model = Pipeline
-        fields = ["name"]
+        fields = ["name", "streaming", "distributed"]
         labels = {"name": "Pipeline name"}
 
 
@@ -27,17 +29,54 @@ class DataInterfaceForm(forms.ModelForm):
 
     class Meta:
         model = DataInterface
-        fields = ["name", "interface_type", "connection_string", "sql_query"]
+        fields = [
+            "name",
+            "interface_type",
+            "connection_string",
+            "sql_query",
+            "watermark_column",
+            "partition_column",
+            "partition_count",
+            "max_connections",
+        ]
         labels = {"name": "Data interface name", "sql_query": "SQL query"}
         widgets = {
             "connection_string": forms.Textarea(attrs={"rows": 3}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only outputs, which load into a table, can do without a query.
+        self.fields["sql_query"].required = True
+        # Leaving these out keeps the defaults: one unpartitioned query.
+        for name in ("partition_count", "max_connections"):
+            self.fields[name].required = False
+
+    def clean(self):
+        super().clean()
+        cleaned_data = self.cleaned_data
+        for name in ("partition_count", "max_connections"):
+            if cleaned_data.get(name) is None:
+                # The model field's default.
+                cleaned_data[name] = self.fields[name].initial
+        return cleaned_data
+
 
 class StepForm(forms.ModelForm):
     class Meta:
         model = Step
-        fields = ["name", "language", "script"]
+        fields = [
+            "name",
+            "language",
+            "script",
+            "requirements",
+            "timeout",
+            "cache_ttl",
+            "on_failure",
+            "max_retries",
+            "retry_delay",
+            "depends_on",
+        ]
         # Customize widget for 'script' field:
         # https://stackoverflow.com/a/22250192/166053
         widgets = {
@@ -45,8 +84,44 @@ class StepForm(forms.ModelForm):
             "language": forms.Select(
                 attrs={"onchange": "selectedLanguage(this.value);"}
             ),
+            "requirements": forms.Textarea(attrs={"rows": 3}),
+            "depends_on": forms.CheckboxSelectMultiple(),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Leaving these out keeps the defaults: fail fast, without retrying.
+        for name in ("on_failure", "max_retries", "retry_delay"):
+            self.fields[name].required = False
+        # A step can only depend on the other steps of its pipeline; a new
+        # step's pipeline may not exist yet.
+        steps = Step.objects.none()
+        if self.instance.pipeline_id:
+            steps = self.instance.pipeline.steps.exclude(pk=self.instance.pk)
+        depends_on = cast(forms.ModelMultipleChoiceField, self.fields["depends_on"])
+        depends_on.queryset = steps.order_by("step_order")
+
+    def clean(self):
+        super().clean()
+        cleaned_data = self.cleaned_data
+        for name in ("on_failure", "max_retries", "retry_delay"):
+            if cleaned_data.get(name) in (None, ""):
+                # The model field's default.
+                cleaned_data[name] = self.fields[name].initial
+        if (
+            cleaned_data.get("requirements")
+            and cleaned_data.get("language") != "python"
+        ):
+            self.add_error(
+                "requirements", "Requirements are only supported for Python steps."
+            )
+        if self.instance.pk and any(
+            self.instance in dependency.get_upstream()
+            for dependency in cleaned_data.get("depends_on", [])
+        ):
+            self.add_error("depends_on", "Steps can't depend on each other in a cycle.")
+        return cleaned_data
+
 
 class PipelineScheduleForm(forms.ModelForm):
     class Meta:
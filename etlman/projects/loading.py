@@ -0,0 +1,102 @@
+import io
+import uuid
+from pathlib import Path
+
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+from django.conf import settings
+from sqlalchemy import Column, MetaData, Table, and_, exists, select
+
+from etlman.projects.engines import get_engine
+
+# Environment variable through which steps find where to write the output.
+OUTPUT_PATH_VARIABLE = "ETLMAN_OUTPUT_PATH"
+
+
+def get_upsert_keys(data_interface) -> list:
+    return [key.strip() for key in data_interface.upsert_keys.split(",") if key.strip()]
+
+
+def get_table(connection, name: str) -> Table:
+    """Reflect the table ``name``, which may be qualified by a schema."""
+    schema, _, table_name = name.rpartition(".")
+    return Table(
+        table_name, MetaData(), schema=schema or None, autoload_with=connection
+    )
+
+
+def copy_rows(connection, table, dataset, columns, batch_size) -> int:
+    """
+    Insert the rows of ``dataset`` into ``table`` a batch at a time, with
+    COPY FROM STDIN on PostgreSQL and executemany elsewhere.
+    """
+    rows = 0
+    if connection.dialect.name == "postgresql":
+        preparer = connection.dialect.identifier_preparer
+        sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+            preparer.format_table(table),
+            ", ".join(preparer.quote(column) for column in columns),
+        )
+        cursor = connection.connection.cursor()
+        write_options = pa_csv.WriteOptions(include_header=False)
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+            # Strings are always quoted, so only NULLs are written unquoted
+            # and empty, which COPY reads as NULL.
+            buffer = io.BytesIO()
+            pa_csv.write_csv(batch, buffer, write_options)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            rows += batch.num_rows
+        return rows
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            connection.execute(table.insert(), batch.to_pylist())
+            rows += batch.num_rows
+    return rows
+
+
+def load(data_interface, directory, batch_size=None) -> dict:
+    """
+    Load the Parquet files in (or under) ``directory`` into the data interface's target
+    table, in one transaction. Columns are matched by name.
+
+    If the data interface has upsert keys, rows are loaded into a temporary
+    staging table first, then rows of the target table with the same keys
+    are replaced by them.
+    """
+    batch_size = batch_size or settings.ETLMAN_LOAD_BATCH_SIZE
+    name = data_interface.target_table
+    paths = sorted(str(path) for path in Path(directory).glob("**/*.parquet"))
+    if not paths:
+        return {"table": name, "rows": 0}
+    dataset = ds.dataset(paths, format="parquet")
+    columns = dataset.schema.names
+    keys = get_upsert_keys(data_interface)
+    with get_engine(data_interface.connection_string).begin() as connection:
+        table = get_table(connection, name)
+        missing = [column for column in {*columns, *keys} if column not in table.c]
+        if missing:
+            raise ValueError(f"{name} has no column(s) {', '.join(sorted(missing))}.")
+        if not keys:
+            rows = copy_rows(connection, table, dataset, columns, batch_size)
+            return {"table": name, "rows": rows}
+        staging = Table(
+            f"etlman_staging_{uuid.uuid4().hex[:12]}",
+            MetaData(),
+            *(Column(column, table.c[column].type) for column in columns),
+            prefixes=["TEMPORARY"],
+        )
+        staging.create(connection)
+        rows = copy_rows(connection, staging, dataset, columns, batch_size)
+        connection.execute(
+            table.delete().where(
+                exists().where(and_(*(table.c[key] == staging.c[key] for key in keys)))
+            )
+        )
+        connection.execute(
+            table.insert().from_select(
+                columns, select(*(staging.c[column] for column in columns))
+            )
+        )
+        staging.drop(connection)
+    return {"table": name, "rows": rows, "upsert_keys": keys}
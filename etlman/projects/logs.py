@@ -0,0 +1,54 @@
+import contextlib
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+
+from etlman.backends.capture import LogWriter
+
+
+def get_log_path(run_id, step_id) -> Path:
+    return Path(settings.ETLMAN_LOGS_DIR) / f"run-{run_id}" / f"step-{step_id}.log"
+
+
+def open_log(run_id, step_id) -> LogWriter:
+    """
+    Open the log of a step of a pipeline run for appending its stdout and
+    stderr to, a line at a time, as the step runs.
+    """
+    path = get_log_path(run_id, step_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return LogWriter(path, max_line_size=settings.ETLMAN_LOG_CHUNK_SIZE)
+
+
+def read_log(run_id, step_id, offset=0, limit=None):
+    """
+    Read up to ``limit`` bytes of a step's log from byte ``offset``, returning
+    the text and the offset to read from next. Only whole lines are returned,
+    unless a line is longer than ``limit``, so readers can follow a log that
+    is still being written without fetching all of it each time.
+    """
+    limit = limit or settings.ETLMAN_LOG_CHUNK_SIZE
+    try:
+        with open(get_log_path(run_id, step_id), "rb") as f:
+            f.seek(offset)
+            data = f.read(limit)
+    except FileNotFoundError:
+        return "", offset
+    end = data.rfind(b"\n") + 1
+    if end or len(data) < limit:
+        data = data[:end]
+    return data.decode("utf-8", errors="replace"), offset + len(data)
+
+
+def get_logged_run_ids() -> set:
+    """The IDs of the runs that have logs."""
+    run_ids = set()
+    for path in Path(settings.ETLMAN_LOGS_DIR).glob("run-*"):
+        with contextlib.suppress(ValueError):
+            run_ids.add(int(path.name.removeprefix("run-")))
+    return run_ids
+
+
+def remove_logs(run_id):
+    shutil.rmtree(Path(settings.ETLMAN_LOGS_DIR) / f"run-{run_id}", ignore_errors=True)
@@ -0,0 +1,191 @@
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from etlman.backends import BACKEND_NAMES, get_backend
+
+SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+# Scripts that write ``{output_size}`` bytes to stdout, padded with comments
+# to roughly ``script_size`` bytes.
+SCRIPTS = {
+    "python": "import sys\nsys.stdout.write('x' * {output_size})\n",
+    "r": 'cat(strrep("x", {output_size}))\n',
+}
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as "512", "1K" or "100M" into bytes."""
+    value = value.strip().upper()
+    if value[-1:] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def parse_sizes(value: str) -> list:
+    return [parse_size(size) for size in value.split(",")]
+
+
+def parse_ints(value: str) -> list:
+    return [int(n) for n in value.split(",")]
+
+
+def make_script(language: str, script_size: int, output_size: int) -> str:
+    script = SCRIPTS[language].format(output_size=output_size)
+    padding = max(script_size - len(script), 0)
+    lines = [f"# {'x' * 77}\n"] * (padding // 80)
+    return "".join(lines) + script
+
+
+def summarize(timings: list, wall_time: float) -> dict:
+    timings = sorted(timings)
+    return {
+        "latency_ms": {
+            "mean": round(statistics.mean(timings), 3),
+            "median": round(statistics.median(timings), 3),
+            "p95": round(timings[int(0.95 * (len(timings) - 1))], 3),
+            "min": round(timings[0], 3),
+            "max": round(timings[-1], 3),
+        },
+        "throughput_per_s": round(len(timings) / wall_time, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-step latency and throughput of the backends across "
+        "languages, script sizes, output sizes and concurrency levels."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backends",
+            nargs="*",
+            choices=BACKEND_NAMES,
+            default=list(BACKEND_NAMES),
+        )
+        parser.add_argument(
+            "--languages", nargs="*", choices=list(SCRIPTS), default=list(SCRIPTS)
+        )
+        parser.add_argument(
+            "--script-sizes",
+            type=parse_sizes,
+            default="1K,100K",
+            help="Comma-separated script sizes in bytes, e.g. 1K,100K.",
+        )
+        parser.add_argument(
+            "--output-sizes",
+            type=parse_sizes,
+            default="1K,1M,100M",
+            help="Comma-separated bytes each script writes to stdout.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=parse_ints,
+            default="1,4",
+            help="Comma-separated numbers of scripts to run at once.",
+        )
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument(
+            "--preload",
+            nargs="*",
+            default=settings.ETLMAN_FORKSERVER_PRELOAD,
+            help="Modules preloaded by the fork server and imported by each script.",
+        )
+        parser.add_argument(
+            "--json", dest="json_path", help="Also write the results to this file."
+        )
+
+    def handle(self, *args, json_path, **options):
+        results = []
+        for backend_name in options["backends"]:
+            results.extend(self.benchmark_backend(backend_name, **options))
+        if json_path:
+            report = {
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "environment": {
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                },
+                "results": results,
+            }
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    def benchmark_backend(self, backend_name, **options):
+        with override_settings(ETLMAN_FORKSERVER_PRELOAD=options["preload"]):
+            backend = get_backend(backend_name)
+        preload = "".join(f"import {module}\n" for module in options["preload"])
+        for language in options["languages"]:
+            # Start any long-lived processes outside of the timed runs.
+            returncode, _, stderr = backend.execute_script(language, "")
+            if returncode != 0:
+                self.stderr.write(
+                    f"Skipping {backend_name}/{language}: {stderr.strip()}"
+                )
+                continue
+            for script_size, output_size, concurrency in itertools.product(
+                options["script_sizes"],
+                options["output_sizes"],
+                options["concurrency"],
+            ):
+                script = make_script(language, script_size, output_size)
+                if language == "python":
+                    script = preload + script
+                result = {
+                    "backend": backend_name,
+                    "language": language,
+                    "script_size": len(script.encode("utf-8")),
+                    "output_size": output_size,
+                    "concurrency": concurrency,
+                    "iterations": options["iterations"],
+                    **self.run(
+                        backend,
+                        language,
+                        script,
+                        output_size,
+                        concurrency,
+                        options["iterations"],
+                    ),
+                }
+                self.report(result)
+                yield result
+
+    def run(self, backend, language, script, output_size, concurrency, iterations):
+        def run_once(_):
+            start = time.perf_counter()
+            result = backend.execute_script_streaming(language, script)
+            elapsed = (time.perf_counter() - start) * 1000
+            with result.stdout, result.stderr:
+                if result.returncode != 0 or result.stdout.size != output_size:
+                    raise CommandError(
+                        f"Benchmark script failed: {result.stderr.read()[-1000:]}"
+                    )
+            return elapsed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            timings = list(executor.map(run_once, range(iterations)))
+        return summarize(timings, time.perf_counter() - start)
+
+    def report(self, result):
+        latency = result["latency_ms"]
+        self.stdout.write(
+            f"{result['backend']:<11} {result['language']:<7} "
+            f"script {result['script_size']:>9} B  "
+            f"output {result['output_size']:>10} B  "
+            f"x{result['concurrency']:<3} "
+            f"median {latency['median']:9.2f} ms  p95 {latency['p95']:9.2f} ms  "
+            f"{result['throughput_per_s']:8.2f}/s"
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_alter_pipelineschedule_interval_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalstep',
+            name='timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds the script may run before it is stopped.', null=True),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds the script may run before it is stopped.', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_add_timeout_to_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalstep',
+            name='cache_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds to reuse a successful result instead of re-running the script, while the script and its inputs are unchanged.', null=True, verbose_name='Cache TTL'),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='cache_ttl',
+            field=models.PositiveIntegerField(blank=True, help_text='Seconds to reuse a successful result instead of re-running the script, while the script and its inputs are unchanged.', null=True, verbose_name='Cache TTL'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_add_cache_ttl_to_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalstep',
+            name='requirements',
+            field=models.TextField(blank=True, help_text="Python packages to install for the script, one per line in pip's requirements file format."),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='requirements',
+            field=models.TextField(blank=True, help_text="Python packages to install for the script, one per line in pip's requirements file format."),
+        ),
+    ]
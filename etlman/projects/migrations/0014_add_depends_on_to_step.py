@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_add_requirements_to_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='step',
+            name='depends_on',
+            field=models.ManyToManyField(blank=True, help_text='Steps that must finish before this one starts. If no step in the pipeline has dependencies, steps run one after another in order.', related_name='dependents', to='projects.step'),
+        ),
+    ]
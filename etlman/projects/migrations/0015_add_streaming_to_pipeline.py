@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_add_depends_on_to_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpipeline',
+            name='streaming',
+            field=models.BooleanField(default=False, help_text="Run all steps at once, in step order, with each step reading the previous step's stdout on its stdin, e.g. as a stream of Arrow record batches."),
+        ),
+        migrations.AddField(
+            model_name='pipeline',
+            name='streaming',
+            field=models.BooleanField(default=False, help_text="Run all steps at once, in step order, with each step reading the previous step's stdout on its stdin, e.g. as a stream of Arrow record batches."),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0015_add_streaming_to_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datainterface',
+            name='watermark_column',
+            field=models.CharField(blank=True, help_text="A timestamp or increasing ID column of the query's results. Each run then only extracts rows where it is greater than the highest value extracted by the last successful run.", max_length=256),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='watermark_column',
+            field=models.CharField(blank=True, help_text="A timestamp or increasing ID column of the query's results. Each run then only extracts rows where it is greater than the highest value extracted by the last successful run.", max_length=256),
+        ),
+        migrations.AddField(
+            model_name='historicalpipeline',
+            name='input_watermark',
+            field=models.JSONField(blank=True, help_text="The highest value of the input's watermark column extracted by the last successful run. Clear it to extract everything again.", null=True),
+        ),
+        migrations.AddField(
+            model_name='pipeline',
+            name='input_watermark',
+            field=models.JSONField(blank=True, help_text="The highest value of the input's watermark column extracted by the last successful run. Clear it to extract everything again.", null=True),
+        ),
+    ]
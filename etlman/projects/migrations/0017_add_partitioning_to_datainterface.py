@@ -0,0 +1,44 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:06
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_add_input_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datainterface',
+            name='max_connections',
+            field=models.PositiveIntegerField(default=4, help_text='The most connections to the database to extract over at once.', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='datainterface',
+            name='partition_column',
+            field=models.CharField(blank=True, help_text="A numeric or date column of the query's results to split the extraction into ranges of, which are extracted in parallel.", max_length=256),
+        ),
+        migrations.AddField(
+            model_name='datainterface',
+            name='partition_count',
+            field=models.PositiveIntegerField(default=1, help_text='How many ranges to split the extraction into.', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='max_connections',
+            field=models.PositiveIntegerField(default=4, help_text='The most connections to the database to extract over at once.', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='partition_column',
+            field=models.CharField(blank=True, help_text="A numeric or date column of the query's results to split the extraction into ranges of, which are extracted in parallel.", max_length=256),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='partition_count',
+            field=models.PositiveIntegerField(default=1, help_text='How many ranges to split the extraction into.', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
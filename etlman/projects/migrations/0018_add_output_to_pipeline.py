@@ -0,0 +1,54 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0017_add_partitioning_to_datainterface'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datainterface',
+            name='target_table',
+            field=models.CharField(blank=True, help_text='The table a pipeline with this as its output loads into.', max_length=256),
+        ),
+        migrations.AddField(
+            model_name='datainterface',
+            name='upsert_keys',
+            field=models.CharField(blank=True, help_text='Comma-separated columns identifying a row of the target table. Loaded rows then replace rows with the same keys.', max_length=256),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='target_table',
+            field=models.CharField(blank=True, help_text='The table a pipeline with this as its output loads into.', max_length=256),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='upsert_keys',
+            field=models.CharField(blank=True, help_text='Comma-separated columns identifying a row of the target table. Loaded rows then replace rows with the same keys.', max_length=256),
+        ),
+        migrations.AddField(
+            model_name='historicalpipeline',
+            name='output',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Where to load the Parquet files steps write to $ETLMAN_OUTPUT_PATH once every step has succeeded.', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='projects.datainterface'),
+        ),
+        migrations.AddField(
+            model_name='pipeline',
+            name='output',
+            field=models.OneToOneField(blank=True, help_text='Where to load the Parquet files steps write to $ETLMAN_OUTPUT_PATH once every step has succeeded.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='output_pipeline', to='projects.datainterface'),
+        ),
+        migrations.AlterField(
+            model_name='datainterface',
+            name='sql_query',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='historicaldatainterface',
+            name='sql_query',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0018_add_output_to_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datainterface',
+            name='schema',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='datainterface',
+            name='schema_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='schema',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatainterface',
+            name='schema_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0019_add_schema_to_datainterface'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpipeline',
+            name='distributed',
+            field=models.BooleanField(default=False, help_text='Run each step as its own Celery task, on whichever worker is free. Steps share files through ETLMAN_RUNS_DIR, which must be on storage all workers can reach. Streaming pipelines always run in one task.'),
+        ),
+        migrations.AddField(
+            model_name='pipeline',
+            name='distributed',
+            field=models.BooleanField(default=False, help_text='Run each step as its own Celery task, on whichever worker is free. Steps share files through ETLMAN_RUNS_DIR, which must be on storage all workers can reach. Streaming pipelines always run in one task.'),
+        ),
+        migrations.AddField(
+            model_name='pipelinerun',
+            name='scratch_dir',
+            field=models.CharField(blank=True, max_length=1024),
+        ),
+        migrations.AlterField(
+            model_name='pipelinerun',
+            name='ended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
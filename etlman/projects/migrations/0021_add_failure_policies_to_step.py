@@ -0,0 +1,44 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:27
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0020_add_distributed_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalstep',
+            name='max_retries',
+            field=models.PositiveIntegerField(default=0, help_text='Times to run the script again if it fails.'),
+        ),
+        migrations.AddField(
+            model_name='historicalstep',
+            name='on_failure',
+            field=models.CharField(choices=[('fail_fast', 'Skip the steps that depend on this one'), ('continue', 'Run the steps that depend on this one anyway')], default='fail_fast', help_text='What to do if the script still fails after any retries.', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='historicalstep',
+            name='retry_delay',
+            field=models.FloatField(default=1, help_text='Seconds to wait before the first retry, doubling with each retry, with random jitter.', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='max_retries',
+            field=models.PositiveIntegerField(default=0, help_text='Times to run the script again if it fails.'),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='on_failure',
+            field=models.CharField(choices=[('fail_fast', 'Skip the steps that depend on this one'), ('continue', 'Run the steps that depend on this one anyway')], default='fail_fast', help_text='What to do if the script still fails after any retries.', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='retry_delay',
+            field=models.FloatField(default=1, help_text='Seconds to wait before the first retry, doubling with each retry, with random jitter.', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.6 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+def get_step_status(step):
+    # Steps recorded before step statuses were only have a return code.
+    if step.get("status"):
+        return step["status"]
+    return "success" if step.get("returncode") == 0 else "failure"
+
+
+def set_status(apps, schema_editor):
+    """Runs saved before this were saved once they ended."""
+    PipelineRun = apps.get_model("projects", "PipelineRun")
+    for run in PipelineRun.objects.iterator():
+        steps = run.output.get("steps", []) if isinstance(run.output, dict) else []
+        succeeded = all(get_step_status(step) == "success" for step in steps)
+        run.status = "succeeded" if succeeded else "failed"
+        run.heartbeat_at = run.ended_at
+        run.save(update_fields=["status", "heartbeat_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0021_add_failure_policies_to_step'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pipelinerun',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pipelinerun',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=16),
+        ),
+        migrations.RunPython(set_status, migrations.RunPython.noop),
+    ]
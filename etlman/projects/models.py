@@ -1,8 +1,20 @@
+import asyncio
+import contextlib
 import datetime
 import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
 
 import pytz
-from django.db import models, transaction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 from django_celery_beat.models import (
     MICROSECONDS,
@@ -13,6 +25,16 @@ from django_celery_beat.models import (
 from simple_history.models import HistoricalRecords
 
 from etlman.backends import get_backend
+from etlman.projects.extraction import INPUT_PATH_VARIABLE, extract
+from etlman.projects.loading import OUTPUT_PATH_VARIABLE, load
+from etlman.projects.logs import open_log
+from etlman.projects.schema import INPUT_SCHEMA_VARIABLE, get_fingerprint, get_schema
+from etlman.projects.scratch import (
+    SCRATCH_DIR_VARIABLE,
+    create_scratch_directory,
+    remove_scratch_directory,
+)
+from etlman.projects.step_cache import StepResultCache, get_cache_key
 from etlman.users.models import User
 
 
@@ -48,44 +70,504 @@ class DataInterface(models.Model):
     name = models.CharField(max_length=256)
     interface_type = models.CharField(max_length=32, choices=INTERFACE_TYPE_CHOICES)
     connection_string = models.TextField()
-    sql_query = models.TextField()
+    sql_query = models.TextField(blank=True)
+    watermark_column = models.CharField(
+        max_length=256,
+        blank=True,
+        help_text=(
+            "A timestamp or increasing ID column of the query's results. Each "
+            "run then only extracts rows where it is greater than the highest "
+            "value extracted by the last successful run."
+        ),
+    )
+    partition_column = models.CharField(
+        max_length=256,
+        blank=True,
+        help_text=(
+            "A numeric or date column of the query's results to split the "
+            "extraction into ranges of, which are extracted in parallel."
+        ),
+    )
+    partition_count = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="How many ranges to split the extraction into.",
+    )
+    max_connections = models.PositiveIntegerField(
+        default=4,
+        validators=[MinValueValidator(1)],
+        help_text="The most connections to the database to extract over at once.",
+    )
+    target_table = models.CharField(
+        max_length=256,
+        blank=True,
+        help_text="The table a pipeline with this as its output loads into.",
+    )
+    upsert_keys = models.CharField(
+        max_length=256,
+        blank=True,
+        help_text=(
+            "Comma-separated columns identifying a row of the target table. "
+            "Loaded rows then replace rows with the same keys."
+        ),
+    )
+    # The query's columns, from get_schema(), and what they were read for.
+    schema = models.JSONField(null=True, blank=True, editable=False)
+    schema_fingerprint = models.CharField(max_length=64, blank=True, editable=False)
     history = HistoricalRecords()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.schema_fingerprint != get_fingerprint(
+            self.connection_string, self.sql_query
+        ):
+            self.schema = None
+            self.schema_fingerprint = ""
+        super().save(*args, **kwargs)
+
+
+async def run_blocking(func, *args):
+    """
+    Run ``func`` in a thread of its own, rather than the one thread that
+    sync_to_async() shares by default, so that long extractions and loads don't
+    hold up every other pipeline's database calls. The thread's database
+    connection is closed afterwards.
+    """
+
+    def run():
+        try:
+            return func(*args)
+        finally:
+            connection.close()
+
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
+class RetryStep(Exception):
+    """
+    Raised by Step.execute() when its script failed and is to be retried in
+    ``delay`` seconds, by the caller, after the ``attempts`` made so far.
+    """
+
+    def __init__(self, delay, attempts):
+        super().__init__(f"Retrying in {delay} seconds")
+        self.delay = delay
+        self.attempts = attempts
+
+
+def get_upstream_key(upstream_outputs) -> str:
+    """Combine the cache keys of the steps a step depends on."""
+    return "\n".join(output["cache_key"] for output in upstream_outputs)
+
 
 class Pipeline(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     name = models.CharField(max_length=256)
     input = models.OneToOneField(DataInterface, null=True, on_delete=models.CASCADE)
+    output = models.OneToOneField(
+        DataInterface,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="output_pipeline",
+        help_text=(
+            "Where to load the Parquet files steps write to $ETLMAN_OUTPUT_PATH "
+            "once every step has succeeded."
+        ),
+    )
+    input_watermark = models.JSONField(
+        null=True,
+        blank=True,
+        help_text=(
+            "The highest value of the input's watermark column extracted by the "
+            "last successful run. Clear it to extract everything again."
+        ),
+    )
+    streaming = models.BooleanField(
+        default=False,
+        help_text=(
+            "Run all steps at once, in step order, with each step reading the "
+            "previous step's stdout on its stdin, e.g. as a stream of Arrow "
+            "record batches."
+        ),
+    )
+    distributed = models.BooleanField(
+        default=False,
+        help_text=(
+            "Run each step as its own Celery task, on whichever worker is free. "
+            "Steps share files through ETLMAN_RUNS_DIR, which must be on "
+            "storage all workers can reach. Streaming pipelines always run in "
+            "one task."
+        ),
+    )
     history = HistoricalRecords()
 
-    def run_pipeline(self, backend=None):
-        start_time = timezone.now()
+    def get_steps(self):
+        """This pipeline's steps, loaded so they can run without more queries."""
+        return list(
+            self.steps.select_related("pipeline__input")
+            .prefetch_related("depends_on")
+            .order_by("step_order")
+        )
+
+    @staticmethod
+    def get_dependencies(steps):
+        """
+        Map each of ``steps`` to the steps it depends on, ordered so that a
+        step's dependencies come before it. If no step declares dependencies,
+        each step depends on the one before it, so they run one after another.
+        """
+        if not any(step.depends_on.all() for step in steps):
+            return {step: [steps[i - 1]] if i else [] for i, step in enumerate(steps)}
+        dependencies = {}
+        for step in steps:
+            upstream = list(step.depends_on.all())
+            if any(dependency not in steps for dependency in upstream):
+                raise ValueError(f"Step {step} depends on a step in another pipeline.")
+            dependencies[step] = sorted(upstream, key=lambda s: s.step_order)
+        ordered: dict = {}
+        while len(ordered) < len(steps):
+            ready = [
+                step
+                for step in steps
+                if step not in ordered
+                and all(dependency in ordered for dependency in dependencies[step])
+            ]
+            if not ready:
+                cycle = ", ".join(str(step) for step in steps if step not in ordered)
+                raise ValueError(f"Step dependencies form a cycle: {cycle}")
+            for step in ready:
+                ordered[step] = dependencies[step]
+        return ordered
+
+    @classmethod
+    def get_stages(cls, steps):
+        """
+        Group ``steps`` into stages whose steps depend only on steps in earlier
+        stages, so each stage's steps can run in parallel.
+        """
+        depths: dict = {}
+        for step, upstream in cls.get_dependencies(steps).items():
+            depths[step] = max(
+                (depths[dependency] + 1 for dependency in upstream), default=0
+            )
+        stages: list = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+        for step, depth in depths.items():
+            stages[depth].append(step)
+        return stages
+
+    def get_env(self, scratch_dir, input_extraction=None):
+        """The environment variables through which steps find the run's files."""
+        env = {SCRATCH_DIR_VARIABLE: scratch_dir}
+        if input_extraction and self.input is not None:
+            env[INPUT_PATH_VARIABLE] = input_extraction["path"]
+            env[INPUT_SCHEMA_VARIABLE] = json.dumps(self.input.schema)
+        if self.output_id:
+            env[OUTPUT_PATH_VARIABLE] = self.get_output_path(scratch_dir)
+        return env
+
+    def run_pipeline(self, backend=None, resume=None, run=None):
+        """
+        Run the steps, each once the steps it depends on have finished, with
+        up to ETLMAN_MAX_PARALLEL_STEPS steps running at once, or all at once
+        as a Unix pipeline if the pipeline is streaming. Steps share a scratch
+        directory for the run, found through $ETLMAN_SCRATCH_DIR, and the
+        pipeline's input is extracted there first, found through
+        $ETLMAN_INPUT_PATH. If the pipeline has an output, Parquet files steps
+        write to $ETLMAN_OUTPUT_PATH are loaded into it afterwards.
+
+        If a step fails, the scratch directory is kept so the run can be
+        resumed: pass it as ``resume`` to run again in its scratch directory,
+        with its input, reusing the outputs of steps that succeeded and are
+        unchanged.
+
+        The run is saved before any step runs, and each step's output as soon
+        as it finishes, so a run can be followed while it's in progress. Pass
+        a queued ``run`` (see PipelineRun.start) to run it instead of a new
+        one.
+        """
         if backend is None:
             backend = get_backend()
-        output = {
-            "pipeline_id": self.pk,
-            "steps": [],
+        steps = self.get_steps()
+        if run is None:
+            run = PipelineRun.start(self, resume=resume)
+        run.mark_running()
+        try:
+            with run.heartbeat():
+                run.extract_input()
+                env = self.get_env(run.scratch_dir, run.output.get("input"))
+                if self.streaming:
+                    outputs = self._run_streaming(steps, backend, env)
+                    for step in steps:
+                        run.record_step(outputs.pop(step))
+                else:
+                    self._run_steps(steps, backend, env, run)
+                run.finish()
+        except BaseException:
+            run.abort()
+            raise
+        return run
+
+    def start_run(self, resume=None):
+        """
+        The initial output and scratch directory of a new run, resuming
+        ``resume`` if given.
+        """
+        output = {"pipeline_id": self.pk}
+        if resume is None:
+            self.discard_checkpoints()
+            return output, create_scratch_directory()
+        scratch_dir = resume.take_checkpoint()
+        output["resumed_from"] = resume.pk
+        if "input" in resume.output:
+            output["input"] = resume.output["input"]
+        return output, scratch_dir
+
+    def keep_checkpoint(self, output, scratch_dir) -> str:
+        """
+        Remove the scratch directory of a run that succeeded. Otherwise keep it
+        to resume the run from, and return it.
+        """
+        if self.succeeded(output):
+            remove_scratch_directory(scratch_dir)
+            return ""
+        return scratch_dir
+
+    def discard_checkpoints(self):
+        """Remove the scratch directories kept by earlier runs that failed."""
+        runs = self.pipeline_runs.exclude(scratch_dir="").filter(ended_at__isnull=False)
+        for run in runs:
+            remove_scratch_directory(run.scratch_dir)
+        runs.update(scratch_dir="")
+
+    def get_latest_run(self):
+        return self.pipeline_runs.order_by("-started_at").first()
+
+    def get_resumable_run(self):
+        """
+        The latest of this pipeline's runs that failed and can be resumed. A run
+        that resumes another but stops before recording any steps hands its
+        checkpoint back, so this may not be the latest run.
+        """
+        return get_resumable_runs(self.pipeline_runs.all()).first()
+
+    @classmethod
+    def list_with_runs(cls, pipelines):
+        """
+        Evaluate the ``pipelines`` queryset, setting each pipeline's
+        ``latest_run`` and ``resumable_run`` (see get_latest_run and
+        get_resumable_run) in one more query, without the runs' output.
+        """
+        runs = PipelineRun.objects.filter(pipeline=models.OuterRef("pk")).order_by(
+            "-started_at"
+        )
+        pipelines = list(
+            pipelines.annotate(
+                latest_run_id=models.Subquery(runs.values("pk")[:1]),
+                resumable_run_id=models.Subquery(
+                    get_resumable_runs(runs).values("pk")[:1]
+                ),
+            )
+        )
+        run_ids = {p.latest_run_id for p in pipelines}
+        run_ids |= {p.resumable_run_id for p in pipelines}
+        run_ids.discard(None)
+        found = PipelineRun.objects.defer("output").in_bulk(run_ids)
+        for pipeline in pipelines:
+            pipeline.latest_run = found.get(pipeline.latest_run_id)
+            pipeline.resumable_run = found.get(pipeline.resumable_run_id)
+        return pipelines
+
+    def extract_input(self, scratch_dir):
+        """
+        Extract the input's query results into ``scratch_dir`` as Parquet and
+        return the PipelineRun.output entry describing the extraction.
+        """
+        started_at = timezone.now()
+        get_schema(self.input)
+        extraction = extract(
+            self.input, Path(scratch_dir) / "input", watermark=self.input_watermark
+        )
+        return {
+            "data_interface_id": self.input_id,
+            **extraction,
+            "started_at": started_at.isoformat(),
+            "ended_at": timezone.now().isoformat(),
         }
-        for step in self.steps.order_by("step_order").all():
-            returncode, stdout, stderr = step.run_script(backend=backend)
-            output["steps"].append(
+
+    @staticmethod
+    def get_output_path(scratch_dir) -> str:
+        path = Path(scratch_dir) / "output"
+        path.mkdir(exist_ok=True)
+        return str(path)
+
+    def load_output(self, scratch_dir):
+        """
+        Load the Parquet files steps wrote to the output path into the output
+        and return the PipelineRun.output entry describing the load.
+        """
+        started_at = timezone.now()
+        loaded = load(self.output, self.get_output_path(scratch_dir))
+        return {
+            "data_interface_id": self.output_id,
+            **loaded,
+            "started_at": started_at.isoformat(),
+            "ended_at": timezone.now().isoformat(),
+        }
+
+    @staticmethod
+    def succeeded(output) -> bool:
+        return all(step["status"] == "success" for step in output["steps"])
+
+    def save_input_watermark(self, output):
+        """Keep the run's input watermark if every step succeeded."""
+        watermark = output.get("input", {}).get("watermark")
+        if watermark is None or watermark == self.input_watermark:
+            return
+        if self.succeeded(output):
+            self.input_watermark = watermark
+            Pipeline.objects.filter(pk=self.pk).update(input_watermark=watermark)
+
+    def _run_steps(self, steps, backend, env, run):
+        dependencies = self.get_dependencies(steps)
+        previous = run.get_previous_outputs()
+        # Summaries of the outputs of steps that have finished, which have
+        # been recorded in the run.
+        outputs: dict = {}
+        running: dict = {}
+        with ThreadPoolExecutor(
+            max_workers=settings.ETLMAN_MAX_PARALLEL_STEPS
+        ) as executor:
+            while len(outputs) < len(dependencies):
+                for step, upstream in dependencies.items():
+                    if (
+                        step not in outputs
+                        and step not in running.values()
+                        and all(dependency in outputs for dependency in upstream)
+                    ):
+                        if any(
+                            dependency.blocks_dependents(outputs[dependency])
+                            for dependency in upstream
+                        ):
+                            outputs[step] = run.record_step(step.get_skipped_output())
+                            continue
+                        upstream_key = get_upstream_key(
+                            outputs[dependency] for dependency in upstream
+                        )
+                        resumed = step.resume(previous.get(step.pk), upstream_key)
+                        if resumed is not None:
+                            outputs[step] = run.record_step(resumed)
+                            continue
+                        future = executor.submit(
+                            run.execute_step,
+                            step,
+                            backend=backend,
+                            upstream_key=upstream_key,
+                            env=env,
+                        )
+                        running[future] = step
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outputs[running.pop(future)] = run.record_step(future.result())
+
+    def _run_streaming(self, steps, backend, env):
+        """
+        Run ``steps`` in step order as one Unix pipeline, each reading the
+        previous step's stdout on its stdin. Results aren't cached, since a
+        step's output depends on the stream it reads.
+        """
+        if not steps:
+            return {}
+        started_at = timezone.now()
+        results = backend.execute_streaming_pipeline(
+            [
                 {
-                    "step_id": step.pk,
-                    "returncode": returncode,
-                    "stdout": stdout,
-                    "stderr": stderr,
+                    "language": step.language,
+                    "script": step.script,
+                    "timeout": step.get_timeout(),
+                    "requirements": step.requirements,
                 }
-            )
-        end_time = timezone.now()
-        PipelineRun.objects.create(
-            pipeline=self,
-            started_at=start_time,
-            ended_at=end_time,
-            output=output,
+                for step in steps
+            ],
+            env=env,
         )
+        outputs = {}
+        upstream_key = ""
+        for step, result in zip(steps, results):
+            cache_key = get_cache_key(step, upstream_key)
+            ended_at = started_at + datetime.timedelta(
+                seconds=result.usage.get("wall_time", 0)
+            )
+            outputs[step] = step.get_output(
+                result.tail(settings.ETLMAN_OUTPUT_TAIL_SIZE),
+                cache_key,
+                started_at,
+                ended_at=ended_at,
+            )
+            upstream_key = cache_key
+        return outputs
+
+    async def run_pipeline_async(self, backend=None, semaphore=None, resume=None):
+        """
+        Coroutine version of run_pipeline(). Pass a shared ``semaphore`` when
+        running many pipelines concurrently to bound how many child processes
+        are running at once.
+        """
+        if backend is None:
+            backend = get_backend()
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.ETLMAN_MAX_PARALLEL_STEPS)
+        steps = await sync_to_async(self.get_steps)()
+        run = await sync_to_async(PipelineRun.start)(self, resume=resume)
+        await sync_to_async(run.mark_running)()
+        try:
+            with run.heartbeat():
+                await run_blocking(run.extract_input)
+                env = await sync_to_async(self.get_env)(
+                    run.scratch_dir, run.output.get("input")
+                )
+                if self.streaming:
+                    async with semaphore:
+                        outputs = await asyncio.to_thread(
+                            self._run_streaming, steps, backend, env
+                        )
+                    for step in steps:
+                        await sync_to_async(run.record_step)(outputs.pop(step))
+                else:
+                    await self._run_steps_async(steps, backend, env, semaphore, run)
+                await run_blocking(run.finish)
+        except BaseException:
+            await sync_to_async(run.abort)()
+            raise
+        return run
+
+    async def _run_steps_async(self, steps, backend, env, semaphore, run):
+        tasks: dict = {}
+        previous = await sync_to_async(run.get_previous_outputs)()
+        record_step = sync_to_async(run.record_step)
+
+        async def execute(step, upstream):
+            upstream_outputs = [await tasks[dependency] for dependency in upstream]
+            if any(
+                dependency.blocks_dependents(output)
+                for dependency, output in zip(upstream, upstream_outputs)
+            ):
+                return await record_step(step.get_skipped_output())
+            upstream_key = get_upstream_key(upstream_outputs)
+            resumed = step.resume(previous.get(step.pk), upstream_key)
+            if resumed is not None:
+                return await record_step(resumed)
+            async with semaphore:
+                output = await run.execute_step_async(
+                    step, backend=backend, upstream_key=upstream_key, env=env
+                )
+            return await record_step(output)
+
+        for step, upstream in self.get_dependencies(steps).items():
+            tasks[step] = asyncio.ensure_future(execute(step, upstream))
+        await asyncio.gather(*tasks.values())
 
     def __str__(self):
         return f"{self.name}, pk: {self.id}"
@@ -93,6 +575,10 @@ class Pipeline(models.Model):
 
 class Step(models.Model):
     LANGUAGE_CHOICES = [("python", "Python"), ("r", "R")]
+    ON_FAILURE_CHOICES = [
+        ("fail_fast", "Skip the steps that depend on this one"),
+        ("continue", "Run the steps that depend on this one anyway"),
+    ]
 
     pipeline = models.ForeignKey(
         Pipeline, on_delete=models.CASCADE, related_name="steps"
@@ -101,15 +587,281 @@ class Step(models.Model):
     language = models.CharField(max_length=56, choices=LANGUAGE_CHOICES)
     script = models.TextField()
     step_order = models.PositiveIntegerField()
+    timeout = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Seconds the script may run before it is stopped.",
+    )
+    cache_ttl = models.PositiveIntegerField(
+        "Cache TTL",
+        null=True,
+        blank=True,
+        help_text=(
+            "Seconds to reuse a successful result instead of re-running the "
+            "script, while the script and its inputs are unchanged."
+        ),
+    )
+    depends_on = models.ManyToManyField(
+        "self",
+        symmetrical=False,
+        blank=True,
+        related_name="dependents",
+        help_text=(
+            "Steps that must finish before this one starts. If no step in the "
+            "pipeline has dependencies, steps run one after another in order."
+        ),
+    )
+    requirements = models.TextField(
+        blank=True,
+        help_text=(
+            "Python packages to install for the script, one per line in pip's "
+            "requirements file format."
+        ),
+    )
+    on_failure = models.CharField(
+        max_length=16,
+        choices=ON_FAILURE_CHOICES,
+        default="fail_fast",
+        help_text="What to do if the script still fails after any retries.",
+    )
+    max_retries = models.PositiveIntegerField(
+        default=0, help_text="Times to run the script again if it fails."
+    )
+    retry_delay = models.FloatField(
+        default=1,
+        validators=[MinValueValidator(0)],
+        help_text=(
+            "Seconds to wait before the first retry, doubling with each retry, "
+            "with random jitter."
+        ),
+    )
     history = HistoricalRecords()
 
     def __str__(self):
         return self.name
 
-    def run_script(self, backend=None):
+    def get_upstream(self) -> set:
+        """The steps this step depends on, directly or through other steps."""
+        upstream = set()
+        pending = [self]
+        while pending:
+            for dependency in pending.pop().depends_on.all():
+                if dependency not in upstream:
+                    upstream.add(dependency)
+                    pending.append(dependency)
+        return upstream
+
+    def get_timeout(self):
+        if self.timeout is None:
+            return settings.ETLMAN_DEFAULT_STEP_TIMEOUT
+        return self.timeout
+
+    def run_script(self, backend=None, env=None, log=None):
+        """
+        Run the script, keeping only the last ETLMAN_OUTPUT_TAIL_SIZE bytes of
+        its stdout and stderr; the rest is only in ``log``.
+        """
         if backend is None:
             backend = get_backend()
-        return backend.execute_script(self.language, self.script)
+        result = backend.execute_script_streaming(
+            self.language,
+            self.script,
+            timeout=self.get_timeout(),
+            requirements=self.requirements,
+            env=env,
+            log=log,
+        )
+        return result.tail(settings.ETLMAN_OUTPUT_TAIL_SIZE)
+
+    async def run_script_async(self, backend=None, env=None, log=None):
+        if backend is None:
+            backend = get_backend()
+        result = await backend.execute_script_streaming_async(
+            self.language,
+            self.script,
+            timeout=self.get_timeout(),
+            requirements=self.requirements,
+            env=env,
+            log=log,
+        )
+        return result.tail(settings.ETLMAN_OUTPUT_TAIL_SIZE)
+
+    def execute(
+        self,
+        backend=None,
+        upstream_key="",
+        env=None,
+        log=None,
+        attempts=(),
+        wait=True,
+    ):
+        """
+        Run the script and return this step's PipelineRun.output entry. When
+        cache_ttl is set, a recent successful result with the same cache key is
+        reused instead. A failed script is retried up to max_retries times,
+        with every attempt recorded. Lines of output are written to ``log``, a
+        LogWriter, as the script prints them.
+
+        Unless ``wait`` is true, RetryStep is raised instead of waiting to
+        retry the script, to be passed back in as ``attempts``.
+        """
+        attempts = list(attempts)
+        started_at = self._get_started_at(attempts)
+        cache_key = get_cache_key(self, upstream_key)
+        result = self._get_cached_result(cache_key)
+        if result is not None:
+            return self.get_output(result, cache_key, started_at, cached=True)
+        while True:
+            attempt_started_at = timezone.now()
+            result = self.run_script(backend=backend, env=env, log=log)
+            delay = self._record_attempt(attempts, result, attempt_started_at, log)
+            if delay is None:
+                break
+            if not wait:
+                raise RetryStep(delay, attempts)
+            time.sleep(delay)
+        self._cache_result(cache_key, result)
+        return self.get_output(
+            result, cache_key, started_at, attempts=attempts, log=log
+        )
+
+    async def execute_async(self, backend=None, upstream_key="", env=None, log=None):
+        started_at = timezone.now()
+        cache_key = get_cache_key(self, upstream_key)
+        result = self._get_cached_result(cache_key)
+        if result is not None:
+            return self.get_output(result, cache_key, started_at, cached=True)
+        attempts: list = []
+        while True:
+            attempt_started_at = timezone.now()
+            result = await self.run_script_async(backend=backend, env=env, log=log)
+            delay = self._record_attempt(attempts, result, attempt_started_at, log)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        self._cache_result(cache_key, result)
+        return self.get_output(
+            result, cache_key, started_at, attempts=attempts, log=log
+        )
+
+    def _get_started_at(self, attempts):
+        if attempts:
+            return datetime.datetime.fromisoformat(attempts[0]["started_at"])
+        return timezone.now()
+
+    def get_retry_delay(self, retry: int) -> float:
+        """
+        Seconds to wait before the ``retry``th retry: retry_delay doubled for
+        each earlier retry, capped at ETLMAN_MAX_RETRY_DELAY, then scaled by a
+        random factor so flaky steps of many runs don't retry in lockstep.
+        """
+        delay = min(
+            self.retry_delay * 2 ** (retry - 1), settings.ETLMAN_MAX_RETRY_DELAY
+        )
+        return delay * random.uniform(0.5, 1)
+
+    def _record_attempt(self, attempts, result, started_at, log=None):
+        """
+        Record an attempt at running the script and return how long to wait
+        before retrying it, or None if it shouldn't be.
+        """
+        attempt = {
+            "status": result.status,
+            "returncode": result.returncode,
+            "started_at": started_at.isoformat(),
+            "ended_at": timezone.now().isoformat(),
+        }
+        attempts.append(attempt)
+        if result.status == "success" or len(attempts) > self.max_retries:
+            return None
+        attempt["retry_delay"] = round(self.get_retry_delay(len(attempts)), 3)
+        if log is not None:
+            log.write(
+                f"Attempt {len(attempts)} failed; retrying in "
+                f"{attempt['retry_delay']} seconds.\n".encode("utf-8")
+            )
+        return attempt["retry_delay"]
+
+    def blocks_dependents(self, output) -> bool:
+        """Whether steps depending on this one should be skipped after ``output``."""
+        if output["status"] == "skipped":
+            return True
+        return output["status"] != "success" and self.on_failure == "fail_fast"
+
+    def get_skipped_output(self):
+        """The entry recorded for this step when a step it depends on failed."""
+        now = timezone.now().isoformat()
+        return {
+            "step_id": self.pk,
+            "status": "skipped",
+            "returncode": None,
+            "stdout": "",
+            "stderr": "",
+            "usage": {},
+            "cache_key": "",
+            "cached": False,
+            "started_at": now,
+            "ended_at": now,
+        }
+
+    def resume(self, previous_output, upstream_key=""):
+        """
+        This step's output from the run being resumed, if it succeeded and
+        neither the step nor its inputs have changed since, or else None.
+        """
+        if (
+            previous_output is not None
+            and previous_output["status"] == "success"
+            and previous_output["cache_key"] == get_cache_key(self, upstream_key)
+        ):
+            return {**previous_output, "resumed": True}
+        return None
+
+    def _get_cached_result(self, cache_key):
+        if self.cache_ttl:
+            return StepResultCache().get(cache_key)
+        return None
+
+    def _cache_result(self, cache_key, result):
+        if self.cache_ttl and result.status == "success":
+            StepResultCache().set(cache_key, result, self.cache_ttl)
+
+    def get_output(
+        self,
+        result,
+        cache_key,
+        started_at,
+        cached=False,
+        ended_at=None,
+        attempts=(),
+        log=None,
+    ):
+        """
+        The entry recorded for this step in PipelineRun.output. If stdout or
+        stderr were cut down to their tails, the whole of them is in the
+        step's ``log``.
+        """
+        if ended_at is None:
+            ended_at = timezone.now()
+        output = {
+            "step_id": self.pk,
+            "status": result.status,
+            "returncode": result.returncode,
+            "stdout": result.stdout,
+            "stderr": result.stderr,
+            "usage": result.usage,
+            "cache_key": cache_key,
+            "cached": cached,
+            "started_at": started_at.isoformat(),
+            "ended_at": ended_at.isoformat(),
+        }
+        if len(attempts) > 1:
+            output["attempts"] = list(attempts)
+        if result.truncated:
+            output["truncated"] = True
+        if log is not None:
+            output["log"] = log.path
+        return output
 
     class Meta:
         constraints = [
@@ -179,13 +931,289 @@ class PipelineSchedule(models.Model):
         super().save(*args, **kwargs)
 
 
+def get_resumable_runs(runs):
+    """Filter ``runs`` to those that failed and can be resumed, latest first."""
+    return (
+        runs.filter(ended_at__isnull=False)
+        .exclude(scratch_dir="")
+        .order_by("-started_at")
+    )
+
+
 class PipelineRun(models.Model):
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+    # What's kept in memory of each recorded step output: what the steps
+    # depending on it need.
+    STEP_SUMMARY_KEYS = ("step_id", "status", "cache_key")
+    # The output with only those summaries of the step outputs, in order.
+    OUTPUT_SUMMARY_SQL = """
+        jsonb_set(output, '{steps}', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(%s) ORDER BY i), '[]')
+            FROM jsonb_array_elements(output -> 'steps') WITH ORDINALITY s(step, i)
+        ))
+    """ % ", ".join(
+        f"'{key}', step -> '{key}'" for key in STEP_SUMMARY_KEYS
+    )
+    # The output with the step outputs sorted by the step IDs in a parameter.
+    SORTED_OUTPUT_SQL = """
+        jsonb_set(output, '{steps}', (
+            SELECT COALESCE(jsonb_agg(step ORDER BY array_position(
+                %s::bigint[], (step ->> 'step_id')::bigint
+            )), '[]')
+            FROM jsonb_array_elements(output -> 'steps') s(step)
+        ))
+    """
+
     pipeline = models.ForeignKey(
         Pipeline, on_delete=models.CASCADE, related_name="pipeline_runs"
     )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
     started_at = models.DateTimeField()
-    ended_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Updated while the run is in progress; one that stops being updated
+    # belongs to a worker that died.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
     output = models.JSONField()
+    # Where the run's steps share files: until it finishes, or until it's
+    # resumed if it failed.
+    scratch_dir = models.CharField(max_length=1024, blank=True)
 
     def __str__(self):
         return self.pipeline.name
+
+    @property
+    def can_resume(self) -> bool:
+        return self.ended_at is not None and bool(self.scratch_dir)
+
+    def take_checkpoint(self):
+        """
+        Hand this run's scratch directory and step outputs, by step ID, over to
+        a run resuming it. Raises ValueError if it can't be resumed, e.g.
+        because it has been already.
+        """
+        taken = (
+            PipelineRun.objects.filter(pk=self.pk, ended_at__isnull=False)
+            .exclude(scratch_dir="")
+            .update(scratch_dir="")
+        )
+        if not taken or not os.path.isdir(self.scratch_dir):
+            raise ValueError(f"Run {self.pk} can't be resumed.")
+        return self.scratch_dir
+
+    def return_checkpoint(self) -> bool:
+        """
+        Hand the scratch directory back to the run this run resumes, if any,
+        so that run can be resumed again. Returns whether it was.
+        """
+        if "resumed_from" not in self.output:
+            return False
+        return bool(
+            PipelineRun.objects.filter(
+                pk=self.output["resumed_from"], scratch_dir=""
+            ).update(scratch_dir=self.scratch_dir)
+        )
+
+    @classmethod
+    def start(cls, pipeline, resume=None):
+        """Create a queued run of ``pipeline``, resuming ``resume`` if given."""
+        output, scratch_dir = pipeline.start_run(resume)
+        output["steps"] = []
+        return cls.objects.create(
+            pipeline=pipeline,
+            started_at=timezone.now(),
+            output=output,
+            scratch_dir=scratch_dir,
+        )
+
+    def mark_running(self):
+        self.status = "running"
+        self.heartbeat_at = timezone.now()
+        self.save(update_fields=["status", "heartbeat_at"])
+
+    def beat(self):
+        PipelineRun.objects.filter(pk=self.pk).update(heartbeat_at=timezone.now())
+
+    @contextlib.contextmanager
+    def heartbeat(self):
+        """
+        Record a heartbeat every ETLMAN_HEARTBEAT_INTERVAL seconds, from
+        another thread, while the block runs.
+        """
+        stopped = threading.Event()
+
+        def beat():
+            try:
+                while not stopped.wait(settings.ETLMAN_HEARTBEAT_INTERVAL):
+                    self.beat()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def get_previous_outputs(self) -> dict:
+        """Step outputs, by step ID, of the run this run resumes, if any."""
+        if "resumed_from" not in self.output:
+            return {}
+        previous = PipelineRun.objects.get(pk=self.output["resumed_from"])
+        return {output["step_id"]: output for output in previous.output["steps"]}
+
+    @classmethod
+    def get_summarized(cls, pk, *related):
+        """
+        Get a run with only summaries of its steps' outputs (see
+        load_output_summary), selecting ``related`` objects with it.
+        """
+        run = cls.objects.select_related(*related).defer("output").get(pk=pk)
+        run.load_output_summary()
+        return run
+
+    def load_output_summary(self):
+        """
+        Load the run's output with only what's kept in memory of each step's
+        (see STEP_SUMMARY_KEYS), leaving stdout and stderr in the database.
+        """
+        self.output = (
+            PipelineRun.objects.filter(pk=self.pk)
+            .annotate(
+                summary=RawSQL(
+                    self.OUTPUT_SUMMARY_SQL, [], output_field=models.JSONField()
+                )
+            )
+            .values_list("summary", flat=True)
+            .get()
+        )
+
+    def set_output(self, key, value):
+        """Set ``key`` of the output without rewriting the rest of it."""
+        PipelineRun.objects.filter(pk=self.pk).update(
+            output=RawSQL(
+                "jsonb_set(output, %s, %s::jsonb)", [[key], json.dumps(value)]
+            )
+        )
+        self.output[key] = value
+
+    def extract_input(self):
+        if self.pipeline.input_id and "input" not in self.output:
+            self.set_output("input", self.pipeline.extract_input(self.scratch_dir))
+
+    def run_step(self, step, backend=None, attempts=(), wait=True):
+        """
+        Run one of the run's steps, whose dependencies have already run, and
+        record its output. Does nothing if the step has already run, e.g. when
+        its task is retried. See Step.execute for ``attempts`` and ``wait``.
+        """
+        outputs = {output["step_id"]: output for output in self.output["steps"]}
+        if step.pk in outputs:
+            return
+        upstream = self.pipeline.get_dependencies(self.pipeline.get_steps())[step]
+        if any(
+            dependency.blocks_dependents(outputs[dependency.pk])
+            for dependency in upstream
+        ):
+            self.record_step(step.get_skipped_output())
+            return
+        upstream_key = get_upstream_key(
+            outputs[dependency.pk] for dependency in upstream
+        )
+        output = step.resume(self.get_previous_outputs().get(step.pk), upstream_key)
+        if output is None:
+            output = self.execute_step(
+                step,
+                backend=backend,
+                upstream_key=upstream_key,
+                env=self.pipeline.get_env(self.scratch_dir, self.output.get("input")),
+                attempts=attempts,
+                wait=wait,
+            )
+        self.record_step(output)
+
+    def execute_step(self, step, backend=None, upstream_key="", env=None, **kwargs):
+        """Run ``step``, logging its output as it runs (see etlman.projects.logs)."""
+        with open_log(self.pk, step.pk) as log:
+            return step.execute(
+                backend=backend, upstream_key=upstream_key, env=env, log=log, **kwargs
+            )
+
+    async def execute_step_async(self, step, backend=None, upstream_key="", env=None):
+        with open_log(self.pk, step.pk) as log:
+            return await step.execute_async(
+                backend=backend, upstream_key=upstream_key, env=env, log=log
+            )
+
+    def record_step(self, step_output) -> dict:
+        """
+        Append a step's output to the run's in the database, alongside those
+        of steps running elsewhere, and return the summary of it kept in
+        memory instead of its stdout and stderr.
+        """
+        PipelineRun.objects.filter(pk=self.pk).update(
+            output=RawSQL(
+                "jsonb_set(output, '{steps}', (output -> 'steps') || %s::jsonb)",
+                [json.dumps([step_output])],
+            ),
+            heartbeat_at=timezone.now(),
+        )
+        summary = {key: step_output[key] for key in self.STEP_SUMMARY_KEYS}
+        self.output["steps"].append(summary)
+        return summary
+
+    def finish(self):
+        """
+        Load the pipeline's output if every step succeeded, and remove the
+        scratch directory unless the run is to be resumed. Does nothing if the
+        run has already finished.
+        """
+        if self.ended_at is not None:
+            return
+        pipeline = self.pipeline
+        step_ids = [step.pk for step in pipeline.get_steps()]
+        self.load_output_summary()
+        # A step whose task failed has no output.
+        complete = len(self.output["steps"]) == len(step_ids)
+        succeeded = complete and pipeline.succeeded(self.output)
+        if pipeline.output_id and succeeded:
+            self.set_output("output", pipeline.load_output(self.scratch_dir))
+        if complete:
+            pipeline.save_input_watermark(self.output)
+            self.scratch_dir = pipeline.keep_checkpoint(self.output, self.scratch_dir)
+        self.status = "succeeded" if succeeded else "failed"
+        self.ended_at = timezone.now()
+        # Steps running elsewhere were recorded as they finished; put them in
+        # step order without loading their output.
+        PipelineRun.objects.filter(pk=self.pk).update(
+            output=RawSQL(self.SORTED_OUTPUT_SQL, [step_ids]),
+            status=self.status,
+            ended_at=self.ended_at,
+            scratch_dir=self.scratch_dir,
+        )
+        order = {step_id: i for i, step_id in enumerate(step_ids)}
+        self.output["steps"].sort(
+            key=lambda output: order.get(output["step_id"], len(order))
+        )
+
+    def abort(self):
+        """
+        End a run that failed with an error, e.g. a task time limit. Its
+        scratch directory is kept to resume it from if any steps were recorded,
+        handed back to the run it resumes if not, and otherwise removed.
+        """
+        if self.scratch_dir:
+            self.load_output_summary()
+            if not self.output["steps"]:
+                if not self.return_checkpoint():
+                    remove_scratch_directory(self.scratch_dir)
+                self.scratch_dir = ""
+        self.status = "failed"
+        self.ended_at = timezone.now()
+        self.save(update_fields=["status", "ended_at", "scratch_dir"])
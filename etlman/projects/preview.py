@@ -0,0 +1,63 @@
+import contextlib
+import re
+
+from django.conf import settings
+
+from etlman.projects.engines import get_engine
+from etlman.projects.extraction import get_source
+
+# The first keyword of a statement, after any comments.
+FIRST_KEYWORD = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/)*(\w+)", re.DOTALL)
+# Statements that can be selected from as a subquery.
+WRAPPABLE_KEYWORDS = {"select", "with", "values"}
+
+
+def can_wrap(sql_query: str) -> bool:
+    match = FIRST_KEYWORD.match(sql_query)
+    return match is not None and match.group(1).lower() in WRAPPABLE_KEYWORDS
+
+
+@contextlib.contextmanager
+def statement_timeout(connection, timeout):
+    """
+    Have the server cancel statements run in the block after ``timeout``
+    seconds, where the dialect supports it.
+    """
+    dialect = connection.dialect.name
+    milliseconds = int(timeout * 1000)
+    if dialect == "postgresql":
+        # Only lasts until the end of the transaction.
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {milliseconds}")
+        yield
+    elif dialect == "mysql":
+        connection.exec_driver_sql(f"SET SESSION max_execution_time = {milliseconds}")
+        try:
+            yield
+        finally:
+            connection.exec_driver_sql("SET SESSION max_execution_time = 0")
+    else:
+        yield
+
+
+def preview(connection_string, sql_query, rows=None, timeout=None):
+    """
+    Return the column names and first ``rows`` rows of ``sql_query``, with
+    the limit pushed down to the server (as LIMIT, TOP or FETCH FIRST for the
+    dialect) so it doesn't produce the whole result, and with a statement
+    timeout of ``timeout`` seconds.
+
+    Statements that can't be wrapped in a SELECT, e.g. SHOW, are run as
+    written, fetching only ``rows`` rows.
+    """
+    rows = rows or settings.ETLMAN_PREVIEW_ROWS
+    timeout = timeout or settings.ETLMAN_PREVIEW_TIMEOUT
+    engine = get_engine(connection_string)
+    if can_wrap(sql_query):
+        with engine.begin() as connection, statement_timeout(connection, timeout):
+            result = connection.execute(
+                get_source(sql_query, name="etlman_preview").limit(rows)
+            )
+            return list(result.keys()), result.fetchall()
+    with engine.begin() as connection, statement_timeout(connection, timeout):
+        result = connection.exec_driver_sql(sql_query)
+        return list(result.keys()), result.fetchmany(rows)
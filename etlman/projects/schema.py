@@ -0,0 +1,69 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from etlman.projects.extraction import BatchConverter
+from etlman.projects.preview import preview
+
+# Environment variable through which steps find the input's columns.
+INPUT_SCHEMA_VARIABLE = "ETLMAN_INPUT_SCHEMA"
+
+
+def get_fingerprint(connection_string: str, sql_query: str) -> str:
+    """Identifies a query's schema; changes with the query or the database."""
+    return hashlib.sha256(f"{connection_string}\n{sql_query}".encode()).hexdigest()
+
+
+def describe(columns, rows) -> list:
+    """The names and Arrow types of ``columns``, inferred from ``rows``."""
+    schema = BatchConverter(columns).convert(rows).schema
+    return [{"name": field.name, "type": str(field.type)} for field in schema]
+
+
+def cache_schema(connection_string: str, sql_query: str, schema: list):
+    cache.set(
+        f"etlman-schema-{get_fingerprint(connection_string, sql_query)}",
+        schema,
+        settings.ETLMAN_SCHEMA_CACHE_TTL,
+    )
+
+
+def get_cached_schema(connection_string: str, sql_query: str):
+    """The cached schema of a query, e.g. from a preview, or None."""
+    return cache.get(f"etlman-schema-{get_fingerprint(connection_string, sql_query)}")
+
+
+def get_schema(data_interface) -> list:
+    """
+    The names and Arrow types of the data interface's query's columns. They
+    are introspected from a sample of rows once, then cached and stored on the
+    data interface until its query or connection string change.
+    """
+    fingerprint = get_fingerprint(
+        data_interface.connection_string, data_interface.sql_query
+    )
+    if (
+        data_interface.schema is not None
+        and data_interface.schema_fingerprint == fingerprint
+    ):
+        return data_interface.schema
+    schema = get_cached_schema(
+        data_interface.connection_string, data_interface.sql_query
+    )
+    if schema is None:
+        schema = describe(
+            *preview(
+                data_interface.connection_string,
+                data_interface.sql_query,
+                rows=settings.ETLMAN_SCHEMA_SAMPLE_ROWS,
+            )
+        )
+        cache_schema(data_interface.connection_string, data_interface.sql_query, schema)
+    data_interface.schema = schema
+    data_interface.schema_fingerprint = fingerprint
+    if data_interface.pk:
+        type(data_interface).objects.filter(pk=data_interface.pk).update(
+            schema=schema, schema_fingerprint=fingerprint
+        )
+    return schema
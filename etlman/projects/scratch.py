@@ -0,0 +1,22 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+# Environment variable through which steps find their run's scratch directory.
+SCRATCH_DIR_VARIABLE = "ETLMAN_SCRATCH_DIR"
+
+
+def create_scratch_directory() -> str:
+    """
+    Create a new directory for one pipeline run, in which steps can leave
+    files (e.g. Arrow or Parquet) for the steps downstream of them to read.
+    """
+    root = Path(settings.ETLMAN_RUNS_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    return tempfile.mkdtemp(prefix="run-", dir=root)
+
+
+def remove_scratch_directory(path):
+    shutil.rmtree(path, ignore_errors=True)
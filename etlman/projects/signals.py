@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from etlman.projects.logs import remove_logs
+from etlman.projects.models import PipelineRun
+
+
+@receiver(post_delete, sender=PipelineRun)
+def remove_pipeline_run_logs(sender, instance, **kwargs):
+    remove_logs(instance.pk)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from etlman.backends.environments import normalize_requirements
+from etlman.backends.result import ScriptResult
+
+CACHE_KEY_PREFIX = "etlman:step-result:"
+
+
+def get_cache_key(step, upstream_key: str = "") -> str:
+    """
+    Fingerprint everything that determines a step's result: its language,
+    script and requirements, the pipeline's input query and the key of the
+    step(s) upstream.
+    """
+    data_interface = step.pipeline.input
+    fingerprint = {
+        "language": step.language,
+        "script": step.script,
+        "requirements": normalize_requirements(step.requirements),
+        "input": [data_interface.connection_string, data_interface.sql_query]
+        if data_interface
+        else None,
+        "upstream": upstream_key,
+    }
+    if data_interface and data_interface.watermark_column:
+        # Incremental extractions differ from run to run.
+        fingerprint["watermark"] = step.pipeline.input_watermark
+    payload = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class StepResultCache:
+    """
+    Stores successful step results: metadata goes in the Django cache, which
+    enforces each entry's TTL, while stdout/stderr are written to an on-disk
+    artifact store that is kept under ``max_size`` bytes by evicting the least
+    recently used artifacts.
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = Path(directory or settings.ETLMAN_STEP_CACHE_DIR)
+        self.max_size = max_size or settings.ETLMAN_STEP_CACHE_MAX_SIZE
+
+    def _artifact_path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        metadata = cache.get(CACHE_KEY_PREFIX + key)
+        if metadata is None:
+            return None
+        path = self._artifact_path(key)
+        try:
+            with open(path) as f:
+                artifact = json.load(f)
+        except FileNotFoundError:
+            # Evicted from disk before its TTL ran out.
+            return None
+        # Mark as recently used for LRU eviction.
+        os.utime(path)
+        return ScriptResult(
+            metadata["returncode"],
+            artifact["stdout"],
+            artifact["stderr"],
+            usage=metadata["usage"],
+        )
+
+    def set(self, key, result, ttl):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._artifact_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"stdout": result.stdout, "stderr": result.stderr}, f)
+        os.replace(tmp_path, path)
+        cache.set(
+            CACHE_KEY_PREFIX + key,
+            {"returncode": result.returncode, "usage": result.usage},
+            timeout=ttl,
+        )
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used artifacts until under ``max_size``."""
+        artifacts = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            artifacts.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in artifacts)
+        for _, size, path in sorted(artifacts):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
@@ -1,10 +1,163 @@
-from celery import shared_task
+import asyncio
+import datetime
+import logging
 
-from etlman.projects.models import Pipeline
+from asgiref.sync import async_to_sync
+from celery import chain, group, shared_task
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from etlman.backends import get_backend
+from etlman.projects.logs import get_logged_run_ids, remove_logs
+from etlman.projects.models import Pipeline, PipelineRun, RetryStep, Step
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
 def run_pipeline(pipeline_id):
     pipeline = Pipeline.objects.get(id=pipeline_id)
     print(f"Running Pipeline - {pipeline_id=}, {pipeline=}")
-    pipeline.run_pipeline()
+    queue_pipeline_run(pipeline)
+
+
+@shared_task
+def resume_pipeline_run(run_id):
+    """Run a failed run's pipeline again, from the steps that didn't succeed."""
+    run = PipelineRun.objects.select_related("pipeline").get(pk=run_id)
+    pipeline = run.pipeline
+    logger.info("Resuming pipeline %s from run %s", pipeline.pk, run_id)
+    queue_pipeline_run(pipeline, resume=run)
+
+
+def queue_pipeline_run(pipeline, resume=None):
+    """
+    Create a queued run of ``pipeline``, resuming ``resume`` if given, and the
+    task(s) that will run it.
+    """
+    if pipeline.distributed and not pipeline.streaming:
+        return run_pipeline_distributed(pipeline, resume=resume)
+    run = PipelineRun.start(pipeline, resume=resume)
+    execute_run.delay(run.pk)
+    return run
+
+
+@shared_task
+def execute_run(run_id):
+    run = PipelineRun.objects.select_related("pipeline__input").get(pk=run_id)
+    run.pipeline.run_pipeline(run=run)
+
+
+def run_pipeline_distributed(pipeline, resume=None):
+    """
+    Start a run of ``pipeline`` as a chain of tasks: extracting the input,
+    then each stage of steps (see Pipeline.get_stages) as a group of per-step
+    tasks, then finishing the run. Workers pick up each step as they have
+    capacity, and a step whose task fails is retried on its own.
+    """
+    run = PipelineRun.start(pipeline, resume=resume)
+    stages = [
+        group(run_step.si(run.pk, step.pk) for step in stage)
+        if len(stage) > 1
+        else run_step.si(run.pk, stage[0].pk)
+        for stage in pipeline.get_stages(pipeline.get_steps())
+    ]
+    canvas = chain(start_run.si(run.pk), *stages, finish_run.si(run.pk))
+    canvas.on_error(finish_run.si(run.pk))
+    canvas.apply_async()
+    return run
+
+
+# Tasks are acknowledged once they finish, so a step whose worker dies is
+# run again by another worker; already recorded steps aren't re-run.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def start_run(run_id):
+    run = PipelineRun.get_summarized(run_id, "pipeline__input")
+    run.mark_running()
+    run.extract_input()
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(Exception,),
+    max_retries=settings.ETLMAN_STEP_TASK_MAX_RETRIES,
+    retry_backoff=True,
+)
+def run_step(self, run_id, step_id, attempts=()):
+    # The step's own retries count towards the task's, but not its limit.
+    self.override_max_retries = self.max_retries + len(attempts)
+    run = PipelineRun.get_summarized(run_id, "pipeline__input")
+    try:
+        run.run_step(Step.objects.get(pk=step_id), attempts=attempts, wait=False)
+    except RetryStep as retry:
+        # Retry the script in a later task, rather than sleeping in this one.
+        raise self.retry(
+            kwargs={"attempts": retry.attempts},
+            countdown=retry.delay,
+            max_retries=self.request.retries + 1,
+        )
+
+
+@shared_task
+def finish_run(run_id):
+    run = PipelineRun.get_summarized(run_id, "pipeline")
+    try:
+        run.finish()
+    except BaseException:
+        # This is also the chain's errback, so nothing else would end the run.
+        run.abort()
+        raise
+
+
+@shared_task
+def run_pipelines(pipeline_ids):
+    """
+    Run several pipelines concurrently from a single worker process, with at
+    most ETLMAN_MAX_CONCURRENT_STEPS steps executing at any one time, e.g.
+    through the "Run selected pipelines" admin action.
+    """
+    pipelines = list(Pipeline.objects.filter(id__in=pipeline_ids))
+    logger.info("Running pipelines %s", pipeline_ids)
+    async_to_sync(run_pipelines_async)(pipelines)
+
+
+async def run_pipelines_async(pipelines, backend=None):
+    """
+    Run ``pipelines`` concurrently, returning each one's PipelineRun, or the
+    exception it raised. A pipeline raising an exception is logged and
+    doesn't stop the others.
+    """
+    if backend is None:
+        backend = get_backend()
+    semaphore = asyncio.Semaphore(settings.ETLMAN_MAX_CONCURRENT_STEPS)
+    results = await asyncio.gather(
+        *(
+            pipeline.run_pipeline_async(backend=backend, semaphore=semaphore)
+            for pipeline in pipelines
+        ),
+        return_exceptions=True,
+    )
+    for pipeline, result in zip(pipelines, results):
+        if isinstance(result, BaseException):
+            logger.error("Pipeline %s failed", pipeline.pk, exc_info=result)
+    return results
+
+
+@shared_task
+def prune_logs():
+    """
+    Remove the step logs of runs that ended over ETLMAN_LOG_RETENTION_DAYS
+    ago, or no longer exist. Scheduled through CELERY_BEAT_SCHEDULE.
+    """
+    run_ids = get_logged_run_ids()
+    cutoff = timezone.now() - datetime.timedelta(
+        days=settings.ETLMAN_LOG_RETENTION_DAYS
+    )
+    kept = PipelineRun.objects.filter(pk__in=run_ids).filter(
+        Q(ended_at__isnull=True) | Q(ended_at__gte=cutoff)
+    )
+    for run_id in run_ids - set(kept.values_list("pk", flat=True)):
+        remove_logs(run_id)
@@ -31,8 +31,8 @@ class DataInterfaceFactory(factory.django.DjangoModelFactory):
     interface_type = factory.fuzzy.FuzzyChoice(
         [key for key, _ in models.DataInterface.INTERFACE_TYPE_CHOICES]
     )
-    connection_string = factory.Faker("sentence")
-    sql_query = factory.Faker("hostname")
+    connection_string = "sqlite://"
+    sql_query = factory.Sequence(lambda n: f"SELECT {n} AS id")
 
     class Meta:
         model = models.DataInterface
@@ -83,8 +83,9 @@ class PipelineScheduleFactory(factory.django.DjangoModelFactory):
 
 class PipelineRunFactory(factory.django.DjangoModelFactory):
     pipeline = factory.SubFactory(PipelineFactory)
-    started_at = factory.Faker("date_time")
-    ended_at = factory.Faker("date_time_this_month")
+    started_at = factory.Faker("date_time", tzinfo=datetime.timezone.utc)
+    ended_at = factory.Faker("date_time_this_month", tzinfo=datetime.timezone.utc)
+    status = "succeeded"
     output = factory.Faker("sentence")
 
     class Meta:
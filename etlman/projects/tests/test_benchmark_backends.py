@@ -0,0 +1,39 @@
+import io
+import json
+
+from django.core.management import call_command
+
+from etlman.projects.management.commands.benchmark_backends import (
+    make_script,
+    parse_size,
+)
+
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("1k") == 1024
+    assert parse_size("100M") == 100 * 1024 * 1024
+
+
+def test_make_script_is_padded():
+    script = make_script("python", 10000, 10)
+    assert 9900 < len(script) <= 10000
+    assert script.endswith("sys.stdout.write('x' * 10)\n")
+
+
+def test_benchmark_writes_json(tmp_path):
+    path = tmp_path / "results.json"
+    call_command(
+        "benchmark_backends",
+        "--backends=subprocess",
+        "--languages=python",
+        "--script-sizes=100",
+        "--output-sizes=1K,100K",
+        "--concurrency=2",
+        "--iterations=2",
+        f"--json={path}",
+        stdout=io.StringIO(),
+    )
+    results = json.loads(path.read_text())["results"]
+    assert [r["output_size"] for r in results] == [1024, 100 * 1024]
+    assert all(r["latency_ms"]["min"] > 0 for r in results)
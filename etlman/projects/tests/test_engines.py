@@ -0,0 +1,52 @@
+from unittest import mock
+
+from etlman.projects.engines import EngineRegistry
+
+
+def make_registry(**kwargs):
+    options = {"max_engines": 2, "pool_size": 3, "max_overflow": 1, "idle_timeout": 60}
+    return EngineRegistry(**{**options, **kwargs})
+
+
+class TestEngineRegistry:
+    def test_engines_are_reused(self):
+        registry = make_registry()
+        assert registry.get("sqlite://") is registry.get("sqlite://")
+
+    def test_least_recently_used_engine_is_disposed(self):
+        registry = make_registry()
+        first = registry.get("sqlite:///a.db")
+        second = registry.get("sqlite:///b.db")
+        registry.get("sqlite:///a.db")
+        with mock.patch.object(second, "dispose") as dispose:
+            registry.get("sqlite:///c.db")
+        dispose.assert_called_once()
+        assert registry.get("sqlite:///a.db") is first
+        assert registry.get("sqlite:///b.db") is not second
+
+    def test_idle_engines_are_disposed(self):
+        registry = make_registry(idle_timeout=10)
+        with mock.patch("time.monotonic", return_value=0):
+            engine = registry.get("sqlite://")
+        with mock.patch("time.monotonic", return_value=11):
+            with mock.patch.object(engine, "dispose") as dispose:
+                assert registry.get("sqlite://") is not engine
+        dispose.assert_called_once()
+
+    def test_pool_options(self):
+        engine = make_registry().get("postgresql://user@localhost/db")
+        assert engine.pool.size() == 3
+        assert engine.pool._max_overflow == 1
+        assert engine.pool._recycle == 60
+
+    def test_connection_strings_are_not_kept(self):
+        registry = make_registry()
+        registry.get("sqlite:///secret.db")
+        assert not any("secret" in key for key in registry._engines)
+
+    def test_capacity(self):
+        registry = make_registry()
+        assert (
+            registry.get_capacity(registry.get("postgresql://user@localhost/db")) == 4
+        )
+        assert registry.get_capacity(registry.get("sqlite://")) is None
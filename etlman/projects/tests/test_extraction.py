@@ -0,0 +1,188 @@
+import datetime
+import decimal
+import json
+import sqlite3
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from etlman.projects.extraction import (
+    BatchConverter,
+    dump_watermark,
+    extract,
+    load_watermark,
+)
+from etlman.projects.tests.factories import DataInterfaceFactory
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "source.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE things (id INTEGER, name TEXT, note TEXT)")
+        connection.executemany(
+            "INSERT INTO things VALUES (?, ?, ?)",
+            [(i, f"thing {i}", None if i < 5 else i) for i in range(25)],
+        )
+    return f"sqlite:///{path}"
+
+
+@pytest.mark.django_db
+class TestExtract:
+    def test_rows_are_written_in_batches(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database, sql_query="SELECT * FROM things ORDER BY id"
+        )
+        extraction = extract(data_interface, tmp_path / "input", batch_size=10)
+        assert extraction["rows"] == 25
+        parquet = pq.ParquetFile(tmp_path / "input" / "part-0000.parquet")
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+        assert table.column("id").to_pylist() == list(range(25))
+        assert table.schema.field("name").type == "string"
+        # Typed from the first batch, where note is all nulls.
+        assert table.schema.field("note").type == "string"
+        assert table.column("note").to_pylist()[4:6] == [None, "5"]
+
+    def test_empty_result(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database, sql_query="SELECT id FROM things WHERE 0"
+        )
+        extraction = extract(data_interface, tmp_path)
+        assert extraction["rows"] == 0
+        table = pq.read_table(tmp_path / "part-0000.parquet")
+        assert table.column_names == ["id"]
+        assert table.num_rows == 0
+
+    def test_watermark(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT id, name FROM things WHERE name != 'a:b'",
+            watermark_column="id",
+        )
+        extraction = extract(data_interface, tmp_path / "1")
+        assert extraction["rows"] == 25
+        assert extraction["watermark"] == {"column": "id", "type": None, "value": 24}
+        with sqlite3.connect(database.replace("sqlite:///", "")) as connection:
+            connection.execute("INSERT INTO things VALUES (25, 'new', NULL)")
+        extraction = extract(
+            data_interface, tmp_path / "2", watermark=extraction["watermark"]
+        )
+        assert extraction["rows"] == 1
+        assert extraction["watermark"]["value"] == 25
+        extraction = extract(
+            data_interface, tmp_path / "3", watermark=extraction["watermark"]
+        )
+        assert extraction["rows"] == 0
+        assert extraction["watermark"]["value"] == 25
+
+    def test_watermark_for_another_column_is_ignored(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT * FROM things",
+            watermark_column="id",
+        )
+        watermark = {"column": "other", "type": None, "value": 100}
+        assert extract(data_interface, tmp_path, watermark=watermark)["rows"] == 25
+
+    def test_partitions(self, database, tmp_path):
+        with sqlite3.connect(database.replace("sqlite:///", "")) as connection:
+            connection.execute("INSERT INTO things VALUES (NULL, 'no id', NULL)")
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT * FROM things",
+            partition_column="id",
+            partition_count=4,
+            max_connections=2,
+        )
+        extraction = extract(data_interface, tmp_path / "input", batch_size=5)
+        # Ranges of 7 ids; the row without one goes in the first.
+        assert extraction["partitions"] == [8, 7, 7, 4]
+        assert extraction["rows"] == 26
+        assert len(list((tmp_path / "input").glob("part-*.parquet"))) == 4
+        # note was typed as a string in the first partition only.
+        table = ds.dataset(tmp_path / "input").to_table()
+        assert table.schema.field("note").type == "string"
+        assert sorted(table.column("id").to_pylist(), key=str) == sorted(
+            [*range(25), None], key=str
+        )
+
+    def test_partitions_without_values_take_others_types(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query=("SELECT id, CASE WHEN id >= 7 THEN id END AS note FROM things"),
+            partition_column="id",
+            partition_count=4,
+        )
+        extract(data_interface, tmp_path / "input", batch_size=5)
+        # note has no values in the first partition, so was typed as a string.
+        table = ds.dataset(tmp_path / "input").to_table()
+        assert table.schema.field("note").type == "int64"
+        assert sorted(table.column("note").to_pylist(), key=str) == sorted(
+            [*range(7, 25), *[None] * 7], key=str
+        )
+
+    def test_watermark_with_trailing_comment(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT * FROM things -- every thing",
+            watermark_column="id",
+        )
+        extraction = extract(
+            data_interface, tmp_path, watermark=dump_watermark("id", 20)
+        )
+        assert extraction["rows"] == 4
+
+    def test_partitions_after_watermark(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT * FROM things",
+            watermark_column="id",
+            partition_column="id",
+            partition_count=3,
+        )
+        watermark = dump_watermark("id", 18)
+        extraction = extract(data_interface, tmp_path, watermark=watermark)
+        assert extraction["partitions"] == [2, 2, 2]
+        assert extraction["watermark"]["value"] == 24
+
+    def test_more_partitions_than_values(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT * FROM things WHERE id < 2",
+            partition_column="id",
+            partition_count=5,
+        )
+        assert extract(data_interface, tmp_path)["partitions"] == [1, 1]
+
+    def test_partition_column_without_ranges(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database,
+            sql_query="SELECT * FROM things",
+            partition_column="name",
+            partition_count=2,
+        )
+        with pytest.raises(ValueError, match="Can't split name"):
+            extract(data_interface, tmp_path)
+
+    def test_dump_and_load_watermark(self):
+        value = datetime.datetime(2022, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        watermark = dump_watermark("updated_at", value)
+        assert json.loads(json.dumps(watermark)) == watermark
+        assert load_watermark(watermark) == value
+        assert load_watermark(dump_watermark("x", decimal.Decimal("1.5"))) == (
+            decimal.Decimal("1.5")
+        )
+
+    def test_decimals_are_widened(self):
+        converter = BatchConverter(["amount"])
+        converter.convert([(decimal.Decimal("1.50"),)])
+        batch = converter.convert([(decimal.Decimal("12345.67"),)])
+        assert batch.column(0).to_pylist() == [decimal.Decimal("12345.67")]
+
+    def test_decimals_with_more_places_in_later_batches(self):
+        converter = BatchConverter(["amount"])
+        converter.convert([(decimal.Decimal("1.5"),)])
+        batch = converter.convert([(decimal.Decimal("1.25"),)])
+        assert batch.column(0).to_pylist() == [decimal.Decimal("1.25")]
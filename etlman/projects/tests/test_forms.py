@@ -1,6 +1,7 @@
 import pytest
+from django.forms import ModelMultipleChoiceField
 
-from etlman.projects.forms import StepForm
+from etlman.projects.forms import DataInterfaceForm, StepForm
 from etlman.projects.tests.factories import PipelineFactory, StepFactory
 
 
@@ -19,3 +20,59 @@ class TestScriptForm:
         saved_obj = form.save(commit=False)
         assert sf.name == saved_obj.name
         assert sf.script == saved_obj.script
+        assert saved_obj.on_failure == "fail_fast"
+        assert saved_obj.max_retries == 0
+        assert saved_obj.retry_delay == 1
+
+    def test_requirements_are_python_only(self):
+        form = StepForm(
+            data={
+                "name": "step",
+                "language": "r",
+                "script": "print(1)",
+                "requirements": "six",
+            }
+        )
+        assert not form.is_valid()
+        assert "requirements" in form.errors
+
+    def test_depends_on_steps_of_the_same_pipeline(self):
+        step = StepFactory()
+        other = StepFactory(pipeline=step.pipeline)
+        StepFactory()
+        form = StepForm(instance=step)
+        field = form.fields["depends_on"]
+        assert isinstance(field, ModelMultipleChoiceField)
+        assert [label for _, label in field.choices] == [other.name]
+
+    def test_depends_on_cycle(self):
+        step = StepFactory()
+        other = StepFactory(pipeline=step.pipeline)
+        other.depends_on.add(step)
+        form = StepForm(
+            data={
+                "name": step.name,
+                "language": "python",
+                "script": step.script,
+                "depends_on": [other.pk],
+            },
+            instance=step,
+        )
+        assert not form.is_valid()
+        assert "depends_on" in form.errors
+
+
+@pytest.mark.django_db
+class TestDataInterfaceForm:
+    def test_partitioning_defaults(self):
+        form = DataInterfaceForm(
+            data={
+                "data_interface-name": "input",
+                "data_interface-interface_type": "database",
+                "data_interface-connection_string": "sqlite://",
+                "data_interface-sql_query": "SELECT 1",
+            }
+        )
+        assert form.is_valid(), form.errors
+        assert form.cleaned_data["partition_count"] == 1
+        assert form.cleaned_data["max_connections"] == 4
@@ -0,0 +1,107 @@
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from django.conf import settings
+from sqlalchemy import create_engine
+
+from etlman.projects.engines import dispose_engines
+from etlman.projects.loading import load
+from etlman.projects.tests.factories import DataInterfaceFactory
+
+ROWS = pa.table({"id": [1, 2, 3], "name": ["a", "", None]})
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "target.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE things (id INTEGER, name TEXT, note TEXT)")
+        connection.execute("INSERT INTO things VALUES (1, 'old', 'kept')")
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def postgres_database():
+    """A table in the test database, reached outside of Django's connection."""
+    db = settings.DATABASES["default"]
+    url = "postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{NAME}".format(**db)
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE etlman_test_things (id integer PRIMARY KEY, name text)"
+        )
+        connection.exec_driver_sql("INSERT INTO etlman_test_things VALUES (1, 'old')")
+    yield url
+    # Close pooled connections so the test database can be dropped.
+    dispose_engines()
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE etlman_test_things")
+    engine.dispose()
+
+
+def read_rows(url, table):
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"SELECT * FROM {table} ORDER BY id, name")
+        return [tuple(row) for row in rows]
+
+
+@pytest.mark.django_db
+class TestLoad:
+    def test_insert(self, database, tmp_path):
+        pq.write_table(ROWS, tmp_path / "part-0000.parquet")
+        data_interface = DataInterfaceFactory(
+            connection_string=database, target_table="things"
+        )
+        assert load(data_interface, tmp_path, batch_size=2)["rows"] == 3
+        assert read_rows(database, "things") == [
+            (1, "a", None),
+            (1, "old", "kept"),
+            (2, "", None),
+            (3, None, None),
+        ]
+
+    def test_upsert(self, database, tmp_path):
+        pq.write_table(ROWS, tmp_path / "part-0000.parquet")
+        data_interface = DataInterfaceFactory(
+            connection_string=database, target_table="things", upsert_keys="id"
+        )
+        assert load(data_interface, tmp_path)["rows"] == 3
+        assert read_rows(database, "things") == [
+            (1, "a", None),
+            (2, "", None),
+            (3, None, None),
+        ]
+
+    def test_unknown_column(self, database, tmp_path):
+        pq.write_table(pa.table({"other": [1]}), tmp_path / "part-0000.parquet")
+        data_interface = DataInterfaceFactory(
+            connection_string=database, target_table="things"
+        )
+        with pytest.raises(ValueError, match="no column"):
+            load(data_interface, tmp_path)
+        assert read_rows(database, "things") == [(1, "old", "kept")]
+
+    def test_nothing_to_load(self, database, tmp_path):
+        data_interface = DataInterfaceFactory(
+            connection_string=database, target_table="things"
+        )
+        assert load(data_interface, tmp_path)["rows"] == 0
+
+    def test_copy_on_postgres(self, postgres_database, tmp_path):
+        pq.write_table(ROWS.slice(1), tmp_path / "part-0000.parquet")
+        pq.write_table(ROWS.slice(0, 1), tmp_path / "part-0001.parquet")
+        data_interface = DataInterfaceFactory(
+            connection_string=postgres_database,
+            target_table="public.etlman_test_things",
+            upsert_keys="id",
+        )
+        assert load(data_interface, tmp_path, batch_size=1)["rows"] == 3
+        # Empty strings and NULLs survive the CSV.
+        assert read_rows(postgres_database, "etlman_test_things") == [
+            (1, "a"),
+            (2, ""),
+            (3, None),
+        ]
@@ -0,0 +1,50 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from etlman.projects.logs import get_log_path, open_log, read_log
+from etlman.projects.tasks import prune_logs
+from etlman.projects.tests.factories import PipelineRunFactory
+
+
+def test_read_log_returns_whole_lines():
+    with open_log(1, 2) as log:
+        log.write(b"first\nsecond\nthi")
+    assert read_log(1, 2) == ("first\nsecond\n", 13)
+    assert read_log(1, 2, offset=13) == ("", 13)
+    assert read_log(1, 2, offset=0, limit=8) == ("first\n", 6)
+
+
+def test_read_log_splits_long_lines():
+    with open_log(1, 2) as log:
+        log.write(b"x" * 10 + b"\n")
+    assert read_log(1, 2, limit=4) == ("xxxx", 4)
+
+
+def test_read_missing_log():
+    assert read_log(1, 2, offset=5) == ("", 5)
+
+
+@pytest.mark.django_db
+def test_logs_are_removed_with_their_run():
+    run = PipelineRunFactory()
+    open_log(run.pk, 1).close()
+    run.delete()
+    assert not get_log_path(run.pk, 1).parent.exists()
+
+
+@pytest.mark.django_db
+def test_old_logs_are_pruned(settings):
+    settings.ETLMAN_LOG_RETENTION_DAYS = 7
+    now = timezone.now()
+    running = PipelineRunFactory(ended_at=None)
+    recent = PipelineRunFactory(ended_at=now - datetime.timedelta(days=6))
+    old = PipelineRunFactory(ended_at=now - datetime.timedelta(days=8))
+    for run_id in (running.pk, recent.pk, old.pk, old.pk + 1):
+        open_log(run_id, 1).close()
+    prune_logs()
+    assert get_log_path(running.pk, 1).exists()
+    assert get_log_path(recent.pk, 1).exists()
+    assert not get_log_path(old.pk, 1).exists()
+    assert not get_log_path(old.pk + 1, 1).exists()
@@ -1,7 +1,20 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
 import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
 
+from etlman.backends.result import ScriptResult
+from etlman.backends.subprocess_backend import SubprocessBackend
 from etlman.backends.test_backend import TestBackend
-from etlman.projects.models import PipelineRun
+from etlman.projects.logs import get_log_path, read_log
+from etlman.projects.models import Pipeline, PipelineRun
+from etlman.projects.tasks import run_pipelines_async
 from etlman.projects.tests.factories import (
     DataInterfaceFactory,
     PipelineFactory,
@@ -37,7 +50,7 @@ class TestPipelineModel:
         backend = TestBackend()
         pipeline.run_pipeline(backend=backend)
         PipelineRun.objects.count() == 1
-        last_pipeline_run = PipelineRun.objects.all().first()
+        last_pipeline_run = PipelineRun.objects.get()
         assert pipeline == last_pipeline_run.pipeline
         assert last_pipeline_run.output["pipeline_id"] == pipeline.pk
         assert last_pipeline_run.output["steps"][0]["step_id"] == step.pk
@@ -47,6 +60,7 @@ class TestPipelineModel:
         assert last_pipeline_run.output["steps"][0]["stderr"].startswith(
             TestBackend.STDERR_MARKER
         )
+        assert "wall_time" in last_pipeline_run.output["steps"][0]["usage"]
 
     def test_run_pipeline_multiple_steps(self):
         """
@@ -65,3 +79,530 @@ class TestPipelineModel:
         assert len(last_pipeline_run.output["steps"]) == 3
         run_step_ids = {s["step_id"] for s in last_pipeline_run.output["steps"]}
         assert run_step_ids == {step1.id, step2.id, step3.id}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_pipeline_async(self):
+        """
+        Pipeline.run_pipeline_async() records the same output as run_pipeline().
+        """
+        pipeline = PipelineFactory()
+        step1 = StepFactory(pipeline=pipeline)
+        step2 = StepFactory(pipeline=pipeline)
+        backend = TestBackend()
+        async_to_sync(pipeline.run_pipeline_async)(backend=backend)
+        last_pipeline_run = PipelineRun.objects.get()
+        assert last_pipeline_run.output["pipeline_id"] == pipeline.pk
+        assert [s["step_id"] for s in last_pipeline_run.output["steps"]] == [
+            step1.id,
+            step2.id,
+        ]
+        assert last_pipeline_run.output["steps"][0]["stdout"].startswith(
+            TestBackend.STDOUT_MARKER
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_pipeline_async_extracts_and_loads_in_other_threads(self):
+        """
+        Extraction and loading don't tie up the thread that sync_to_async()
+        shares, which the other pipelines' database calls need.
+        """
+        threads = []
+
+        def record_thread(run):
+            threads.append(threading.get_ident())
+
+        pipeline = PipelineFactory()
+        StepFactory(pipeline=pipeline)
+        with mock.patch.object(PipelineRun, "extract_input", record_thread):
+            with mock.patch.object(PipelineRun, "finish", record_thread):
+                async_to_sync(pipeline.run_pipeline_async)(backend=TestBackend())
+        assert len(threads) == 2
+        assert threading.get_ident() not in threads
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_pipelines_async(self):
+        """
+        run_pipelines_async() creates a PipelineRun for each pipeline.
+        """
+        pipelines = [PipelineFactory(), PipelineFactory()]
+        for pipeline in pipelines:
+            StepFactory(pipeline=pipeline)
+        async_to_sync(run_pipelines_async)(pipelines, backend=TestBackend())
+        assert {run.pipeline for run in PipelineRun.objects.all()} == set(pipelines)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_pipelines_async_failure(self):
+        """
+        A pipeline that raises an exception doesn't stop the others, and the
+        exception is returned in place of its run.
+        """
+
+        class BrokenBackend(TestBackend):
+            async def execute_script_async(self, language, script, **kwargs):
+                if script == "broken":
+                    raise RuntimeError("broken")
+                return await super().execute_script_async(language, script, **kwargs)
+
+        broken, working = PipelineFactory(), PipelineFactory()
+        StepFactory(pipeline=broken, script="broken")
+        StepFactory(pipeline=working)
+        results = async_to_sync(run_pipelines_async)(
+            [broken, working], backend=BrokenBackend()
+        )
+        assert isinstance(results[0], RuntimeError)
+        assert results[1].pipeline == working
+        assert PipelineRun.objects.get(pipeline=broken).status == "failed"
+
+    def test_run_pipeline_records_timeout(self, settings):
+        """
+        A step that times out is recorded with a "timeout" status and, if it
+        continues on failure, the remaining steps still run.
+        """
+
+        class TimeoutBackend(TestBackend):
+            timeouts = []
+
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                self.timeouts.append(timeout)
+                return ScriptResult(-15, "partial", "", timed_out=timeout == 1)
+
+        settings.ETLMAN_DEFAULT_STEP_TIMEOUT = 60
+        pipeline = PipelineFactory()
+        StepFactory(pipeline=pipeline, timeout=1, on_failure="continue")
+        StepFactory(pipeline=pipeline)
+        backend = TimeoutBackend()
+        pipeline.run_pipeline(backend=backend)
+        assert backend.timeouts == [1, 60]
+        steps = PipelineRun.objects.get().output["steps"]
+        assert [step["status"] for step in steps] == ["timeout", "failure"]
+        assert steps[0]["stdout"] == "partial"
+
+    # Steps run in other threads, whose connections see only committed rows.
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("run_async", [False, True])
+    def test_run_pipeline_records_steps_as_they_finish(self, run_async):
+        """
+        The run is saved as running before any step runs, and each step's
+        output is saved once it finishes, while later steps are running.
+        """
+
+        class InspectingBackend(TestBackend):
+            runs = []
+
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                run = PipelineRun.objects.get()
+                self.runs.append((run.status, len(run.output["steps"])))
+                return ScriptResult(0, script, "")
+
+            async def execute_script_async(self, *args, **kwargs):
+                return await sync_to_async(self.execute_script)(*args, **kwargs)
+
+        pipeline = PipelineFactory(input=None)
+        StepFactory(pipeline=pipeline, step_order=1, script="first")
+        StepFactory(pipeline=pipeline, step_order=2, script="second")
+        backend = InspectingBackend()
+        if run_async:
+            run = async_to_sync(pipeline.run_pipeline_async)(backend)
+        else:
+            run = pipeline.run_pipeline(backend=backend)
+        assert backend.runs == [("running", 0), ("running", 1)]
+        run.refresh_from_db()
+        assert run.status == "succeeded"
+        assert run.heartbeat_at is not None
+        assert run.ended_at is not None
+        assert [step["stdout"] for step in run.output["steps"]] == ["first", "second"]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_heartbeat(self, settings):
+        settings.ETLMAN_HEARTBEAT_INTERVAL = 0.01
+        run = PipelineRunFactory(heartbeat_at=None)
+        with run.heartbeat():
+            time.sleep(0.1)
+        run.refresh_from_db()
+        assert run.heartbeat_at is not None
+
+    def test_run_pipeline_keeps_the_tail_of_long_output(self, settings):
+        """
+        Only the end of a step's output is kept in the run's output, with a
+        reference to the step's log, which has all of it.
+        """
+        settings.ETLMAN_OUTPUT_TAIL_SIZE = 10
+        pipeline = PipelineFactory(input=None)
+        step = StepFactory(
+            pipeline=pipeline,
+            language="python",
+            script="for i in range(10000):\n    print(i)",
+        )
+        run = pipeline.run_pipeline(backend=SubprocessBackend())
+        run.refresh_from_db()
+        (output,) = run.output["steps"]
+        assert output["stdout"] == "9998\n9999\n"
+        assert output["truncated"]
+        assert output["log"] == str(get_log_path(run.pk, step.pk))
+        with open(output["log"]) as f:
+            assert f.read() == "".join(f"{i}\n" for i in range(10000))
+
+    def test_run_pipeline_records_failure(self):
+        pipeline = PipelineFactory(input=None)
+        step = StepFactory(
+            pipeline=pipeline, language="python", script="print('oops')\nexit(1)"
+        )
+        run = pipeline.run_pipeline(backend=SubprocessBackend())
+        run.refresh_from_db()
+        assert run.status == "failed"
+        assert run.can_resume
+        assert read_log(run.pk, step.pk) == ("oops\n", 5)
+
+    def test_run_pipeline_records_error(self):
+        """A run that ends with an error is marked failed, without a checkpoint."""
+
+        class BrokenBackend(TestBackend):
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                raise RuntimeError("broken")
+
+        pipeline = PipelineFactory(input=None)
+        StepFactory(pipeline=pipeline)
+        with pytest.raises(RuntimeError):
+            pipeline.run_pipeline(backend=BrokenBackend())
+        run = PipelineRun.objects.get()
+        assert run.status == "failed"
+        assert run.ended_at is not None
+        assert not run.can_resume
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize("run_async", [False, True])
+    def test_run_pipeline_skips_steps_after_failure(self, run_async):
+        """
+        Steps depending on a failed step that fails fast are skipped, as are
+        steps depending on those, while other steps still run.
+        """
+        pipeline = PipelineFactory(input=None)
+        failing, downstream, after, independent = [
+            StepFactory(
+                pipeline=pipeline,
+                step_order=i,
+                language="python",
+                script="exit(1)" if i == 0 else f"print({i})",
+            )
+            for i in range(4)
+        ]
+        downstream.depends_on.add(failing)
+        after.depends_on.add(downstream)
+        if run_async:
+            async_to_sync(pipeline.run_pipeline_async)(SubprocessBackend())
+        else:
+            pipeline.run_pipeline(backend=SubprocessBackend())
+        steps = PipelineRun.objects.get().output["steps"]
+        assert [step["status"] for step in steps] == [
+            "failure",
+            "skipped",
+            "skipped",
+            "success",
+        ]
+
+    def test_run_pipeline_retries_failed_steps(self, monkeypatch, settings):
+        """
+        A failed step is retried up to max_retries times, after exponentially
+        growing, jittered delays, and each attempt is recorded.
+        """
+
+        class FlakyBackend(TestBackend):
+            calls = 0
+
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                self.calls += 1
+                return ScriptResult(0 if self.calls == 3 else 1, "", "")
+
+        settings.ETLMAN_MAX_RETRY_DELAY = 60
+        delays: list = []
+        monkeypatch.setattr(time, "sleep", delays.append)
+        pipeline = PipelineFactory(input=None)
+        StepFactory(pipeline=pipeline, max_retries=3, retry_delay=10)
+        pipeline.run_pipeline(backend=FlakyBackend())
+        (step,) = PipelineRun.objects.get().output["steps"]
+        assert step["status"] == "success"
+        attempts = step["attempts"]
+        assert [attempt["status"] for attempt in attempts] == [
+            "failure",
+            "failure",
+            "success",
+        ]
+        assert [attempt.get("retry_delay") for attempt in attempts] == [*delays, None]
+        assert 5 <= delays[0] <= 10
+        assert 10 <= delays[1] <= 20
+
+    def test_run_pipeline_reuses_cached_results(self, settings, tmp_path):
+        """
+        Steps with a cache_ttl reuse a previous successful result instead of
+        running again, and the reuse is recorded in the run output.
+        """
+
+        class CountingBackend(TestBackend):
+            calls = 0
+
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                self.calls += 1
+                return ScriptResult(0, f"run {self.calls}", "")
+
+        cache.clear()
+        settings.ETLMAN_STEP_CACHE_DIR = str(tmp_path)
+        pipeline = PipelineFactory()
+        StepFactory(pipeline=pipeline, cache_ttl=60)
+        StepFactory(pipeline=pipeline)
+        backend = CountingBackend()
+        pipeline.run_pipeline(backend=backend)
+        pipeline.run_pipeline(backend=backend)
+        assert backend.calls == 3
+        first, second = PipelineRun.objects.order_by("pk")
+        assert [s["cached"] for s in first.output["steps"]] == [False, False]
+        assert [s["cached"] for s in second.output["steps"]] == [True, False]
+        assert second.output["steps"][0]["stdout"] == "run 1"
+        assert (
+            second.output["steps"][0]["cache_key"]
+            == first.output["steps"][0]["cache_key"]
+        )
+
+    def test_run_pipeline_runs_independent_steps_in_parallel(self, settings):
+        """
+        Steps run once their dependencies have finished, independent steps run
+        at the same time, and each step's start and end times are recorded.
+        """
+
+        class SleepingBackend(TestBackend):
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                time.sleep(0.2)
+                return ScriptResult(0, script, "")
+
+        settings.ETLMAN_MAX_PARALLEL_STEPS = 3
+        pipeline = PipelineFactory()
+        extracts = [StepFactory(pipeline=pipeline) for _ in range(3)]
+        load = StepFactory(pipeline=pipeline)
+        load.depends_on.set(extracts)
+        start = time.monotonic()
+        pipeline.run_pipeline(backend=SleepingBackend())
+        assert time.monotonic() - start < 0.6
+        steps = PipelineRun.objects.get().output["steps"]
+        assert [step["step_id"] for step in steps] == [s.pk for s in [*extracts, load]]
+        assert max(step["started_at"] for step in steps[:3]) < steps[0]["ended_at"]
+        assert steps[3]["started_at"] >= max(step["ended_at"] for step in steps[:3])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_pipeline_async_follows_dependencies(self):
+        pipeline = PipelineFactory()
+        first, second = StepFactory(pipeline=pipeline), StepFactory(pipeline=pipeline)
+        first.depends_on.add(second)
+        async_to_sync(pipeline.run_pipeline_async)(backend=TestBackend())
+        steps = PipelineRun.objects.get().output["steps"]
+        assert [step["step_id"] for step in steps] == [first.pk, second.pk]
+        assert steps[0]["started_at"] >= steps[1]["ended_at"]
+
+    def test_get_dependencies_without_dependencies_is_sequential(self):
+        pipeline = PipelineFactory()
+        steps = [StepFactory(pipeline=pipeline) for _ in range(3)]
+        dependencies = pipeline.get_dependencies(pipeline.get_steps())
+        assert dependencies == {
+            steps[0]: [],
+            steps[1]: [steps[0]],
+            steps[2]: [steps[1]],
+        }
+
+    def test_get_dependencies_rejects_cycles(self):
+        pipeline = PipelineFactory()
+        first, second = StepFactory(pipeline=pipeline), StepFactory(pipeline=pipeline)
+        first.depends_on.add(second)
+        second.depends_on.add(first)
+        with pytest.raises(ValueError, match="cycle"):
+            pipeline.get_dependencies(pipeline.get_steps())
+
+    def test_steps_share_a_scratch_directory(self, settings, tmp_path):
+        """
+        Each run's steps share a scratch directory, which is removed when the
+        run succeeds.
+        """
+        settings.ETLMAN_RUNS_DIR = str(tmp_path / "runs")
+        pipeline = PipelineFactory()
+        write = (
+            "import os\nopen(os.environ['ETLMAN_SCRATCH_DIR'] + '/x', 'w').write('hi')"
+        )
+        read = "import os\nprint(open(os.environ['ETLMAN_SCRATCH_DIR'] + '/x').read())"
+        StepFactory(pipeline=pipeline, language="python", script=write)
+        StepFactory(pipeline=pipeline, language="python", script=read)
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        steps = PipelineRun.objects.get().output["steps"]
+        assert steps[1]["stdout"] == "hi\n", steps[1]["stderr"]
+        assert list((tmp_path / "runs").iterdir()) == []
+
+    def test_failed_run_is_resumed_from_the_failed_step(self, tmp_path):
+        """
+        A failed run keeps its scratch directory, and resuming it reuses the
+        steps that succeeded, and the files they left, instead of running them
+        again.
+        """
+        runs = tmp_path / "runs.txt"
+        pipeline = PipelineFactory()
+        write = (
+            "import os\n"
+            f"open({str(runs)!r}, 'a').write('x')\n"
+            "open(os.environ['ETLMAN_SCRATCH_DIR'] + '/x', 'w').write('hi')"
+        )
+        StepFactory(pipeline=pipeline, language="python", script=write)
+        read = StepFactory(pipeline=pipeline, language="python", script="exit(1)")
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        failed = PipelineRun.objects.get()
+        assert pipeline.get_resumable_run() == failed
+        read.script = (
+            "import os\nprint(open(os.environ['ETLMAN_SCRATCH_DIR'] + '/x').read())"
+        )
+        read.save()
+        pipeline.run_pipeline(backend=SubprocessBackend(), resume=failed)
+        run = PipelineRun.objects.latest("pk")
+        assert run.output["resumed_from"] == failed.pk
+        assert run.output["steps"][0]["resumed"]
+        assert run.output["steps"][1]["stdout"] == "hi\n"
+        assert runs.read_text() == "x"
+        assert not os.path.exists(failed.scratch_dir)
+        assert pipeline.get_resumable_run() is None
+        with pytest.raises(ValueError, match="can't be resumed"):
+            pipeline.run_pipeline(backend=SubprocessBackend(), resume=failed)
+
+    def test_error_keeps_checkpoints(self):
+        """
+        A run that ends with an error after recording steps keeps its scratch
+        directory to be resumed. One that resumed another run, but recorded
+        nothing, hands the scratch directory back.
+        """
+
+        class BrokenBackend(TestBackend):
+            def execute_script(self, language, script, timeout=None, **kwargs):
+                if script == "broken":
+                    raise RuntimeError("broken")
+                return ScriptResult(0, "", "")
+
+        pipeline = PipelineFactory(input=None)
+        StepFactory(pipeline=pipeline, step_order=1)
+        StepFactory(pipeline=pipeline, step_order=2, script="broken")
+        with pytest.raises(RuntimeError):
+            pipeline.run_pipeline(backend=BrokenBackend())
+        aborted = PipelineRun.objects.get()
+        assert aborted.status == "failed"
+        assert aborted.can_resume
+        with mock.patch.object(
+            PipelineRun, "extract_input", side_effect=KeyboardInterrupt
+        ):
+            with pytest.raises(KeyboardInterrupt):
+                pipeline.run_pipeline(backend=BrokenBackend(), resume=aborted)
+        retried = PipelineRun.objects.latest("pk")
+        assert retried.status == "failed"
+        assert not retried.can_resume
+        assert pipeline.get_resumable_run() == aborted
+        aborted.refresh_from_db()
+        assert os.path.isdir(aborted.scratch_dir)
+
+    def test_new_run_discards_checkpoints(self):
+        pipeline = PipelineFactory()
+        StepFactory(pipeline=pipeline, language="python", script="exit(1)")
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        failed = PipelineRun.objects.get()
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        failed.refresh_from_db()
+        assert not failed.can_resume
+        assert pipeline.get_resumable_run() != failed
+
+    def test_list_with_runs(self, django_assert_num_queries):
+        pipeline = PipelineFactory()
+        PipelineFactory(project=pipeline.project)
+        resumable = PipelineRunFactory(pipeline=pipeline, scratch_dir="/tmp/run")
+        latest = PipelineRunFactory(
+            pipeline=pipeline, started_at=resumable.started_at + timedelta(days=1)
+        )
+        with django_assert_num_queries(2):
+            pipelines = Pipeline.list_with_runs(
+                Pipeline.objects.filter(project=pipeline.project).order_by("pk")
+            )
+        assert pipelines[0].latest_run == latest
+        assert pipelines[0].resumable_run == resumable == pipeline.get_resumable_run()
+        assert pipelines[1].latest_run is None
+        assert pipelines[1].resumable_run is None
+        assert "output" in pipelines[0].latest_run.get_deferred_fields()
+
+    def test_streaming_pipeline(self):
+        """
+        A streaming pipeline runs its steps as one Unix pipeline, recording
+        only the last step's stdout.
+        """
+        pipeline = PipelineFactory(streaming=True)
+        StepFactory(pipeline=pipeline, language="python", script="print('a')")
+        StepFactory(
+            pipeline=pipeline,
+            language="python",
+            script="import sys\nprint(sys.stdin.read().upper())",
+        )
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        steps = PipelineRun.objects.get().output["steps"]
+        assert [step["stdout"] for step in steps] == ["", "A\n\n"]
+        assert all(step["status"] == "success" for step in steps)
+
+    def test_input_is_extracted_for_the_steps(self):
+        """
+        The pipeline's input is extracted to Parquet before the steps run, and
+        the extraction is recorded in the run output.
+        """
+        pipeline = PipelineFactory(
+            input__connection_string="sqlite://",
+            input__sql_query="SELECT 1 AS id UNION ALL SELECT 2",
+        )
+        script = (
+            "import os\n"
+            "import pyarrow.parquet as pq\n"
+            "print(pq.read_table(os.environ['ETLMAN_INPUT_PATH'])['id'].to_pylist())"
+        )
+        StepFactory(pipeline=pipeline, language="python", script=script)
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        output = PipelineRun.objects.get().output
+        assert output["input"]["rows"] == 2
+        assert output["steps"][0]["stdout"] == "[1, 2]\n", output["steps"][0]["stderr"]
+
+    def test_input_watermark_is_saved_after_a_successful_run(self):
+        pipeline = PipelineFactory(
+            input__connection_string="sqlite://",
+            input__sql_query="SELECT 1 AS id UNION ALL SELECT 2",
+            input__watermark_column="id",
+        )
+        step = StepFactory(pipeline=pipeline, language="python", script="exit(1)")
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        pipeline.refresh_from_db()
+        assert pipeline.input_watermark is None
+        step.script = "exit(0)"
+        step.save()
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        pipeline.refresh_from_db()
+        assert pipeline.input_watermark == {"column": "id", "type": None, "value": 2}
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        assert PipelineRun.objects.latest("pk").output["input"]["rows"] == 0
+
+    def test_output_is_loaded_after_the_steps(self, tmp_path):
+        target = tmp_path / "target.db"
+        with sqlite3.connect(target) as connection:
+            connection.execute("CREATE TABLE things (id INTEGER)")
+        pipeline = PipelineFactory(
+            output=DataInterfaceFactory(
+                connection_string=f"sqlite:///{target}", target_table="things"
+            )
+        )
+        script = (
+            "import os\n"
+            "import pyarrow as pa\n"
+            "import pyarrow.parquet as pq\n"
+            "path = os.path.join(os.environ['ETLMAN_OUTPUT_PATH'], 'things.parquet')\n"
+            "pq.write_table(pa.table({'id': [1, 2]}), path)"
+        )
+        step = StepFactory(pipeline=pipeline, language="python", script=script)
+        StepFactory(pipeline=pipeline, language="python", script="exit(1)")
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        assert "output" not in PipelineRun.objects.get().output
+        pipeline.steps.exclude(pk=step.pk).delete()
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        output = PipelineRun.objects.latest("pk").output
+        assert output["output"]["rows"] == 2, output["steps"][0]["stderr"]
+        with sqlite3.connect(target) as connection:
+            assert connection.execute("SELECT count(*) FROM things").fetchone() == (2,)
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from etlman.projects.engines import get_engine
+from etlman.projects.preview import preview
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "source.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE things (id INTEGER, name TEXT)")
+        connection.executemany(
+            "INSERT INTO things VALUES (?, ?)", [(i, f"thing {i}") for i in range(50)]
+        )
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def statements(database):
+    """The statements sent to ``database``."""
+    statements = []
+    engine = get_engine(database)
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+class TestPreview:
+    def test_limit_is_pushed_down(self, database, statements):
+        columns, rows = preview(database, "SELECT * FROM things;", rows=5)
+        assert columns == ["id", "name"]
+        assert [row.id for row in rows] == list(range(5))
+        assert "LIMIT" in statements[-1]
+
+    def test_trailing_comment(self, database, statements):
+        query = "SELECT * FROM things -- every thing"
+        columns, rows = preview(database, query, rows=5)
+        assert len(rows) == 5
+        assert "LIMIT" in statements[-1]
+
+    def test_statements_that_cant_be_wrapped(self, database, statements):
+        columns, rows = preview(database, "PRAGMA table_info(things)", rows=1)
+        assert "name" in columns
+        assert len(rows) == 1
+        assert statements[-1] == "PRAGMA table_info(things)"
+
+    def test_invalid_query(self, database):
+        with pytest.raises(OperationalError, match="no such table"):
+            preview(database, "SELECT * FROM missing")
+
+    def test_statement_timeout(self):
+        url = os.environ["DATABASE_URL"].replace("postgres", "postgresql", 1)
+        with pytest.raises(OperationalError, match="statement timeout"):
+            preview(url, "SELECT pg_sleep(5)", timeout=0.1)
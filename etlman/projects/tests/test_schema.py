@@ -0,0 +1,91 @@
+import datetime
+import json
+from unittest import mock
+
+import pyarrow.parquet as pq
+import pytest
+from django.core.cache import cache
+
+from etlman.backends.subprocess_backend import SubprocessBackend
+from etlman.projects.extraction import extract
+from etlman.projects.models import PipelineRun
+from etlman.projects.preview import preview
+from etlman.projects.schema import cache_schema, describe, get_schema
+from etlman.projects.tests.factories import (
+    DataInterfaceFactory,
+    PipelineFactory,
+    StepFactory,
+)
+
+QUERY = "SELECT 1 AS id, 'a' AS name, NULL AS note"
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_describe():
+    rows = [(1, datetime.date(2022, 1, 1), None)]
+    assert describe(["id", "day", "note"], rows) == [
+        {"name": "id", "type": "int64"},
+        {"name": "day", "type": "date32[day]"},
+        {"name": "note", "type": "string"},
+    ]
+
+
+@pytest.mark.django_db
+class TestGetSchema:
+    def test_introspected_once_and_stored(self):
+        data_interface = DataInterfaceFactory(sql_query=QUERY)
+        with mock.patch(
+            "etlman.projects.schema.preview", wraps=preview
+        ) as mock_preview:
+            schema = get_schema(data_interface)
+            cache.clear()
+            data_interface.refresh_from_db()
+            assert get_schema(data_interface) == schema
+        mock_preview.assert_called_once()
+        assert [column["name"] for column in schema] == ["id", "name", "note"]
+
+    def test_schema_from_a_preview_is_used(self):
+        data_interface = DataInterfaceFactory(sql_query=QUERY)
+        schema = [{"name": "id", "type": "int32"}]
+        cache_schema(data_interface.connection_string, QUERY, schema)
+        with mock.patch("etlman.projects.schema.preview") as mock_preview:
+            assert get_schema(data_interface) == schema
+        mock_preview.assert_not_called()
+
+    def test_changing_the_query_clears_the_schema(self):
+        data_interface = DataInterfaceFactory(sql_query=QUERY)
+        get_schema(data_interface)
+        data_interface.save()
+        assert data_interface.schema is not None
+        data_interface.sql_query = "SELECT 2 AS other"
+        data_interface.save()
+        assert data_interface.schema is None
+        assert get_schema(data_interface) == [{"name": "other", "type": "int64"}]
+
+    def test_extraction_types_null_columns_from_the_schema(self, tmp_path):
+        data_interface = DataInterfaceFactory(sql_query=QUERY)
+        cache_schema(
+            data_interface.connection_string,
+            QUERY,
+            [{"name": "note", "type": "double"}, {"name": "id", "type": "int64"}],
+        )
+        get_schema(data_interface)
+        extract(data_interface, tmp_path)
+        table = pq.read_table(tmp_path / "part-0000.parquet")
+        assert str(table.schema.field("note").type) == "double"
+
+    def test_steps_get_the_schema(self):
+        pipeline = PipelineFactory(input__sql_query=QUERY)
+        script = "import os\nprint(os.environ['ETLMAN_INPUT_SCHEMA'])"
+        StepFactory(pipeline=pipeline, language="python", script=script)
+        pipeline.run_pipeline(backend=SubprocessBackend())
+        stdout = PipelineRun.objects.get().output["steps"][0]["stdout"]
+        assert [column["name"] for column in json.loads(stdout)] == [
+            "id",
+            "name",
+            "note",
+        ]
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+from django.core.cache import cache
+
+from etlman.backends.result import ScriptResult
+from etlman.projects.step_cache import StepResultCache, get_cache_key
+from etlman.projects.tests.factories import StepFactory
+
+
+@pytest.fixture
+def step_cache(tmp_path):
+    cache.clear()
+    return StepResultCache(directory=tmp_path, max_size=1024)
+
+
+class TestStepResultCache:
+    def test_round_trip(self, step_cache):
+        step_cache.set("key", ScriptResult(0, "out", "err", usage={"a": 1}), ttl=60)
+        result = step_cache.get("key")
+        assert tuple(result) == (0, "out", "err")
+        assert result.usage == {"a": 1}
+
+    def test_expired_entry_is_a_miss(self, step_cache):
+        step_cache.set("key", ScriptResult(0, "out", "err"), ttl=60)
+        cache.clear()
+        assert step_cache.get("key") is None
+
+    def test_least_recently_used_artifacts_are_evicted(self, step_cache, tmp_path):
+        for i, key in enumerate(["old", "used", "new"]):
+            step_cache.set(key, ScriptResult(0, "x" * 400, ""), ttl=60)
+            os.utime(tmp_path / f"{key}.json", (i, i))
+        # Reading "used" makes it the most recently used artifact.
+        assert step_cache.get("used") is not None
+        step_cache.set("newest", ScriptResult(0, "x" * 400, ""), ttl=60)
+        assert step_cache.get("old") is None
+        assert step_cache.get("new") is None
+        assert step_cache.get("used") is not None
+        assert step_cache.get("newest") is not None
+
+
+@pytest.mark.django_db
+class TestGetCacheKey:
+    def test_key_changes_with_inputs(self):
+        step = StepFactory()
+        key = get_cache_key(step)
+        assert get_cache_key(step) == key
+        assert get_cache_key(step, upstream_key="abc") != key
+        step.script += "\n"
+        assert get_cache_key(step) != key
+        step.pipeline.input.sql_query = "SELECT 2"
+        assert get_cache_key(step) != key
+        step.requirements = "six\npytz"
+        key = get_cache_key(step)
+        step.requirements = "# Comments and order don't matter\npytz\nsix\n"
+        assert get_cache_key(step) == key
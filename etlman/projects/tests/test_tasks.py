@@ -0,0 +1,188 @@
+import os
+from unittest import mock
+
+import pytest
+
+from config.celery_app import app
+from etlman.projects import tasks
+from etlman.projects.models import Pipeline, PipelineRun
+from etlman.projects.tests.factories import (
+    DataInterfaceFactory,
+    PipelineFactory,
+    StepFactory,
+)
+
+
+@pytest.fixture
+def eager_celery(monkeypatch):
+    monkeypatch.setattr(app.conf, "task_always_eager", True)
+    monkeypatch.setattr(app.conf, "task_eager_propagates", False)
+
+
+@pytest.mark.django_db
+class TestDistributedRun:
+    def test_run_is_queued(self):
+        """A run is saved, queued, when its task is, and run by another task."""
+        pipeline = PipelineFactory(input=None)
+        StepFactory(pipeline=pipeline, language="python", script="print(1)")
+        with mock.patch.object(tasks.execute_run, "delay") as delay:
+            tasks.run_pipeline(pipeline.pk)
+        run = PipelineRun.objects.get()
+        assert run.status == "queued"
+        delay.assert_called_once_with(run.pk)
+        tasks.execute_run(run.pk)
+        run.refresh_from_db()
+        assert run.status == "succeeded"
+        assert run.output["steps"][0]["stdout"] == "1\n"
+
+    def test_stages(self):
+        pipeline = PipelineFactory()
+        first, second, third, last = [
+            StepFactory(pipeline=pipeline, step_order=i) for i in range(4)
+        ]
+        second.depends_on.add(first)
+        third.depends_on.add(first)
+        last.depends_on.add(second, third)
+        assert pipeline.get_stages(pipeline.get_steps()) == [
+            [first],
+            [second, third],
+            [last],
+        ]
+
+    def test_steps_run_as_tasks(self, eager_celery):
+        pipeline = PipelineFactory(distributed=True)
+        first, second, third = [
+            StepFactory(
+                pipeline=pipeline,
+                step_order=i,
+                language="python",
+                script=f"print({i})",
+            )
+            for i in range(3)
+        ]
+        second.depends_on.add(first)
+        third.depends_on.add(first)
+        tasks.run_pipeline(pipeline.pk)
+        run = PipelineRun.objects.get()
+        assert run.status == "succeeded"
+        assert run.ended_at is not None
+        assert [step["stdout"] for step in run.output["steps"]] == ["0\n", "1\n", "2\n"]
+        assert run.output["input"]["rows"] == 1
+        assert not os.path.exists(run.scratch_dir)
+
+    def test_step_is_retried_by_a_later_task(self, eager_celery, tmp_path):
+        """
+        A distributed step whose script fails is retried by the task retrying,
+        after the step's retry delay, rather than by sleeping.
+        """
+        script = (
+            "import os\n"
+            f"path = {str(tmp_path / 'ran')!r}\n"
+            "if not os.path.exists(path):\n"
+            "    open(path, 'w').close()\n"
+            "    exit(1)\n"
+            "print('ok')"
+        )
+        pipeline = PipelineFactory(input=None, distributed=True)
+        StepFactory(
+            pipeline=pipeline,
+            language="python",
+            script=script,
+            max_retries=1,
+            retry_delay=10,
+        )
+        with mock.patch.object(
+            tasks.run_step, "retry", wraps=tasks.run_step.retry
+        ) as retry:
+            with mock.patch("time.sleep") as sleep:
+                tasks.run_pipeline(pipeline.pk)
+        sleep.assert_not_called()
+        assert 5 <= retry.call_args.kwargs["countdown"] <= 10
+        run = PipelineRun.objects.get()
+        assert run.status == "succeeded"
+        (step,) = run.output["steps"]
+        assert step["stdout"] == "ok\n"
+        assert [a["status"] for a in step["attempts"]] == ["failure", "success"]
+        assert step["started_at"] == step["attempts"][0]["started_at"]
+
+    def test_retried_step_isnt_run_again(self):
+        pipeline = PipelineFactory(input=None)
+        step = StepFactory(pipeline=pipeline, language="python", script="print(1)")
+        run = PipelineRun.start(pipeline)
+        run.run_step(step)
+        step.script = "print(2)"
+        step.save()
+        run.run_step(step)
+        run.finish()
+        run.refresh_from_db()
+        assert [output["stdout"] for output in run.output["steps"]] == ["1\n"]
+
+    def test_run_that_fails_to_finish_is_aborted(self):
+        pipeline = PipelineFactory(input=None)
+        step = StepFactory(pipeline=pipeline, language="python", script="print(1)")
+        run = PipelineRun.start(pipeline)
+        run.run_step(step)
+        with mock.patch.object(
+            Pipeline, "save_input_watermark", side_effect=RuntimeError
+        ):
+            with pytest.raises(RuntimeError):
+                tasks.finish_run(run.pk)
+        run.refresh_from_db()
+        assert run.status == "failed"
+        assert run.ended_at is not None
+
+    def test_finish_keeps_only_summaries_in_memory(self):
+        """
+        Steps recorded out of order are stored in step order, without their
+        output being loaded to finish the run.
+        """
+        pipeline = PipelineFactory(input=None)
+        steps = [
+            StepFactory(
+                pipeline=pipeline,
+                step_order=i,
+                language="python",
+                script=f"print({i})",
+            )
+            for i in range(3)
+        ]
+        steps[2].depends_on.add(steps[0])
+        run = PipelineRun.start(pipeline)
+        for i in (1, 0, 2):
+            run.run_step(steps[i])
+        run = PipelineRun.get_summarized(run.pk, "pipeline")
+        run.finish()
+        step_ids = [step.pk for step in steps]
+        assert [output["step_id"] for output in run.output["steps"]] == step_ids
+        assert all("stdout" not in output for output in run.output["steps"])
+        run.refresh_from_db()
+        assert run.status == "succeeded"
+        stdouts = [output["stdout"] for output in run.output["steps"]]
+        assert stdouts == ["0\n", "1\n", "2\n"]
+
+    def test_step_after_failure_is_skipped(self):
+        pipeline = PipelineFactory(input=None)
+        first = StepFactory(pipeline=pipeline, language="python", script="exit(1)")
+        second = StepFactory(pipeline=pipeline, language="python", script="print(2)")
+        second.depends_on.add(first)
+        run = PipelineRun.start(pipeline)
+        run.run_step(first)
+        run.run_step(second)
+        run.refresh_from_db()
+        statuses = [output["status"] for output in run.output["steps"]]
+        assert statuses == ["failure", "skipped"]
+
+    def test_incomplete_run_isnt_loaded(self, tmp_path):
+        """
+        A run finished after a step's task failed, which left no output,
+        doesn't load the pipeline's output, and can be resumed.
+        """
+        pipeline = PipelineFactory(input=None, output=DataInterfaceFactory())
+        StepFactory(pipeline=pipeline, language="python", script="print(1)")
+        run = PipelineRun.start(pipeline)
+        tasks.finish_run(run.pk)
+        run.refresh_from_db()
+        assert run.ended_at is not None
+        assert "output" not in run.output
+        assert run.can_resume
+        assert os.path.isdir(run.scratch_dir)
@@ -1,15 +1,24 @@
 from html import unescape
 from http import HTTPStatus
 from random import randint
+from unittest import mock
 
 import pytest
 from django.urls import reverse
 from django_celery_beat.models import PeriodicTask
 
-from etlman.projects.models import Collaborator, Pipeline, PipelineSchedule, Step
+from etlman.projects.logs import open_log
+from etlman.projects.models import (
+    Collaborator,
+    Pipeline,
+    PipelineRun,
+    PipelineSchedule,
+    Step,
+)
 from etlman.projects.tests.factories import (
     CollaboratorFactory,
     PipelineFactory,
+    PipelineRunFactory,
     PipelineScheduleFactory,
     ProjectFactory,
     StepFactory,
@@ -126,3 +135,83 @@ class TestProjectDropdownList:
         assert "Delete" in html
         assert "Cancel" in html
         assert delete_msg in html, html
+
+    def test_resume_pipeline(self, nonadmin_client, nonadmin_user, tmp_path):
+        saved_project = ProjectFactory.create()
+        CollaboratorFactory.create(project=saved_project, user=nonadmin_user)
+        run = PipelineRunFactory(
+            pipeline__project=saved_project, scratch_dir=str(tmp_path)
+        )
+        url = reverse("projects:resume_pipeline", args=(saved_project.id, run.id))
+        with mock.patch("etlman.projects.views.resume_pipeline_run") as task:
+            response = nonadmin_client.post(url, follow=True)
+        task.delay.assert_called_once_with(run.pk)
+        html = unescape(response.content.decode("utf-8"))
+        assert (
+            MessagesEnum.PIPELINE_RESUMED.value.format(name=run.pipeline.name) in html
+        ), html
+
+    def test_pipeline_run(self, nonadmin_client, nonadmin_user):
+        saved_project = ProjectFactory.create()
+        CollaboratorFactory.create(project=saved_project, user=nonadmin_user)
+        step = StepFactory(pipeline__project=saved_project)
+        run = PipelineRun.start(step.pipeline)
+        url = reverse("projects:pipeline_run", args=(saved_project.id, run.id))
+        response = nonadmin_client.get(url)
+        html = unescape(response.content.decode("utf-8"))
+        assert response.status_code == HTTPStatus.OK.numerator
+        assert step.name in html
+        log_url = reverse("projects:step_log", args=(saved_project.id, run.id, step.id))
+        assert f"{log_url}?offset=0" in html, html
+
+    def test_step_log(self, nonadmin_client, nonadmin_user):
+        """
+        A step's log is read from an offset, and read again from where it left
+        off until the step has finished.
+        """
+        saved_project = ProjectFactory.create()
+        CollaboratorFactory.create(project=saved_project, user=nonadmin_user)
+        step = StepFactory(pipeline__project=saved_project)
+        run = PipelineRun.start(step.pipeline)
+        url = reverse("projects:step_log", args=(saved_project.id, run.id, step.id))
+        with open_log(run.pk, step.pk) as log:
+            log.write(b"first\nsecond\n")
+        response = nonadmin_client.get(url, {"offset": 6})
+        html = unescape(response.content.decode("utf-8"))
+        assert html.startswith("second\n"), html
+        assert f"{url}?offset=13" in html
+        response = nonadmin_client.get(url, {"offset": 13})
+        assert f"{url}?offset=13" in response.content.decode("utf-8")
+        run.record_step({"step_id": step.pk, "status": "success", "cache_key": ""})
+        response = nonadmin_client.get(url, {"offset": 13})
+        assert response.content.decode("utf-8") == ""
+
+    def test_step_log_without_a_log(self, nonadmin_client, nonadmin_user):
+        """A finished step without a log here shows the output kept with its run."""
+        saved_project = ProjectFactory.create()
+        CollaboratorFactory.create(project=saved_project, user=nonadmin_user)
+        step = StepFactory(pipeline__project=saved_project)
+        run = PipelineRun.start(step.pipeline)
+        url = reverse("projects:step_log", args=(saved_project.id, run.id, step.id))
+        response = nonadmin_client.get(url)
+        assert f"{url}?offset=0" in response.content.decode("utf-8")
+        run.record_step(
+            {
+                "step_id": step.pk,
+                "status": "failure",
+                "cache_key": "",
+                "stdout": "out\n",
+                "stderr": "err\n",
+            }
+        )
+        response = nonadmin_client.get(url)
+        assert response.content.decode("utf-8") == "out\nerr\n"
+
+    def test_resume_pipeline_without_a_checkpoint(self, nonadmin_client, nonadmin_user):
+        saved_project = ProjectFactory.create()
+        CollaboratorFactory.create(project=saved_project, user=nonadmin_user)
+        run = PipelineRunFactory(pipeline__project=saved_project)
+        url = reverse("projects:resume_pipeline", args=(saved_project.id, run.id))
+        with mock.patch("etlman.projects.views.resume_pipeline_run") as task:
+            nonadmin_client.post(url)
+        task.delay.assert_not_called()
@@ -232,7 +232,10 @@ class TestMultiformStep2:
         }
         if step:
             session[get_session_key(SessionKeyEnum.STEP, step)] = {
-                f"{key}": getattr(step, key) for key in StepForm._meta.fields
+                f"{key}": getattr(step, key)
+                for key in StepForm._meta.fields
+                # An unsaved step has no dependencies to get.
+                if key != "depends_on"
             }
         session.save()
 
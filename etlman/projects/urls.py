@@ -8,7 +8,10 @@ from etlman.projects.views import (
     new_pipeline_step1,
     new_project,
     new_step_step2,
+    pipeline_run,
+    resume_pipeline,
     schedule_pipeline_runtime,
+    step_log,
     test_db_connection_string,
     test_step_connection_string,
 )
@@ -28,6 +31,21 @@ urlpatterns = [
         view=confirm_delete_pipeline,
         name="confirm_delete_pipeline",
     ),
+    path(
+        "<int:project_id>/resume-pipeline/<int:run_id>/",
+        view=resume_pipeline,
+        name="resume_pipeline",
+    ),
+    path(
+        "<int:project_id>/pipeline-run/<int:run_id>/",
+        view=pipeline_run,
+        name="pipeline_run",
+    ),
+    path(
+        "<int:project_id>/pipeline-run/<int:run_id>/step-log/<int:step_id>/",
+        view=step_log,
+        name="step_log",
+    ),
     path(
         "<int:project_id>/new-pipeline/", view=new_pipeline_step1, name="new_pipeline"
     ),
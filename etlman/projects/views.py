@@ -8,7 +8,6 @@ from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.views.decorators.http import require_http_methods
-from sqlalchemy import create_engine
 
 from etlman.projects.authorizers import (
     user_is_authenticated,
@@ -21,13 +20,18 @@ from etlman.projects.forms import (
     ProjectForm,
     StepForm,
 )
+from etlman.projects.logs import get_log_path, read_log
 from etlman.projects.models import (
     Collaborator,
     Pipeline,
+    PipelineRun,
     PipelineSchedule,
     Project,
     Step,
 )
+from etlman.projects.preview import preview
+from etlman.projects.schema import cache_schema, describe, get_cached_schema
+from etlman.projects.tasks import resume_pipeline_run
 
 
 class MessagesEnum(enum.Enum):
@@ -37,6 +41,8 @@ class MessagesEnum(enum.Enum):
     PIPELINE_CREATED = "Pipeline '{name}' added successfully"
     PIPELINE_UPDATED = "Pipeline '{name}' updated successfully"
     PIPELINE_DELETED = "Pipeline '{name}' deleted successfully"
+    PIPELINE_RESUMED = "Pipeline '{name}' is resuming from its last failed run"
+    PIPELINE_NOT_RESUMABLE = "Pipeline '{name}' has no failed run to resume"
     PIPELINE_IN_PROGRESS_MSG = "This form contains unsaved changes"
 
 
@@ -55,7 +61,9 @@ def get_session_key(session_key_enum, object=None):
 @authorize(user_is_project_collaborator)
 def list_pipeline(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
-    pipelines = Pipeline.objects.filter(project=project)
+    pipelines = Pipeline.list_with_runs(
+        Pipeline.objects.filter(project=project).select_related("project", "input")
+    )
     context = {"pipeline_list": pipelines, "current_project": project}
     return render(request, "projects/list_pipeline.html", context)
 
@@ -81,6 +89,82 @@ def delete_pipeline(request, project_id, pipeline_id):
     return HttpResponseRedirect(reverse("projects:list_pipeline", args=(project.pk,)))
 
 
+@authorize(user_is_project_collaborator)
+@require_http_methods(["POST"])
+def resume_pipeline(request, project_id, run_id):
+    run = get_object_or_404(PipelineRun, pk=run_id, pipeline__project_id=project_id)
+    if run.can_resume:
+        resume_pipeline_run.delay(run.pk)
+        level, message = messages.SUCCESS, MessagesEnum.PIPELINE_RESUMED
+    else:
+        level, message = messages.ERROR, MessagesEnum.PIPELINE_NOT_RESUMABLE
+    messages.add_message(request, level, message.value.format(name=run.pipeline.name))
+    return HttpResponseRedirect(reverse("projects:list_pipeline", args=(project_id,)))
+
+
+@authorize(user_is_project_collaborator)
+def pipeline_run(request, project_id, run_id):
+    run = get_object_or_404(
+        PipelineRun.objects.select_related("pipeline"),
+        pk=run_id,
+        pipeline__project_id=project_id,
+    )
+    outputs = {output["step_id"]: output for output in run.output["steps"]}
+    context = {
+        "project_id": project_id,
+        "run": run,
+        "steps": [(step, outputs.get(step.pk)) for step in run.pipeline.get_steps()],
+    }
+    return render(request, "projects/pipeline_run.html", context)
+
+
+@authorize(user_is_project_collaborator)
+def step_log(request, project_id, run_id, step_id):
+    """
+    The part of a step's log from byte ``offset``, and, until the step has
+    finished and all of it has been read, an element fetching the next part.
+    If the log can't be read here, e.g. because the step ran on a worker that
+    doesn't share ETLMAN_LOGS_DIR, the output kept with the run is shown once
+    the step has finished.
+    """
+    runs = PipelineRun.objects.filter(pk=run_id, pipeline__project_id=project_id)
+    # The run's output, with every finished step's, isn't loaded on each poll.
+    run = get_object_or_404(runs.only("pk", "ended_at"))
+    # Checked before reading, so lines logged before the step finished aren't
+    # missed.
+    finished = (
+        run.ended_at is not None
+        or runs.filter(output__steps__contains=[{"step_id": step_id}]).exists()
+    )
+    try:
+        offset = max(int(request.GET.get("offset", 0)), 0)
+    except ValueError:
+        offset = 0
+    text, next_offset = read_log(run.pk, step_id, offset)
+    if finished and offset == 0 and not get_log_path(run.pk, step_id).exists():
+        text = get_stored_output(runs, step_id)
+    context = {
+        "project_id": project_id,
+        "run_id": run.pk,
+        "step_id": step_id,
+        "text": text,
+        "next_offset": next_offset,
+        "more": next_offset > offset or not finished,
+        # Fetch the next part right away if there may be more already.
+        "delay": 0 if next_offset > offset else settings.ETLMAN_LOG_POLL_INTERVAL,
+    }
+    return render(request, "projects/_step_log.html", context)
+
+
+def get_stored_output(runs, step_id) -> str:
+    """The stdout and stderr of a step kept in its run's output, if any."""
+    steps = runs.values_list("output__steps", flat=True).get()
+    for output in steps:
+        if output["step_id"] == step_id:
+            return "".join(output.get(name) or "" for name in ("stdout", "stderr"))
+    return ""
+
+
 @authorize(user_is_project_collaborator)
 def confirm_delete_pipeline(request, project_id, pipeline_id):
     pipeline = get_object_or_404(Pipeline, id=pipeline_id)
@@ -209,6 +293,7 @@ def new_step_step2(request, project_id, step_id=None):
             new_step.pipeline = new_pipeline
             new_step.step_order = 1
             new_step.save()
+            form_step.save_m2m()
 
             if step_id:
                 message = MessagesEnum.PIPELINE_UPDATED.value.format(
@@ -256,6 +341,11 @@ def new_step_step2(request, project_id, step_id=None):
     context = {
         "form_step": form_step,
         "project": project,
+        # Columns seen when the query was tested, if it was.
+        "input_schema": get_cached_schema(
+            session_data_interface.get("data_interface-connection_string", ""),
+            session_data_interface.get("data_interface-sql_query", ""),
+        ),
     }
     return render(request, "projects/new_step.html", context)
 
@@ -291,25 +381,28 @@ def test_db_connection_string(request, project_id):
     form = DataInterfaceForm(request.POST)
     if form.is_valid():
         try:
-            success = True
-            engine = create_engine(form.cleaned_data["connection_string"])
-            conn = engine.connect()
-            cursor = conn.exec_driver_sql(form.cleaned_data["sql_query"])
+            data_columns, data_table = preview(
+                form.cleaned_data["connection_string"], form.cleaned_data["sql_query"]
+            )
+            cache_schema(
+                form.cleaned_data["connection_string"],
+                form.cleaned_data["sql_query"],
+                describe(data_columns, data_table),
+            )
             # Using a blanket except statement because we do not know
             # what database driver the user is using.
         except Exception as e:
-            success = False
             message = f"We were unable to connect to the database. \n {e}"
-        if success:
+        else:
+            success = True
             message = "Database connection successful!"
-            data_columns = [desc[0] for desc in cursor.cursor.description]
-            data_table = cursor.fetchmany(20)
     context = {
         "data_columns": data_columns,
         "data_table": data_table,
         "success": success,
         "message": message,
         "form": form,
+        "preview_rows": settings.ETLMAN_PREVIEW_ROWS,
     }
     return render(request, "projects/_test_connection.html", context)
 
@@ -321,8 +414,11 @@ def test_step_connection_string(request, project_id):
     form = StepForm(request.POST)
     if form.is_valid():
         step = form.save(commit=False)
-        status_code, stdout, stderr = step.run_script()
-        if status_code == 0:
+        result = step.run_script()
+        status_code, stdout, stderr = result
+        if result.timed_out:
+            message = "Script timed out!"
+        elif status_code == 0:
             message = "Script ran successfully!"
         else:
             message = "Script failed!"